@@ -0,0 +1,163 @@
+# app/cli.py - Maintenance commands
+"""
+FlashPod maintenance commands.
+
+Usage:
+    python -m app.cli migrate              Apply pending schema migrations
+    python -m app.cli migrate --status     List migrations and when they were applied
+    python -m app.cli backfill-card-state  Rebuild card_state from the review history
+    python -m app.cli backfill-user-statistics
+                                           Rebuild the daily user_statistics rollup from
+                                           reviews and completed sessions
+    python -m app.cli reconcile-counters   Recompute deck and pod card/deck counters and
+                                           repair any drift
+    python -m app.cli rebuild-card-search  Rebuild the cards_fts full-text index from the
+                                           active cards
+    python -m app.cli reschedule --user alice --interval-modifier 1.2
+                                           Change a user's scheduling parameters and
+                                           reschedule their whole collection
+"""
+
+import argparse
+import os
+import sys
+
+# Add the app directory to Python path for imports (same layout as main.py)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config.database import db_config
+from models.database import Base, build_engine
+import models  # Registers every model on Base.metadata
+from models.card_search import install_card_search, rebuild_card_search
+from models.card_state import backfill_card_state
+from models.counters import install_counter_triggers, reconcile_counters
+from models.user_statistics import backfill_user_statistics
+from models.user import User
+from sqlalchemy import select
+from utils.rescheduler import apply_scheduling_params
+from utils.scheduler import validate_params
+from migrations import run_migrations, get_migration_status
+
+
+def cmd_migrate(engine, args):
+    """Create missing tables and apply pending migrations"""
+    if args.status:
+        for status in get_migration_status(engine):
+            applied = status['applied_at'].isoformat() if status['applied_at'] else 'pending'
+            print(f"{status['revision']}  {applied:<32}  {status['description']}")
+        return
+    
+    Base.metadata.create_all(engine)
+    applied = run_migrations(engine)
+    print(f"Applied {len(applied)} migration(s)")
+
+
+def cmd_backfill_card_state(engine, args):
+    """Rebuild card_state from the latest review of every (user, card)"""
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        count = backfill_card_state(connection)
+    print(f"Rebuilt card_state with {count} row(s)")
+
+
+def cmd_backfill_user_statistics(engine, args):
+    """Rebuild the daily statistics rollup from the review and session history"""
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        count = backfill_user_statistics(connection)
+    print(f"Rebuilt user_statistics with {count} row(s)")
+
+
+def cmd_reconcile_counters(engine, args):
+    """Reinstall the counter triggers and repair every counter that drifted"""
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        install_counter_triggers(connection)
+        decks, pods = reconcile_counters(connection)
+    print(f"Repaired the counters of {decks} deck(s) and {pods} pod(s)")
+
+
+def cmd_rebuild_card_search(engine, args):
+    """Reinstall the search index triggers and reindex every active card"""
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        install_card_search(connection)
+        count = rebuild_card_search(connection)
+    print(f"Rebuilt cards_fts with {count} card(s)")
+
+
+def cmd_reschedule(engine, args):
+    """Update scheduling parameters for one or all users and re-project their cards"""
+    changes = {
+        name: value for name, value in (
+            ('starting_ease', args.starting_ease),
+            ('interval_modifier', args.interval_modifier),
+            ('max_interval', args.max_interval)
+        ) if value is not None
+    }
+    changes, error = validate_params(changes)
+    if error:
+        sys.exit(error)
+    
+    with engine.connect() as connection:
+        query = select(User.id)
+        if args.user and args.user.isdigit():
+            query = query.filter(User.id == int(args.user))
+        elif args.user:
+            query = query.filter(User.username == args.user)
+        user_ids = connection.scalars(query.order_by(User.id)).all()
+    if not user_ids:
+        sys.exit(f"No user matches {args.user}")
+    
+    for user_id in user_ids:
+        # One transaction per user, so a large run never holds the write lock for long
+        with engine.begin() as connection:
+            summary = apply_scheduling_params(connection, user_id, changes)
+        print(f"User {user_id}: rescheduled {summary['updated']} of {summary['cards']} card(s) "
+              f"in {summary['elapsed_ms']}ms ({'numpy' if summary['vectorized'] else 'pure Python'})")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="FlashPod maintenance commands")
+    parser.add_argument("--database-url", default=None, help="Database URL (defaults to the server's DATABASE_URL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    migrate = commands.add_parser("migrate", help="Apply pending schema migrations")
+    migrate.add_argument("--status", action="store_true", help="List migrations without applying them")
+    migrate.set_defaults(handler=cmd_migrate)
+    
+    backfill = commands.add_parser("backfill-card-state", help="Rebuild card_state from the review history")
+    backfill.set_defaults(handler=cmd_backfill_card_state)
+    
+    statistics = commands.add_parser("backfill-user-statistics", help="Rebuild daily user statistics from history")
+    statistics.set_defaults(handler=cmd_backfill_user_statistics)
+    
+    counters = commands.add_parser("reconcile-counters", help="Recompute deck and pod counters and repair drift")
+    counters.set_defaults(handler=cmd_reconcile_counters)
+    
+    search = commands.add_parser("rebuild-card-search", help="Rebuild the card full-text search index")
+    search.set_defaults(handler=cmd_rebuild_card_search)
+    
+    reschedule = commands.add_parser("reschedule", help="Change scheduling parameters and reschedule collections")
+    target = reschedule.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user", help="Username or id of the user to reschedule")
+    target.add_argument("--all", action="store_true", help="Reschedule every user")
+    reschedule.add_argument("--starting-ease", type=float, help="Ease factor of a card's first review")
+    reschedule.add_argument("--interval-modifier", type=float, help="Multiplier for intervals after the first two")
+    reschedule.add_argument("--max-interval", type=int, help="Longest interval in days")
+    reschedule.set_defaults(handler=cmd_reschedule)
+    
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    engine = build_engine(args.database_url or db_config.get_database_url())
+    try:
+        args.handler(engine, args)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+
+class DatabaseConfig:
+    def __init__(self):
+        # SQLite PRAGMAs applied to every new connection
+        self.journal_mode = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+        self.synchronous = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+        self.mmap_size = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+        self.cache_size = int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))  # Negative values are KiB (64 MiB)
+        self.temp_store = os.getenv('SQLITE_TEMP_STORE', 'MEMORY')
+        self.busy_timeout = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # Milliseconds
+        self.foreign_keys = os.getenv('SQLITE_FOREIGN_KEYS', 'true').lower() == 'true'
+
+        # Connection pool sizing (per engine)
+        self.pool_size = int(os.getenv('DB_POOL_SIZE', '5'))
+        self.max_overflow = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+        self.pool_timeout = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+        self.pool_recycle = int(os.getenv('DB_POOL_RECYCLE', '3600'))
+
+        # Per-request query instrumentation (Server-Timing / X-Query-Count headers)
+        self.query_stats = os.getenv('QUERY_STATS', 'true').lower() == 'true'
+        self.slow_query_ms = float(os.getenv('SLOW_QUERY_MS', '100'))  # 0 disables the slow-query log
+
+        # Review write-behind queue (group commit of review inserts)
+        self.review_write_behind = os.getenv('REVIEW_WRITE_BEHIND', 'true').lower() == 'true'
+        self.review_batch_size = int(os.getenv('REVIEW_BATCH_SIZE', '100'))
+        self.review_batch_interval_ms = int(os.getenv('REVIEW_BATCH_INTERVAL_MS', '25'))
+        self.review_queue_size = int(os.getenv('REVIEW_QUEUE_SIZE', '1000'))
+        self.review_enqueue_timeout = float(os.getenv('REVIEW_ENQUEUE_TIMEOUT', '5'))  # Seconds before a full queue answers 503
+
+        # Session progress write-behind (progress updates coalesced in memory, flushed on a timer)
+        self.progress_write_behind = os.getenv('PROGRESS_WRITE_BEHIND', 'true').lower() == 'true'
+        self.progress_flush_interval_ms = int(os.getenv('PROGRESS_FLUSH_INTERVAL_MS', '2000'))  # Longest window a crash can lose
+
+    def get_database_url(self):
+        """Resolve the database URL for this environment"""
+        # For containers: always use /data/flashpod.db (simple for self-hosters)
+        # For development: use ./data/flashpod.db (relative path)
+        if os.path.exists('/data'):
+            # Running in container - use absolute path to bind mount
+            return "sqlite:////data/flashpod.db"
+        # Running in development - use relative path
+        return os.getenv("DATABASE_URL", "sqlite:///./data/flashpod.db")
+
+    def get_sqlite_pragmas(self):
+        """Get PRAGMA name/value pairs in the order they should be applied"""
+        return [
+            ('journal_mode', self.journal_mode),
+            ('synchronous', self.synchronous),
+            ('mmap_size', self.mmap_size),
+            ('cache_size', self.cache_size),
+            ('temp_store', self.temp_store),
+            ('busy_timeout', self.busy_timeout),
+            ('foreign_keys', 'ON' if self.foreign_keys else 'OFF')
+        ]
+
+    def get_pool_options(self):
+        """Get keyword arguments for create_engine pool configuration"""
+        return {
+            'pool_size': self.pool_size,
+            'max_overflow': self.max_overflow,
+            'pool_timeout': self.pool_timeout,
+            'pool_recycle': self.pool_recycle,
+            'pool_pre_ping': True
+        }
+
+# Global database config instance
+db_config = DatabaseConfig()
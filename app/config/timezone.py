@@ -1,6 +1,6 @@
 import os
 import pytz
-from datetime import datetime, timezone as dt_timezone
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 
 class TimezoneConfig:
     def __init__(self):
@@ -23,6 +23,15 @@ class TimezoneConfig:
             utc_dt = utc_dt.replace(tzinfo=dt_timezone.utc)
         return utc_dt.astimezone(self.timezone)
     
+    def local_date_start_utc(self, local_date):
+        """Get the start of a local calendar date as a naive UTC datetime, matching stored timestamps"""
+        local_start = self.timezone.localize(datetime.combine(local_date, time.min))
+        return local_start.astimezone(dt_timezone.utc).replace(tzinfo=None)
+    
+    def day_start_utc(self, offset_days=0):
+        """Get the start of a local day (today + offset_days) as a naive UTC datetime"""
+        return self.local_date_start_utc(self.now().date() + timedelta(days=offset_days))
+    
     def get_timezone_info(self):
         """Get timezone info for frontend"""
         return {
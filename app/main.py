@@ -14,7 +14,15 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from . import get_version, get_app_info
 
 # Import models and routes
-from models.database import init_database, cleanup_database
+from models.database import init_database, cleanup_database, close_request_session, begin_query_stats, end_query_stats
+from config.database import db_config
+from utils.review_queue import review_queue
+from utils.progress_buffer import progress_buffer
+from utils.user_cache import user_cache
+from utils.forecast import forecast_cache
+from utils.session_cache import session_cache
+from utils.dashboard_cache import dashboard_cache
+from utils.password_hasher import password_hasher
 from routes.auth import auth_bp
 from routes.decks import decks_bp
 from routes.cards import cards_bp
@@ -23,6 +31,7 @@ from routes.study import study_bp
 from routes.card_reviews import card_reviews
 from routes.config import config_bp
 from routes.dashboard import dashboard_bp
+from routes.admin import admin_bp
 
 # Import auth decorator and helpers
 try:
@@ -36,7 +45,7 @@ except ImportError as e:
     def require_auth(f):
         return f
     
-    def get_user_from_request(request):
+    async def get_user_from_request(request):
         return None
 
 def create_app():
@@ -46,7 +55,7 @@ def create_app():
     
     # Configure sanic-ext with CORS
     app.config.CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*")
-    app.config.CORS_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+    app.config.CORS_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
     app.config.CORS_ALLOW_HEADERS = ["Content-Type", "Authorization"]
 
     PROJECT_ROOT = Path(__file__).parent.parent
@@ -56,19 +65,14 @@ def create_app():
     Extend(app)
     
     # Configuration from environment variables
-    # For containers: always use /data/flashpod.db (simple for self-hosters)
-    # For development: use ./data/flashpod.db (relative path)
-    if os.path.exists('/data'):
-        # Running in container - use absolute path to bind mount
-        app.config.DATABASE_URL = "sqlite:////data/flashpod.db"
-    else:
-        # Running in development - use relative path
-        app.config.DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/flashpod.db")
+    app.config.DATABASE_URL = db_config.get_database_url()
     
     app.config.SECRET_KEY = os.getenv("SECRET_KEY", "change-this-secure-secret-key")
     app.config.JWT_SECRET = os.getenv("JWT_SECRET", "change-this-secure-jwt-secret-key")
     app.config.JWT_EXPIRATION_HOURS = int(os.getenv("JWT_EXPIRATION_HOURS", "24"))
     app.config.DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+    # Non-blocking aiosqlite sessions for request handlers; set to false to fall back to sync sessions
+    app.config.DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "true").lower() == "true"
 
     # Static files
     app.static("/static", str(PROJECT_ROOT / "static"))
@@ -81,7 +85,7 @@ def create_app():
     @app.route("/")
     async def index(request):
         # Check if user is already authenticated
-        user = get_user_from_request(request)
+        user = await get_user_from_request(request)
         if user:
             return response.redirect("/dashboard")
         return response.redirect("/login")
@@ -92,7 +96,7 @@ def create_app():
         print(f"🍪 Cookies: {dict(request.cookies)}")
         
         # If already authenticated, redirect to dashboard
-        user = get_user_from_request(request)
+        user = await get_user_from_request(request)
         if user:
             print(f"✅ User already authenticated: {user}")
             return response.redirect("/dashboard")
@@ -104,7 +108,7 @@ def create_app():
     @app.route("/register")
     async def register_page(request):
         # If already authenticated, redirect to dashboard
-        user = get_user_from_request(request)
+        user = await get_user_from_request(request)
         if user:
             return response.redirect("/dashboard")
         return await response.file_stream(f"{app.config.TEMPLATE_PATH}/register.html")
@@ -182,12 +186,31 @@ def create_app():
     app.blueprint(card_reviews)
     app.blueprint(config_bp)
     app.blueprint(dashboard_bp)
+    app.blueprint(admin_bp)
     
     # Middleware for content types only
     @app.middleware('response')
     async def add_headers(request, response):
         if request.path.endswith('.css'):
             response.headers['Content-Type'] = 'text/css'
+    
+    # Count the queries each request issues
+    @app.middleware('request')
+    async def start_query_stats(request):
+        if db_config.query_stats:
+            request.ctx.query_stats = begin_query_stats(f"{request.method} {request.path}")
+    
+    @app.middleware('response')
+    async def add_query_stats_headers(request, response):
+        stats = getattr(request.ctx, 'query_stats', None)
+        if stats is not None and end_query_stats() is stats:
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['Server-Timing'] = stats.server_timing()
+    
+    # Release the request-scoped database session once the response is ready
+    @app.middleware('response')
+    async def close_db_session(request, response):
+        await close_request_session(request)
 
     # Debug endpoints (only in debug mode)
     if app.config.DEBUG:
@@ -201,19 +224,39 @@ def create_app():
                 "version": get_version(),
                 "config": {
                     "DATABASE_URL": app.config.DATABASE_URL,
+                    "DATABASE_ASYNC": app.config.DATABASE_ASYNC,
                     "DEBUG": app.config.DEBUG,
                     "JWT_EXPIRATION_HOURS": app.config.JWT_EXPIRATION_HOURS
+                },
+                "caches": {
+                    "users": user_cache.stats(),
+                    "forecasts": forecast_cache.stats(),
+                    "sessions": session_cache.stats(),
+                    "dashboard": dashboard_cache.stats()
                 }
             })
 
+        @app.route("/api/debug/db")
+        async def debug_database(request):
+            from models.database import get_request_session, get_database_report
+            
+            try:
+                report = await get_database_report(get_request_session(request))
+                report['review_queue'] = review_queue.stats()
+                report['progress_buffer'] = progress_buffer.stats()
+                return json(report)
+            except Exception as e:
+                return json({"error": str(e)})
+
         @app.route("/api/debug/users")
         async def debug_all_users(request):
-            from models.database import get_db_session
+            from sqlalchemy import select
+            from models.database import get_request_session
             from models.user import User
             
-            session = get_db_session()
+            session = get_request_session(request)
             try:
-                users = session.query(User).all()
+                users = (await session.scalars(select(User))).all()
                 users_data = []
                 for user in users:
                     users_data.append({
@@ -229,20 +272,19 @@ def create_app():
                 })
             except Exception as e:
                 return json({"error": str(e)})
-            finally:
-                session.close()
 
         @app.route("/api/debug/testuser")
         async def debug_testuser(request):
-            from models.database import get_db_session, verify_password
+            from sqlalchemy import select
+            from models.database import get_request_session
             from models.user import User
             
-            session = get_db_session()
+            session = get_request_session(request)
             try:
-                user = session.query(User).filter_by(username="testuser").first()
+                user = await session.scalar(select(User).filter_by(username="testuser"))
                 if user:
                     # Test password verification
-                    password_works = verify_password("password123", user.password_hash)
+                    password_works = await password_hasher.verify("password123", user.password_hash)
                     return json({
                         "user_exists": True,
                         "user_id": user.id,
@@ -256,8 +298,6 @@ def create_app():
                     return json({"user_exists": False})
             except Exception as e:
                 return json({"error": str(e)})
-            finally:
-                session.close()
     
     # Database initialization
     @app.before_server_start
@@ -282,14 +322,23 @@ def create_app():
             data_dir.mkdir(parents=True, exist_ok=True)
             print(f"📁 Database directory: {data_dir.absolute()}")
         
-        init_database(app.config.DATABASE_URL)
+        init_database(app.config.DATABASE_URL, use_async=app.config.DATABASE_ASYNC)
         print(f"✅ Database initialized: {app.config.DATABASE_URL}")
+        
+        if db_config.review_write_behind:
+            await review_queue.start()
+        if db_config.progress_write_behind:
+            await progress_buffer.start()
         print(f"📦 FlashPod v{get_version()} starting...")
     
     # Cleanup on shutdown
     @app.after_server_stop
     async def cleanup_database_connections(app, loop):
-        cleanup_database()
+        # Commit queued reviews and buffered progress before the engines go away
+        await review_queue.stop()
+        await progress_buffer.stop()
+        password_hasher.shutdown()
+        await cleanup_database()
         print("🧹 Database connections cleaned up")
         print(f"📦 FlashPod v{get_version()} stopped")
     
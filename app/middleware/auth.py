@@ -6,8 +6,13 @@ from sanic.response import json
 import jwt
 import os
 from datetime import datetime, timedelta, timezone
-from models.database import get_db_session
+from sqlalchemy import select
+from models.database import get_request_session
 from models.user import User
+from utils.user_cache import user_cache
+
+# Marks request.ctx.auth_user as not yet resolved (None means "not authenticated")
+_UNRESOLVED = object()
 
 # Routes that don't require authentication
 PUBLIC_ROUTES = {
@@ -46,8 +51,16 @@ def verify_jwt_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         return None  # Invalid token
 
-def get_user_from_request(request) -> dict:
-    """Extract user from request authentication"""
+async def get_user_from_request(request) -> dict:
+    """Extract user from request authentication (resolved once per request)"""
+    user = getattr(request.ctx, 'auth_user', _UNRESOLVED)
+    if user is _UNRESOLVED:
+        user = await _authenticate(request)
+        request.ctx.auth_user = user
+    return user
+
+async def _authenticate(request) -> dict:
+    """Decode the request's token and load its active user"""
     # Check for JWT token in cookie
     token = request.cookies.get('auth_token')
     
@@ -65,24 +78,27 @@ def get_user_from_request(request) -> dict:
     if not payload:
         return None
     
+    # Active users are cached; the cache is invalidated when a user changes
+    cached = user_cache.get(payload['user_id'])
+    if cached is not None:
+        return dict(cached)
+    
     # Verify user still exists and is active
-    session = get_db_session()
-    try:
-        user = session.query(User).filter_by(
-            id=payload['user_id'], 
-            is_active=True
-        ).first()
-        
-        if not user:
-            return None
-        
-        return {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email
-        }
-    finally:
-        session.close()
+    session = get_request_session(request)
+    user = await session.scalar(
+        select(User).filter_by(id=payload['user_id'], is_active=True)
+    )
+    
+    if not user:
+        return None
+    
+    user_data = {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email
+    }
+    user_cache.set(user.id, user_data)
+    return dict(user_data)
 
 def is_public_route(path: str) -> bool:
     """Check if route is public (doesn't require auth)"""
@@ -106,7 +122,7 @@ async def auth_middleware(request):
         return
     
     # Get user from request
-    user = get_user_from_request(request)
+    user = await get_user_from_request(request)
     
     # Check if authentication is required
     if not user:
@@ -123,7 +139,7 @@ async def auth_middleware(request):
 def require_auth(f):
     """Decorator to require authentication for specific routes"""
     async def wrapper(request, *args, **kwargs):
-        user = get_user_from_request(request)
+        user = await get_user_from_request(request)
         if not user:
             if request.path.startswith('/api/'):
                 return json({'error': 'Authentication required'}, status=401)
@@ -136,6 +152,21 @@ def require_auth(f):
     wrapper.__name__ = f.__name__
     return wrapper
 
+def require_admin(f):
+    """Decorator to restrict a route to the users listed in ADMIN_USERNAMES"""
+    async def wrapper(request, *args, **kwargs):
+        user = await get_user_from_request(request)
+        if not user:
+            return json({'error': 'Authentication required'}, status=401)
+        if user['username'] not in ADMIN_USERNAMES:
+            return json({'error': 'Admin access required'}, status=403)
+        
+        request.ctx.user = user
+        return await f(request, *args, **kwargs)
+    
+    wrapper.__name__ = f.__name__
+    return wrapper
+
 
 def ensure_secure_secrets():
     """Ensure JWT_SECRET is secure, generate if needed"""
@@ -171,6 +202,9 @@ def ensure_secure_secrets():
 JWT_SECRET = os.getenv("JWT_SECRET", "change-this-secure-jwt-secret-key")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRATION_HOURS = int(os.getenv("JWT_EXPIRATION_HOURS", "24"))
+
+# Usernames allowed to call /api/admin routes (comma separated; empty disables them)
+ADMIN_USERNAMES = {name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()}
 ensure_secure_secrets()
 
 # Warn if default secrets are being used
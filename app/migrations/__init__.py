@@ -0,0 +1,10 @@
+# app/migrations/__init__.py
+from .runner import run_migrations, get_migration_status, migration, MIGRATIONS
+from . import revisions
+
+__all__ = [
+    'run_migrations',
+    'get_migration_status',
+    'migration',
+    'MIGRATIONS'
+]
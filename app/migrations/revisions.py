@@ -0,0 +1,143 @@
+# app/migrations/revisions.py
+"""
+Schema revisions, applied in order by the migration runner.
+Upgrades must be idempotent: fresh databases already get new tables and columns from create_all.
+"""
+
+from sqlalchemy import inspect, text
+from .runner import migration
+from models.card_search import install_card_search, rebuild_card_search
+from models.card_state import backfill_card_state
+from models.counters import install_counter_triggers, reconcile_counters
+from models.user_statistics import backfill_user_statistics
+
+
+@migration('0001', 'Add cards.display_order and number existing cards by creation time')
+def add_card_display_order(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('cards')}
+    if 'display_order' in columns:
+        return
+    
+    connection.execute(text("ALTER TABLE cards ADD COLUMN display_order INTEGER DEFAULT 0"))
+    
+    # Position of each active card within its deck, ordered by creation time
+    connection.execute(text("""
+        UPDATE cards
+        SET display_order = (
+            SELECT COUNT(*)
+            FROM cards AS earlier
+            WHERE earlier.deck_id = cards.deck_id
+              AND earlier.is_active = 1
+              AND (earlier.created_at < cards.created_at
+                   OR (earlier.created_at = cards.created_at AND earlier.id < cards.id))
+        )
+        WHERE is_active = 1
+    """))
+
+
+# Indexes matched to the queries the routes actually issue
+HOT_PATH_INDEXES = [
+    # Latest review per card for a user; also serves every user_id-only filter
+    ('idx_card_reviews_user_card_reviewed', 'card_reviews', 'user_id, card_id, reviewed_at DESC'),
+    # 30-day retention windows per user
+    ('idx_card_reviews_user_reviewed', 'card_reviews', 'user_id, reviewed_at'),
+    # Card-only lookups (pod due counts) and cascading deletes
+    ('idx_card_reviews_card_id', 'card_reviews', 'card_id'),
+    # Pod retention by session
+    ('idx_card_reviews_session_id', 'card_reviews', 'session_id'),
+    # Active cards of a deck in display order
+    ('idx_cards_deck_active_order', 'cards', 'deck_id, is_active, display_order'),
+    # Latest completed session by mode, completed-session statistics
+    ('idx_study_sessions_user_ended_mode', 'study_sessions', 'user_id, ended_at, mode'),
+    # Open session lookup for a deck or pod
+    ('idx_study_sessions_user_deck', 'study_sessions', 'user_id, deck_id'),
+    ('idx_study_sessions_user_pod', 'study_sessions', 'user_id, pod_id'),
+    # Recent sessions of a pod
+    ('idx_study_sessions_pod_started', 'study_sessions', 'pod_id, started_at'),
+    # Library listings ordered by creation time
+    ('idx_decks_user_created', 'decks', 'user_id, created_at'),
+    ('idx_pods_user_created', 'pods', 'user_id, created_at'),
+    # Pod memberships of a deck (pod_id lookups use the unique_pod_deck constraint)
+    ('idx_pod_decks_deck_id', 'pod_decks', 'deck_id'),
+]
+
+
+@migration('0002', 'Create hot-path indexes for reviews, cards, sessions and libraries')
+def create_hot_path_indexes(connection):
+    for name, table, columns in HOT_PATH_INDEXES:
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+    
+    # Refresh planner statistics so the new indexes are picked up immediately
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text("ANALYZE"))
+
+
+@migration('0003', 'Backfill card_state from the latest review of every card')
+def backfill_card_state_table(connection):
+    # create_all has already made the (empty) table; seed it from the review history
+    backfill_card_state(connection)
+
+
+# Columns added to study_sessions for windowed card delivery
+STUDY_SESSION_WINDOW_COLUMNS = [
+    ('card_order', 'JSON'),
+    ('shuffle_seed', 'INTEGER'),
+    ('current_index', 'INTEGER DEFAULT 0'),
+]
+
+
+@migration('0004', 'Add study_sessions card order, shuffle seed and position for windowed delivery')
+def add_study_session_window_columns(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('study_sessions')}
+    for name, definition in STUDY_SESSION_WINDOW_COLUMNS:
+        if name not in columns:
+            connection.execute(text(f"ALTER TABLE study_sessions ADD COLUMN {name} {definition}"))
+
+
+@migration('0005', 'Add card_reviews.client_review_id with a unique index per user')
+def add_card_review_client_id(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('card_reviews')}
+    if 'client_review_id' not in columns:
+        connection.execute(text("ALTER TABLE card_reviews ADD COLUMN client_review_id VARCHAR(64)"))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_card_reviews_user_client_id ON card_reviews (user_id, client_review_id)"
+    ))
+
+
+# Columns of user_statistics beyond the original db_schema.sql definition
+USER_STATISTICS_COLUMNS = [
+    ('cards_correct', 'INTEGER DEFAULT 0'),
+    ('retention_points', 'INTEGER DEFAULT 0'),
+    ('sessions_completed', 'INTEGER DEFAULT 0'),
+]
+
+
+@migration('0006', 'Add user_statistics rollup columns and backfill daily statistics from history')
+def backfill_user_statistics_table(connection):
+    # Databases created from db_schema.sql already have the table without the rollup columns
+    columns = {column['name'] for column in inspect(connection).get_columns('user_statistics')}
+    for name, definition in USER_STATISTICS_COLUMNS:
+        if name not in columns:
+            connection.execute(text(f"ALTER TABLE user_statistics ADD COLUMN {name} {definition}"))
+    backfill_user_statistics(connection)
+
+
+@migration('0007', 'Install deck and pod counter triggers and repair drifted counters')
+def install_counter_maintenance(connection):
+    # Replaces the db_schema.sql triggers of the same name (which miscounted deleting inactive cards)
+    install_counter_triggers(connection)
+    reconcile_counters(connection)
+
+
+@migration('0008', 'Create the cards_fts full-text index with its sync triggers and index existing cards')
+def create_card_search_index(connection):
+    install_card_search(connection)
+    rebuild_card_search(connection)
+
+
+@migration('0009', 'Add decks.version and install the triggers that bump it on card changes')
+def add_deck_version(connection):
+    columns = {column['name'] for column in inspect(connection).get_columns('decks')}
+    if 'version' not in columns:
+        connection.execute(text("ALTER TABLE decks ADD COLUMN version INTEGER DEFAULT 0"))
+    install_counter_triggers(connection)
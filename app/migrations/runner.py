@@ -0,0 +1,106 @@
+# app/migrations/runner.py
+"""
+Versioned schema migrations.
+Each applied revision is recorded in the schema_migrations table so it runs once per database.
+"""
+
+from datetime import datetime, timezone
+from sqlalchemy import MetaData, Table, Column, String, DateTime, select, insert
+from sqlalchemy.exc import IntegrityError
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations',
+    metadata,
+    Column('revision', String(32), primary_key=True),
+    Column('description', String(255)),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+# Registered migrations, populated by the @migration decorator in revisions.py
+MIGRATIONS = []
+
+
+class Migration:
+    def __init__(self, revision, description, upgrade):
+        self.revision = revision
+        self.description = description
+        self.upgrade = upgrade
+
+    def __repr__(self):
+        return f"<Migration(revision='{self.revision}', description='{self.description}')>"
+
+
+def migration(revision, description):
+    """Register a function as the upgrade step for a schema revision"""
+    def register(upgrade):
+        if any(m.revision == revision for m in MIGRATIONS):
+            raise ValueError(f"Duplicate migration revision: {revision}")
+        MIGRATIONS.append(Migration(revision, description, upgrade))
+        return upgrade
+    return register
+
+
+def get_applied_revisions(connection):
+    """Get the set of revisions already applied to this database"""
+    return set(connection.scalars(select(schema_migrations.c.revision)))
+
+
+def run_migrations(engine):
+    """
+    Apply all pending migrations in revision order.
+    Each migration runs in its own transaction together with its schema_migrations row.
+    Returns the list of revisions applied by this call.
+    """
+    metadata.create_all(engine)
+    
+    with engine.connect() as connection:
+        applied = get_applied_revisions(connection)
+    
+    pending = [m for m in sorted(MIGRATIONS, key=lambda m: m.revision) if m.revision not in applied]
+    if not pending:
+        print("✅ Database schema is up to date")
+        return []
+    
+    applied_now = []
+    for pending_migration in pending:
+        try:
+            with engine.begin() as connection:
+                pending_migration.upgrade(connection)
+                connection.execute(insert(schema_migrations).values(
+                    revision=pending_migration.revision,
+                    description=pending_migration.description,
+                    applied_at=datetime.now(timezone.utc)
+                ))
+        except IntegrityError:
+            # Another worker applied the same revision concurrently; migrations are idempotent
+            with engine.connect() as connection:
+                if pending_migration.revision not in get_applied_revisions(connection):
+                    raise
+            print(f"⏭️  Migration {pending_migration.revision} already applied by another worker")
+            continue
+        
+        applied_now.append(pending_migration.revision)
+        print(f"🔧 Applied migration {pending_migration.revision}: {pending_migration.description}")
+    
+    return applied_now
+
+
+def get_migration_status(engine):
+    """Get every known migration with its applied timestamp (None if pending)"""
+    metadata.create_all(engine)
+    
+    with engine.connect() as connection:
+        applied_at = dict(connection.execute(
+            select(schema_migrations.c.revision, schema_migrations.c.applied_at)
+        ).all())
+    
+    return [
+        {
+            'revision': m.revision,
+            'description': m.description,
+            'applied_at': applied_at.get(m.revision)
+        }
+        for m in sorted(MIGRATIONS, key=lambda m: m.revision)
+    ]
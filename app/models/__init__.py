@@ -1,5 +1,5 @@
 # app/models/__init__.py
-from .database import Base, init_database, get_db_session, hash_password, verify_password
+from .database import Base, init_database, get_db_session, get_request_session, hash_password, verify_password
 from .user import User
 from .deck import Deck
 from .card import Card
@@ -7,11 +7,14 @@ from .pod import Pod
 from .pod_deck import PodDeck
 from .study_session import StudySession
 from .card_review import CardReview
+from .card_state import CardState
+from .user_statistics import UserStatistics
 
 __all__ = [
     'Base',
     'init_database',
     'get_db_session',
+    'get_request_session',
     'hash_password',
     'verify_password',
     'User',
@@ -20,5 +23,7 @@ __all__ = [
     'Pod',
     'PodDeck',
     'StudySession',
-    'CardReview'
+    'CardReview',
+    'CardState',
+    'UserStatistics'
 ]
\ No newline at end of file
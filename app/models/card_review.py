@@ -1,9 +1,10 @@
 # app/models/card_review.py
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from .database import Base
+from utils.scheduler import next_state
 
 class CardReview(Base):
     __tablename__ = 'card_reviews'
@@ -19,6 +20,12 @@ class CardReview(Base):
     interval_days = Column(Integer, default=1)  # Days until next review
     next_review_date = Column(DateTime, nullable=True)
     repetitions = Column(Integer, default=0)  # Number of successful repetitions
+    client_review_id = Column(String(64), nullable=True)  # Client-generated id for idempotent batch submissions
+    
+    __table_args__ = (
+        # One review per client review id and user (NULLs never collide)
+        Index('idx_card_reviews_user_client_id', 'user_id', 'client_review_id', unique=True),
+    )
     
     # Relationships
     card = relationship("Card", back_populates="card_reviews")
@@ -41,32 +48,16 @@ class CardReview(Base):
             "ease_factor": self.ease_factor,
             "interval_days": self.interval_days,
             "next_review_date": self.next_review_date.isoformat() if self.next_review_date else None,
-            "repetitions": self.repetitions
+            "repetitions": self.repetitions,
+            "client_review_id": self.client_review_id
         }
     
     def calculate_next_review(self):
         """Calculate next review date using spaced repetition algorithm (SuperMemo-2)"""
-        if self.response_quality < 3:
-            # Failed review - reset
-            self.repetitions = 0
-            self.interval_days = 1
-        else:
-            # Successful review
-            if self.repetitions == 0:
-                self.interval_days = 1
-            elif self.repetitions == 1:
-                self.interval_days = 6
-            else:
-                self.interval_days = round(self.interval_days * self.ease_factor)
-            
-            self.repetitions += 1
-        
-        # Adjust ease factor based on response quality
-        self.ease_factor = max(1.3, 
-            self.ease_factor + (0.1 - (5 - self.response_quality) * (0.08 + (5 - self.response_quality) * 0.02))
-        )
-        
-        # Set next review date
-        self.next_review_date = datetime.now(timezone.utc) + timedelta(days=self.interval_days)
+        state = next_state(self.response_quality, self.ease_factor, self.interval_days, self.repetitions)
+        self.ease_factor = state['ease_factor']
+        self.interval_days = state['interval_days']
+        self.repetitions = state['repetitions']
+        self.next_review_date = state['next_review_date']
         
-        return self.next_review_date
\ No newline at end of file
+        return self.next_review_date
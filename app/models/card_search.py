@@ -0,0 +1,170 @@
+# app/models/card_search.py
+"""
+Full-text search over cards (SQLite FTS5).
+
+cards_fts holds one row per active card (rowid = card id): its owner token
+('u<user id>'), front_content, back_content and tags. Like the counters
+(models/counters.py), it is kept in sync by triggers on cards, so inserts,
+edits, soft deletes, restores and moves between decks update the index in
+the same transaction whatever wrote them. Inactive cards are not indexed.
+
+Searches are scoped to one user by matching the owner token in the same
+MATCH expression, ranked with BM25 (front weighted over back over tags) and
+paginated with a (score, card id) keyset. Highlights are cut from the page's
+own cards in Python: FTS5's snippet() evaluates the whole MATCH again, which
+costs as much as the search itself for common words. rebuild_card_search()
+repopulates the index from the cards table.
+"""
+
+import html
+import re
+import unicodedata
+from sqlalchemy import text
+
+# BM25 weights per column: owner, front_content, back_content, tags
+BM25_WEIGHTS = (0.0, 10.0, 5.0, 2.0)
+SNIPPET_TOKENS = 16
+
+CARD_SEARCH_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+        owner, front_content, back_content, tags,
+        prefix='2 3 4',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+# The deck's owner is looked up when a card is (re)indexed; decks never change owner
+_INDEX_NEW_CARD = """
+            INSERT INTO cards_fts (rowid, owner, front_content, back_content, tags)
+            SELECT NEW.id, 'u' || decks.user_id, NEW.front_content, NEW.back_content, coalesce(NEW.tags, '')
+            FROM decks WHERE decks.id = NEW.deck_id AND NEW.is_active;
+"""
+
+CARD_SEARCH_TRIGGERS = {
+    'cards_fts_insert': f"""
+        CREATE TRIGGER cards_fts_insert
+            AFTER INSERT ON cards
+            WHEN NEW.is_active
+        BEGIN
+            {_INDEX_NEW_CARD.strip()}
+        END
+    """,
+    'cards_fts_delete': """
+        CREATE TRIGGER cards_fts_delete
+            AFTER DELETE ON cards
+            WHEN OLD.is_active
+        BEGIN
+            DELETE FROM cards_fts WHERE rowid = OLD.id;
+        END
+    """,
+    # Edits, soft deletes, restores and moves between decks
+    'cards_fts_update': f"""
+        CREATE TRIGGER cards_fts_update
+            AFTER UPDATE OF front_content, back_content, tags, is_active, deck_id ON cards
+        BEGIN
+            DELETE FROM cards_fts WHERE rowid = OLD.id;
+            {_INDEX_NEW_CARD.strip()}
+        END
+    """,
+}
+
+_SEARCH_TERM = re.compile(r'\w+\*?')
+_TOKEN = re.compile(r'\w+')
+
+
+def install_card_search(connection):
+    """Create the cards_fts table if needed and (re)create its triggers"""
+    connection.execute(text(CARD_SEARCH_TABLE))
+    for name, definition in CARD_SEARCH_TRIGGERS.items():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(definition))
+
+
+def rebuild_card_search(connection):
+    """Repopulate cards_fts from every active card; returns the number of indexed cards"""
+    connection.execute(text("DELETE FROM cards_fts"))
+    connection.execute(text("""
+        INSERT INTO cards_fts (rowid, owner, front_content, back_content, tags)
+        SELECT cards.id, 'u' || decks.user_id, cards.front_content, cards.back_content, coalesce(cards.tags, '')
+        FROM cards JOIN decks ON decks.id = cards.deck_id
+        WHERE cards.is_active
+    """))
+    connection.execute(text("INSERT INTO cards_fts (cards_fts) VALUES ('optimize')"))
+    return connection.scalar(text("SELECT count(*) FROM cards_fts"))
+
+
+def search_terms(query):
+    """
+    The query's words as (word, is_prefix): every word must appear in the card's content
+    or tags; the last word (and any word ending in *) matches as a prefix.
+    """
+    terms = _SEARCH_TERM.findall(query)
+    return [
+        (term.rstrip('*'), term.endswith('*') or index == len(terms) - 1)
+        for index, term in enumerate(terms)
+    ]
+
+
+def match_expression(user_id, terms):
+    """FTS5 MATCH expression for a user's search_terms(), or None when there are none"""
+    if not terms:
+        return None
+    words = ' '.join(f'"{word}"' + ('*' if prefix else '') for word, prefix in terms)
+    return f'owner : "u{int(user_id)}" AND {{front_content back_content tags}} : ({words})'
+
+
+def ranked_search(match, limit, after=None):
+    """
+    Statement for one page of (card_id, score), best first.
+    after is the (score, card_id) of the previous page's last row.
+    """
+    bm25 = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    keyset = "WHERE score > :after_score OR (score = :after_score AND card_id > :after_id)" if after else ""
+    statement = text(f"""
+        SELECT card_id, score FROM (
+            SELECT rowid AS card_id, bm25(cards_fts, {bm25}) AS score
+            FROM cards_fts WHERE cards_fts MATCH :match
+        )
+        {keyset}
+        ORDER BY score, card_id
+        LIMIT :limit
+    """)
+    params = {'match': match, 'limit': limit}
+    if after:
+        params.update(after_score=after[0], after_id=after[1])
+    return statement.bindparams(**params)
+
+
+def _fold(token):
+    """A token as the unicode61 tokenizer indexes it: case-folded, diacritics removed"""
+    decomposed = unicodedata.normalize('NFKD', token.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def highlight(content, terms, tokens=SNIPPET_TOKENS):
+    """
+    HTML snippet of content around its first matching word, at most tokens words long,
+    with the words matching terms wrapped in <mark>; None when nothing in it matches.
+    """
+    words = [(_fold(word), prefix) for word, prefix in terms]
+    spans = list(_TOKEN.finditer(content or ''))
+    hits = [
+        index for index, span in enumerate(spans)
+        if any(_fold(span.group()).startswith(word) if prefix else _fold(span.group()) == word for word, prefix in words)
+    ]
+    if not hits:
+        return None
+    
+    first = max(0, min(hits[0] - tokens // 4, len(spans) - tokens))
+    last = min(len(spans), first + tokens)
+    marked = set(hits)
+    parts = ['…'] if first > 0 else []
+    position = spans[first].start() if first > 0 else 0
+    for index in range(first, last):
+        span = spans[index]
+        parts.append(html.escape(content[position:span.start()]))
+        word = html.escape(span.group())
+        parts.append(f"<mark>{word}</mark>" if index in marked else word)
+        position = span.end()
+    parts.append(html.escape(content[position:]) if last == len(spans) else '…')
+    return ''.join(parts)
@@ -0,0 +1,95 @@
+# app/models/card_state.py
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Float, Index, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .database import Base
+
+class CardState(Base):
+    """Current spaced repetition state of a card for a user (mirrors their latest review)"""
+    __tablename__ = 'card_state'
+    
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    card_id = Column(Integer, ForeignKey('cards.id', ondelete='CASCADE'), primary_key=True)
+    last_review_id = Column(Integer, ForeignKey('card_reviews.id', ondelete='SET NULL'), nullable=True)
+    session_id = Column(Integer, nullable=True)
+    response_quality = Column(Integer, nullable=True)
+    response_time = Column(Integer, nullable=True)
+    ease_factor = Column(Float, default=2.5)
+    interval_days = Column(Integer, default=1)
+    repetitions = Column(Integer, default=0)
+    next_review_date = Column(DateTime, nullable=True)
+    last_reviewed_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Due-card range scans per user
+        Index('idx_card_state_user_next_review', 'user_id', 'next_review_date'),
+        Index('idx_card_state_card_id', 'card_id'),
+    )
+    
+    def __repr__(self):
+        return f"<CardState(user_id={self.user_id}, card_id={self.card_id}, next_review={self.next_review_date})>"
+    
+    def to_dict(self):
+        """Convert to dictionary in the same shape as the latest CardReview"""
+        return {
+            "id": self.last_review_id,
+            "card_id": self.card_id,
+            "user_id": self.user_id,
+            "session_id": self.session_id,
+            "reviewed_at": self.last_reviewed_at.isoformat() if self.last_reviewed_at else None,
+            "response_quality": self.response_quality,
+            "response_time": self.response_time,
+            "ease_factor": self.ease_factor,
+            "interval_days": self.interval_days,
+            "next_review_date": self.next_review_date.isoformat() if self.next_review_date else None,
+            "repetitions": self.repetitions
+        }
+
+def card_state_upsert(review):
+    """
+    Build an upsert that moves a card's state to the given (flushed) review.
+    Older reviews never overwrite newer state, so out-of-order writes are safe.
+    """
+    values = {
+        'user_id': review.user_id,
+        'card_id': review.card_id,
+        'last_review_id': review.id,
+        'session_id': review.session_id,
+        'response_quality': review.response_quality,
+        'response_time': review.response_time,
+        'ease_factor': review.ease_factor,
+        'interval_days': review.interval_days,
+        'repetitions': review.repetitions,
+        'next_review_date': review.next_review_date,
+        'last_reviewed_at': review.reviewed_at
+    }
+    statement = sqlite_insert(CardState).values(**values)
+    return statement.on_conflict_do_update(
+        index_elements=[CardState.user_id, CardState.card_id],
+        set_={name: statement.excluded[name] for name in values if name not in ('user_id', 'card_id')},
+        where=CardState.last_reviewed_at.is_(None) | (CardState.last_reviewed_at <= statement.excluded.last_reviewed_at)
+    )
+
+# Latest review per (user, card); ties on reviewed_at go to the highest review id
+BACKFILL_SQL = """
+    INSERT INTO card_state (
+        user_id, card_id, last_review_id, session_id, response_quality, response_time,
+        ease_factor, interval_days, repetitions, next_review_date, last_reviewed_at
+    )
+    SELECT user_id, card_id, id, session_id, response_quality, response_time,
+           ease_factor, interval_days, repetitions, next_review_date, reviewed_at
+    FROM (
+        SELECT card_reviews.*,
+               ROW_NUMBER() OVER (
+                   PARTITION BY user_id, card_id
+                   ORDER BY reviewed_at DESC, id DESC
+               ) AS position
+        FROM card_reviews
+    ) AS ranked
+    WHERE position = 1
+"""
+
+def backfill_card_state(connection):
+    """Rebuild card_state from the full review history in one set-based pass; returns the row count"""
+    connection.execute(text("DELETE FROM card_state"))
+    connection.execute(text(BACKFILL_SQL))
+    return connection.execute(text("SELECT COUNT(*) FROM card_state")).scalar()
@@ -0,0 +1,187 @@
+# app/models/counters.py
+"""
+Denormalized counters: Deck.card_count (active cards in the deck), Pod.deck_count
+and Pod.total_card_count (card_count summed over the pod's decks), and
+Deck.version, bumped by every insert, update or delete of one of the deck's
+cards so clients can tell whether the deck changed since they loaded it.
+
+The counters are maintained by SQLite triggers, so every write keeps them
+correct in its own transaction: ORM flushes and cascades, Core statements and
+executemany batches alike. A change to a deck's card_count is carried to every
+pod containing the deck. The triggers keep the names (and the updated_at bump)
+of the ones in db_schema.sql, which were never installed by create_all.
+
+reconcile_counters() recomputes all three counters for every user in two
+set-based UPDATEs and repairs any drift, e.g. from rows written before the
+triggers were installed.
+"""
+
+from sqlalchemy import func, or_, select, text, update
+from .card import Card
+from .deck import Deck
+from .pod import Pod
+from .pod_deck import PodDeck
+
+COUNTER_TRIGGERS = {
+    'update_deck_card_count_insert': """
+        CREATE TRIGGER update_deck_card_count_insert
+            AFTER INSERT ON cards
+            WHEN NEW.is_active
+        BEGIN
+            UPDATE decks
+            SET card_count = card_count + 1,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = NEW.deck_id;
+        END
+    """,
+    'update_deck_card_count_delete': """
+        CREATE TRIGGER update_deck_card_count_delete
+            AFTER DELETE ON cards
+            WHEN OLD.is_active
+        BEGIN
+            UPDATE decks
+            SET card_count = card_count - 1,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = OLD.deck_id;
+        END
+    """,
+    # Soft deletes, restores and moves between decks
+    'update_deck_card_count_update': """
+        CREATE TRIGGER update_deck_card_count_update
+            AFTER UPDATE OF is_active, deck_id ON cards
+            WHEN OLD.is_active IS NOT NEW.is_active OR OLD.deck_id IS NOT NEW.deck_id
+        BEGIN
+            UPDATE decks
+            SET card_count = card_count - 1,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = OLD.deck_id AND OLD.is_active;
+            UPDATE decks
+            SET card_count = card_count + 1,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = NEW.deck_id AND NEW.is_active;
+        END
+    """,
+    'update_deck_version_insert': """
+        CREATE TRIGGER update_deck_version_insert
+            AFTER INSERT ON cards
+        BEGIN
+            UPDATE decks SET version = version + 1 WHERE id = NEW.deck_id;
+        END
+    """,
+    'update_deck_version_delete': """
+        CREATE TRIGGER update_deck_version_delete
+            AFTER DELETE ON cards
+        BEGIN
+            UPDATE decks SET version = version + 1 WHERE id = OLD.deck_id;
+        END
+    """,
+    # Edits, soft deletes, reorders and moves (both decks)
+    'update_deck_version_update': """
+        CREATE TRIGGER update_deck_version_update
+            AFTER UPDATE ON cards
+        BEGIN
+            UPDATE decks SET version = version + 1 WHERE id IN (OLD.deck_id, NEW.deck_id);
+        END
+    """,
+    'update_pod_counts_on_deck_add': """
+        CREATE TRIGGER update_pod_counts_on_deck_add
+            AFTER INSERT ON pod_decks
+        BEGIN
+            UPDATE pods
+            SET deck_count = deck_count + 1,
+                total_card_count = total_card_count + coalesce((
+                    SELECT card_count FROM decks WHERE id = NEW.deck_id
+                ), 0),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = NEW.pod_id;
+        END
+    """,
+    'update_pod_counts_on_deck_remove': """
+        CREATE TRIGGER update_pod_counts_on_deck_remove
+            AFTER DELETE ON pod_decks
+        BEGIN
+            UPDATE pods
+            SET deck_count = deck_count - 1,
+                total_card_count = total_card_count - coalesce((
+                    SELECT card_count FROM decks WHERE id = OLD.deck_id
+                ), 0),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = OLD.pod_id;
+        END
+    """,
+    'update_pod_counts_on_deck_move': """
+        CREATE TRIGGER update_pod_counts_on_deck_move
+            AFTER UPDATE OF pod_id, deck_id ON pod_decks
+            WHEN OLD.pod_id IS NOT NEW.pod_id OR OLD.deck_id IS NOT NEW.deck_id
+        BEGIN
+            UPDATE pods
+            SET deck_count = deck_count - 1,
+                total_card_count = total_card_count - coalesce((
+                    SELECT card_count FROM decks WHERE id = OLD.deck_id
+                ), 0),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = OLD.pod_id;
+            UPDATE pods
+            SET deck_count = deck_count + 1,
+                total_card_count = total_card_count + coalesce((
+                    SELECT card_count FROM decks WHERE id = NEW.deck_id
+                ), 0),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = NEW.pod_id;
+        END
+    """,
+    'update_pod_card_count_on_deck_change': """
+        CREATE TRIGGER update_pod_card_count_on_deck_change
+            AFTER UPDATE OF card_count ON decks
+            WHEN OLD.card_count IS NOT NEW.card_count
+        BEGIN
+            UPDATE pods
+            SET total_card_count = total_card_count + (coalesce(NEW.card_count, 0) - coalesce(OLD.card_count, 0)),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id IN (
+                SELECT pod_id FROM pod_decks WHERE deck_id = NEW.id
+            );
+        END
+    """,
+}
+
+
+def install_counter_triggers(connection):
+    """(Re)create the counter triggers, replacing any older definitions of the same name"""
+    for name, definition in COUNTER_TRIGGERS.items():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(definition))
+
+
+def reconcile_counters(connection):
+    """
+    Recompute every deck's and pod's counters from cards and pod_decks, updating only rows that drifted.
+    Returns (decks repaired, pods repaired).
+    """
+    card_count = select(func.count(Card.id)).where(
+        Card.deck_id == Deck.id,
+        Card.is_active == True
+    ).scalar_subquery()
+    # updated_at is kept: a repaired counter is not an edit of the deck
+    decks = connection.execute(
+        update(Deck)
+        .where(Deck.card_count.is_distinct_from(card_count))
+        .values(card_count=card_count, updated_at=Deck.updated_at)
+    ).rowcount
+    
+    # Pods containing a repaired deck already got the difference from the deck trigger;
+    # this catches pods whose own counters drifted (and keeps their updated_at)
+    deck_count = select(func.count(PodDeck.id)).where(PodDeck.pod_id == Pod.id).scalar_subquery()
+    total_card_count = select(func.coalesce(func.sum(Deck.card_count), 0)).join(
+        PodDeck, PodDeck.deck_id == Deck.id
+    ).where(PodDeck.pod_id == Pod.id).scalar_subquery()
+    pods = connection.execute(
+        update(Pod)
+        .where(or_(
+            Pod.deck_count.is_distinct_from(deck_count),
+            Pod.total_card_count.is_distinct_from(total_card_count)
+        ))
+        .values(deck_count=deck_count, total_card_count=total_card_count, updated_at=Pod.updated_at)
+    ).rowcount
+    
+    return decks, pods
@@ -1,9 +1,17 @@
 # app/models/database.py - Database configuration and session management
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
+import contextvars
 import hashlib
+import hmac
+import os
+import re
 import secrets
+import time
+from config.database import db_config
 
 # Create base class for models
 Base = declarative_base()
@@ -12,26 +20,187 @@ Base = declarative_base()
 engine = None
 SessionLocal = None
 
-def hash_password(password: str) -> str:
-    """Hash password with salt"""
+# Async engine used by request handlers (None when running in sync mode)
+async_engine = None
+AsyncSessionLocal = None
+SyncRequestSessionLocal = None
+_request_session_factory = None
+
+# Sync drivers mapped to their asyncio counterparts
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+}
+
+# PRAGMAs reported by the /api/debug/db endpoint
+REPORTED_PRAGMAS = ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'temp_store', 'busy_timeout', 'foreign_keys')
+
+# Query statistics of the request being handled (None outside requests)
+_current_query_stats = contextvars.ContextVar('query_stats', default=None)
+
+# Password hashes are stored as pbkdf2_sha256$<iterations>$<salt>$<hash> so the work factor can be raised later;
+# legacy hashes (32 hex salt + hash, no prefix) always used 100000 iterations
+PASSWORD_HASH_ALGORITHM = 'pbkdf2_sha256'
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', '100000'))
+LEGACY_PASSWORD_ITERATIONS = 100000
+
+def _pbkdf2(password: str, salt: str, iterations: int) -> str:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations).hex()
+
+def _parse_password_hash(hashed: str):
+    """Split a stored hash into (iterations, salt, hash)"""
+    if hashed.startswith(PASSWORD_HASH_ALGORITHM + '$'):
+        _, iterations, salt, pwdhash = hashed.split('$', 3)
+        return int(iterations), salt, pwdhash
+    return LEGACY_PASSWORD_ITERATIONS, hashed[:32], hashed[32:]
+
+def hash_password(password: str, iterations: int = None) -> str:
+    """Hash password with salt (CPU-bound; use utils.password_hasher from request handlers)"""
+    iterations = iterations or PASSWORD_HASH_ITERATIONS
     salt = secrets.token_hex(16)
-    pwdhash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000)
-    return salt + pwdhash.hex()
+    return f"{PASSWORD_HASH_ALGORITHM}${iterations}${salt}${_pbkdf2(password, salt, iterations)}"
 
 def verify_password(password: str, hashed: str) -> bool:
-    """Verify password against hash"""
-    salt = hashed[:32]
-    pwdhash = hashed[32:]
-    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000).hex() == pwdhash
+    """Verify password against hash (CPU-bound; use utils.password_hasher from request handlers)"""
+    iterations, salt, pwdhash = _parse_password_hash(hashed)
+    return hmac.compare_digest(_pbkdf2(password, salt, iterations), pwdhash)
+
+def password_needs_rehash(hashed: str) -> bool:
+    """Check whether a hash uses the legacy format or a lower work factor than configured"""
+    if not hashed.startswith(PASSWORD_HASH_ALGORITHM + '$'):
+        return True
+    iterations, _, _ = _parse_password_hash(hashed)
+    return iterations < PASSWORD_HASH_ITERATIONS
+
+def to_async_url(database_url: str) -> str:
+    """Convert a sync database URL to use the matching asyncio driver"""
+    url = make_url(database_url)
+    async_driver = ASYNC_DRIVERS.get(url.drivername)
+    if async_driver:
+        url = url.set(drivername=async_driver)
+    return url.render_as_string(hide_password=False)
+
+def get_engine_options(database_url: str) -> dict:
+    """Get pool options for an engine; in-memory SQLite keeps its single-connection pool"""
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    return db_config.get_pool_options()
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the configured SQLite performance PRAGMAs to a new connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in db_config.get_sqlite_pragmas():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+class QueryStats:
+    """
+    Statements, timings and rows written (INSERT / UPDATE / DELETE rowcount) for one request.
+    SELECT rows are not counted: that would mean buffering every result in the hook
+    (likewise DML with RETURNING, whose rowcount is only known once its rows are read).
+    With aiosqlite the driver fetches a SELECT's rows inside execute, so its time is complete;
+    with the sync driver it covers execution up to the first row.
+    """
+    
+    def __init__(self, route):
+        self.route = route
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+        self.rows = 0
+    
+    def record(self, statement, elapsed_ms, rows):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.rows += rows
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = statement
+    
+    def server_timing(self):
+        """Format as a Server-Timing header value"""
+        return (
+            f'db;dur={self.total_ms:.2f};desc="{self.count} queries, {self.rows} rows written", '
+            f'db-slowest;dur={self.slowest_ms:.2f}'
+        )
+    
+    def to_dict(self):
+        return {
+            'route': self.route,
+            'count': self.count,
+            'total_ms': round(self.total_ms, 2),
+            'slowest_ms': round(self.slowest_ms, 2),
+            'slowest_sql': normalize_sql(self.slowest_sql) if self.slowest_sql else None,
+            'rows': self.rows
+        }
+
+def begin_query_stats(route):
+    """Start collecting query statistics for the current request"""
+    stats = QueryStats(route)
+    _current_query_stats.set(stats)
+    return stats
+
+def end_query_stats():
+    """Stop collecting query statistics and return what was collected"""
+    stats = _current_query_stats.get()
+    _current_query_stats.set(None)
+    return stats
+
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SQL_IN_LIST = re.compile(r"\(\s*(?:\?|__\[POSTCOMPILE_\w+\])(?:\s*,\s*\?)*\s*\)")
+_SQL_SPACE = re.compile(r"\s+")
+
+def normalize_sql(statement):
+    """Collapse literals, IN lists and whitespace so similar queries log identically"""
+    statement = _SQL_STRING.sub('?', statement)
+    statement = _SQL_NUMBER.sub('?', statement)
+    statement = _SQL_IN_LIST.sub('(...)', statement)
+    return _SQL_SPACE.sub(' ', statement).strip()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_query_stats.get() is not None:
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_query_stats.get()
+    if stats is None or not conn.info.get('query_start_time'):
+        return
+    elapsed_ms = (time.perf_counter() - conn.info['query_start_time'].pop()) * 1000
+    
+    # The DBAPI rowcount: rows written by DML (summed over executemany), -1 for SELECT and RETURNING
+    rows = max(cursor.rowcount, 0)
+    
+    stats.record(statement, elapsed_ms, rows)
+    
+    if db_config.slow_query_ms and elapsed_ms >= db_config.slow_query_ms:
+        print(f"🐢 Slow query ({elapsed_ms:.1f}ms, {rows} rows written) on {stats.route}: {normalize_sql(statement)}")
+
+def configure_engine(db_engine):
+    """Register connection and instrumentation hooks on a (sync) engine"""
+    if db_engine.dialect.name == 'sqlite':
+        event.listen(db_engine, 'connect', apply_sqlite_pragmas)
+    if db_config.query_stats:
+        event.listen(db_engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db_engine, 'after_cursor_execute', _after_cursor_execute)
+    return db_engine
 
-def init_database(database_url: str):
+def build_engine(database_url: str):
+    """Create a configured sync engine"""
+    return configure_engine(create_engine(database_url, echo=False, **get_engine_options(database_url)))  # Set echo=True for SQL debugging
+
+def init_database(database_url: str, use_async: bool = True):
     """Initialize database with all models"""
-    global engine, SessionLocal
+    global engine, SessionLocal, async_engine, AsyncSessionLocal, SyncRequestSessionLocal, _request_session_factory
     
     print(f"🗄️  Initializing database: {database_url}")
     
     # Create engine
-    engine = create_engine(database_url, echo=False)  # Set echo=True for SQL debugging
+    engine = build_engine(database_url)
     
     # Import all models to ensure they're registered
     from .user import User
@@ -41,32 +210,168 @@ def init_database(database_url: str):
     from .pod_deck import PodDeck
     from .study_session import StudySession
     from .card_review import CardReview
+    from .card_state import CardState
+    from .user_statistics import UserStatistics
     
     # Create all tables
     Base.metadata.create_all(engine)
     
+    # Bring existing databases up to the current schema revision
+    from migrations import run_migrations
+    run_migrations(engine)
+    
     # Create session factory
     SessionLocal = scoped_session(sessionmaker(bind=engine))
     
+    if use_async:
+        # Request handlers run on the event loop, so they get non-blocking sessions
+        async_engine = create_async_engine(to_async_url(database_url), echo=False, **get_engine_options(database_url))
+        configure_engine(async_engine.sync_engine)
+        AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+        _request_session_factory = AsyncSessionLocal
+        print("⚡ Async database sessions enabled")
+    else:
+        SyncRequestSessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+        _request_session_factory = _sync_request_session
+        print("🐢 Async database sessions disabled, using sync sessions")
+
     # Create test user for development
     create_test_user_if_needed()
     
     print("✅ Database tables created successfully")
 
+def get_engine():
+    """Get the sync engine (for bulk jobs run off the event loop)"""
+    if engine is None:
+        raise RuntimeError("Database not initialized. Call init_database() first.")
+    return engine
+
 def get_db_session():
     """Get database session"""
     if SessionLocal is None:
         raise RuntimeError("Database not initialized. Call init_database() first.")
     return SessionLocal()
 
-def cleanup_database():
+def _sync_request_session():
+    """Build a sync session wrapped in the async session interface"""
+    return SyncSessionAdapter(SyncRequestSessionLocal())
+
+def create_session():
+    """Create a standalone session with the same interface as request sessions (caller closes it)"""
+    if _request_session_factory is None:
+        raise RuntimeError("Database not initialized. Call init_database() first.")
+    return _request_session_factory()
+
+def get_request_session(request):
+    """
+    Get the database session bound to this request.
+    The session is created on first use and closed by the response middleware.
+    """
+    session = getattr(request.ctx, 'db_session', None)
+    if session is None:
+        session = create_session()
+        request.ctx.db_session = session
+    return session
+
+async def close_request_session(request):
+    """Close the request's database session if one was opened"""
+    session = getattr(request.ctx, 'db_session', None)
+    if session is not None:
+        request.ctx.db_session = None
+        await session.close()
+
+async def cleanup_database():
     """Clean up database connections"""
-    global SessionLocal, engine
+    global SessionLocal, engine, async_engine
     if SessionLocal:
         SessionLocal.remove()
+    if async_engine:
+        await async_engine.dispose()
     if engine:
         engine.dispose()
 
+def describe_pool(db_engine) -> dict:
+    """Get connection pool statistics for an engine"""
+    pool = db_engine.pool
+    stats = {
+        'class': type(pool).__name__,
+        'status': pool.status()
+    }
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
+
+async def get_database_report(session) -> dict:
+    """Report effective PRAGMA values (as seen by this session's connection) and pool stats"""
+    pragmas = {}
+    if engine.dialect.name == 'sqlite':
+        for name in REPORTED_PRAGMAS:
+            pragmas[name] = await session.scalar(text(f"PRAGMA {name}"))
+
+    return {
+        'mode': 'async' if async_engine is not None else 'sync',
+        'dialect': engine.dialect.name,
+        'pragmas': pragmas,
+        'configured_pragmas': dict(db_config.get_sqlite_pragmas()),
+        'pools': {
+            'sync': describe_pool(engine),
+            'async': describe_pool(async_engine.sync_engine) if async_engine is not None else None
+        }
+    }
+
+class SyncSessionAdapter:
+    """
+    Exposes a sync Session through the AsyncSession interface.
+    Lets route handlers use one code path whether or not async mode is enabled;
+    queries block the event loop exactly as the old sync sessions did.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        return self.sync_session.execute(statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return self.sync_session.scalar(statement, params, **kwargs)
+
+    async def scalars(self, statement, params=None, **kwargs):
+        return self.sync_session.scalars(statement, params, **kwargs)
+
+    def expunge(self, instance):
+        self.sync_session.expunge(instance)
+
+    async def get(self, entity, ident, **kwargs):
+        return self.sync_session.get(entity, ident, **kwargs)
+
+    async def delete(self, instance):
+        self.sync_session.delete(instance)
+
+    async def flush(self, objects=None):
+        self.sync_session.flush(objects)
+
+    async def refresh(self, instance, attribute_names=None):
+        self.sync_session.refresh(instance, attribute_names)
+
+    async def commit(self):
+        self.sync_session.commit()
+
+    async def rollback(self):
+        self.sync_session.rollback()
+
+    async def close(self):
+        self.sync_session.close()
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.sync_session, *args, **kwargs)
+
 def create_test_user_if_needed():
     """Create a test user for development"""
     from .user import User
@@ -4,9 +4,6 @@ from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Foreign
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
-from models.pod_deck import PodDeck
-from models.pod import Pod
-from models.database import get_db_session
 
 class Deck(Base):
     __tablename__ = 'decks'
@@ -19,6 +16,7 @@ class Deck(Base):
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     card_count = Column(Integer, default=0)
+    version = Column(Integer, default=0)  # Bumped by every change to the deck's cards (counter triggers)
     study_settings = Column(JSON, default=lambda: {})
     
     # Relationships
@@ -38,27 +36,21 @@ class Deck(Base):
             "name": self.name,
             "description": self.description,
             "card_count": self.card_count,
+            "version": self.version,
             "is_public": self.is_public,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
         
         if include_pods:
-            
-            session = get_db_session()
-            try:
-                pod_memberships = session.query(PodDeck, Pod).join(
-                    Pod, PodDeck.pod_id == Pod.id
-                ).filter(PodDeck.deck_id == self.id).all()
-                
-                result['pods'] = []
-                for pod_deck, pod in pod_memberships:
-                    result['pods'].append({
-                        'id': pod.id,
-                        'name': pod.name,
-                        'display_order': pod_deck.display_order
-                    })
-            finally:
-                session.close()
+            # pod_decks and their pods must be eager loaded when serializing from an async session
+            result['pods'] = [
+                {
+                    'id': pod_deck.pod.id,
+                    'name': pod_deck.pod.name,
+                    'display_order': pod_deck.display_order
+                }
+                for pod_deck in self.pod_decks
+            ]
         
         return result
\ No newline at end of file
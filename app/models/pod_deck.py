@@ -1,5 +1,6 @@
 # app/models/pod_deck.py
 from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint
+from datetime import datetime, timezone
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -10,7 +11,7 @@ class PodDeck(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     pod_id = Column(Integer, ForeignKey('pods.id', ondelete='CASCADE'), nullable=False)
     deck_id = Column(Integer, ForeignKey('decks.id', ondelete='CASCADE'), nullable=False)
-    added_at = Column(DateTime, default=func.current_timestamp())
+    added_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     display_order = Column(Integer, default=0)
     
     # Unique constraint to prevent duplicate deck additions
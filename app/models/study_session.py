@@ -1,6 +1,7 @@
 # app/models/study_session.py
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, CheckConstraint, JSON, case
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -20,6 +21,9 @@ class StudySession(Base):
     mode = Column(String(20), default='basic') 
     paused_at = Column(DateTime, nullable=True)
     total_paused_minutes = Column(Integer, default=0)
+    card_order = Column(JSON, nullable=True)  # Card ids in study order (windowed sessions only)
+    shuffle_seed = Column(Integer, nullable=True)  # Seed card_order was shuffled with, if shuffled
+    current_index = Column(Integer, default=0)  # Position in card_order to resume from
     
     # Ensure exactly one of deck_id or pod_id is set
     __table_args__ = (
@@ -51,6 +55,7 @@ class StudySession(Base):
             "cards_studied": self.cards_studied,
             "cards_correct": self.cards_correct,
             "session_type": self.session_type,
+            "current_index": self.current_index or 0,
             "accuracy": round((self.cards_correct / self.cards_studied * 100), 2) if self.cards_studied > 0 else 0
         }
     
@@ -59,7 +64,7 @@ class StudySession(Base):
         """Check if session is still active"""
         return self.ended_at is None
     
-    @property
+    @hybrid_property
     def duration_minutes(self):
         """Get active study duration excluding paused time"""
         if not self.ended_at:
@@ -69,6 +74,14 @@ class StudySession(Base):
         active_time = total_elapsed - (self.total_paused_minutes or 0)
         return max(0, round(active_time, 2))
     
+    @duration_minutes.inplace.expression
+    @classmethod
+    def _duration_minutes_expression(cls):
+        """Same duration in SQL (SQLite julianday arithmetic), for aggregates"""
+        total_elapsed = (func.julianday(cls.ended_at) - func.julianday(cls.started_at)) * 1440
+        active_time = total_elapsed - func.coalesce(cls.total_paused_minutes, 0)
+        return case((cls.ended_at.is_(None), 0), else_=func.max(0, func.round(active_time, 2)))
+    
     @property
     def is_paused(self):
         """Check if session is currently paused"""
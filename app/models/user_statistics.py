@@ -0,0 +1,434 @@
+# app/models/user_statistics.py
+"""
+Daily study statistics per user, keyed on the local date (tz_config).
+
+Rows are kept current from changes flushed through the ORM, in the same transaction:
+- reviews count on the local date of reviewed_at (reviews of inactive cards
+  are left out)
+- a card counts as learned on the date of its first passing SM-2 review
+- completed sessions count on the local date they started
+
+Added reviews and newly completed sessions are collected in session.info during
+a flush and added to their days afterwards, one upsert per (user, local date).
+Whether an added passing review moves its card's learned date (to its own day,
+from a later one when it arrives out of order) is looked up with one grouped
+query per flush, as is whether the reviewed cards are active.
+
+Edited or deleted reviews and sessions (including deck, pod and session deletes
+through ORM cascades) and deactivated or restored cards rebuild the days they
+touch with recompute_user_day(), along with the days their cards' learned dates
+moved between. Later streaks are carried forward from every day that gains its
+first reviews or is rebuilt.
+
+backfill_user_statistics() rebuilds the whole table from history.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import (
+    Column, Integer, Float, Date, ForeignKey, UniqueConstraint,
+    and_, case, delete, distinct, event, exists, func, literal, or_, select, update
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.attributes import get_history
+from .database import Base
+from .card import Card
+from .card_review import CardReview
+from .study_session import StudySession
+from config.timezone import tz_config
+from utils.scheduler import DEFAULT_EASE_FACTOR, PASSING_RATING
+
+# Retention credit per rating, as in calculate_sm2_retention (other ratings count as 0)
+RETENTION_POINTS = {1: 25, 2: 50, 3: 75, 4: 100}
+
+# Counts _add_to_user_day() adds to a day (study_time_minutes is summed from session ids)
+_ADDED_COUNTS = ('cards_studied', 'cards_correct', 'retention_points', 'cards_learned', 'sessions_completed')
+
+# session.info keys holding changes until the flush is written
+_PENDING_KEYS = (
+    'changed_statistics_days', 'added_statistics_reviews', 'completed_statistics_sessions',
+    'changed_learned_reviews', 'toggled_statistics_cards'
+)
+
+
+class UserStatistics(Base):
+    __tablename__ = 'user_statistics'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    date = Column(Date, nullable=False)  # Local date
+    cards_studied = Column(Integer, default=0)  # Rated reviews of active cards
+    cards_correct = Column(Integer, default=0)  # ... rated PASSING_RATING or better
+    retention_points = Column(Integer, default=0)  # Sum of RETENTION_POINTS over cards_studied
+    study_time_minutes = Column(Float, default=0)  # Completed sessions, excluding pauses
+    sessions_completed = Column(Integer, default=0)
+    cards_learned = Column(Integer, default=0)  # Cards whose first passing SM-2 review fell on this date
+    accuracy_percentage = Column(Float, default=0)
+    streak_days = Column(Integer, default=0)  # Consecutive days with reviews, ending on this date
+    
+    __table_args__ = (UniqueConstraint('user_id', 'date', name='unique_user_statistics_date'),)
+    
+    def __repr__(self):
+        return f"<UserStatistics(user_id={self.user_id}, date={self.date}, cards_studied={self.cards_studied})>"
+    
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization"""
+        return {
+            "user_id": self.user_id,
+            "date": self.date.isoformat(),
+            "cards_studied": self.cards_studied,
+            "cards_correct": self.cards_correct,
+            "accuracy_percentage": self.accuracy_percentage,
+            "cards_learned": self.cards_learned,
+            "sessions_completed": self.sessions_completed,
+            "study_time_minutes": self.study_time_minutes,
+            "streak_days": self.streak_days
+        }
+
+
+def local_date(utc_datetime):
+    """Local calendar date of a stored (naive UTC) timestamp"""
+    return tz_config.utc_to_local(utc_datetime).date()
+
+
+def _utc_day_local_dates(utc_day):
+    """Local dates a UTC calendar day ('YYYY-MM-DD') overlaps"""
+    start = datetime.fromisoformat(utc_day)
+    return {local_date(start), local_date(start + timedelta(days=1) - timedelta(microseconds=1))}
+
+
+def _learned(review):
+    """Passing review that carries SM-2 data (same test as get_cards_learned_count)"""
+    return and_(
+        review.response_quality >= PASSING_RATING,
+        or_(review.ease_factor != DEFAULT_EASE_FACTOR, review.next_review_date.isnot(None))
+    )
+
+
+def _is_learned(review):
+    """_learned() for a loaded CardReview"""
+    return (review.response_quality or 0) >= PASSING_RATING and (
+        review.ease_factor != DEFAULT_EASE_FACTOR or review.next_review_date is not None
+    )
+
+
+def _review_totals(user_id, start, end):
+    return select(
+        func.count(CardReview.response_quality),
+        func.coalesce(func.sum(case((CardReview.response_quality >= PASSING_RATING, 1), else_=0)), 0),
+        func.coalesce(func.sum(case(RETENTION_POINTS, value=CardReview.response_quality, else_=0)), 0)
+    ).join(Card, Card.id == CardReview.card_id).filter(
+        CardReview.user_id == user_id,
+        CardReview.reviewed_at >= start,
+        CardReview.reviewed_at < end,
+        Card.is_active == True
+    )
+
+
+def _cards_learned(user_id, start, end):
+    earlier = aliased(CardReview)
+    return select(func.count(distinct(CardReview.card_id))).join(Card, Card.id == CardReview.card_id).filter(
+        CardReview.user_id == user_id,
+        CardReview.reviewed_at >= start,
+        CardReview.reviewed_at < end,
+        Card.is_active == True,
+        _learned(CardReview),
+        ~exists().where(
+            earlier.user_id == CardReview.user_id,
+            earlier.card_id == CardReview.card_id,
+            earlier.reviewed_at < start,
+            _learned(earlier)
+        )
+    )
+
+
+def _session_totals(user_id, start, end):
+    return select(func.count(StudySession.id), func.coalesce(func.sum(StudySession.duration_minutes), 0)).filter(
+        StudySession.user_id == user_id,
+        StudySession.started_at >= start,
+        StudySession.started_at < end,
+        StudySession.ended_at.isnot(None)
+    )
+
+
+def _accuracy(cards_correct, cards_studied):
+    """accuracy_percentage as SQL, so rebuilt and incrementally updated rows round alike"""
+    return case((cards_studied > 0, func.round(cards_correct * 100.0 / cards_studied, 2)), else_=0)
+
+
+def _streak(connection, user_id, day, cards_studied):
+    if not cards_studied:
+        return 0
+    previous = connection.scalar(select(UserStatistics.streak_days).filter_by(
+        user_id=user_id, date=day - timedelta(days=1)
+    ))
+    return (previous or 0) + 1
+
+
+def _carry_streak_forward(connection, user_id, day, streak):
+    """Later days continue this day's streak until a day without reviews breaks it"""
+    next_day = day + timedelta(days=1)
+    while True:
+        row = connection.execute(select(UserStatistics.cards_studied, UserStatistics.streak_days).filter_by(
+            user_id=user_id, date=next_day
+        )).one_or_none()
+        if row is None:
+            break
+        expected = streak + 1 if row.cards_studied else 0
+        if row.streak_days == expected:
+            break
+        connection.execute(update(UserStatistics).filter_by(
+            user_id=user_id, date=next_day
+        ).values(streak_days=expected))
+        streak = expected
+        next_day += timedelta(days=1)
+
+
+def recompute_user_day(connection, user_id, day):
+    """Rebuild one (user, local date) row from reviews and sessions, then carry its streak forward"""
+    start = tz_config.local_date_start_utc(day)
+    end = tz_config.local_date_start_utc(day + timedelta(days=1))
+    cards_studied, cards_correct, retention_points = connection.execute(_review_totals(user_id, start, end)).one()
+    sessions_completed, study_time_minutes = connection.execute(_session_totals(user_id, start, end)).one()
+    cards_learned = connection.scalar(_cards_learned(user_id, start, end))
+    
+    if not (cards_studied or sessions_completed or cards_learned):
+        connection.execute(delete(UserStatistics).filter_by(user_id=user_id, date=day))
+        streak = 0
+    else:
+        streak = _streak(connection, user_id, day, cards_studied)
+        values = {
+            'user_id': user_id,
+            'date': day,
+            'cards_studied': cards_studied,
+            'cards_correct': cards_correct,
+            'retention_points': retention_points,
+            'study_time_minutes': study_time_minutes,
+            'sessions_completed': sessions_completed,
+            'cards_learned': cards_learned,
+            'accuracy_percentage': _accuracy(literal(cards_correct), literal(cards_studied)),
+            'streak_days': streak
+        }
+        statement = sqlite_insert(UserStatistics).values(**values)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[UserStatistics.user_id, UserStatistics.date],
+            set_={name: statement.excluded[name] for name in values if name not in ('user_id', 'date')}
+        ))
+    
+    _carry_streak_forward(connection, user_id, day, streak)
+
+
+def backfill_user_statistics(connection):
+    """Rebuild user_statistics from the full review and session history; returns the row count"""
+    connection.execute(delete(UserStatistics))
+    days = set()
+    for user_id, utc_day in connection.execute(
+        select(CardReview.user_id, func.date(CardReview.reviewed_at)).distinct()
+    ):
+        days.update((user_id, day) for day in _utc_day_local_dates(utc_day))
+    for user_id, utc_day in connection.execute(
+        select(StudySession.user_id, func.date(StudySession.started_at))
+        .filter(StudySession.ended_at.isnot(None)).distinct()
+    ):
+        days.update((user_id, day) for day in _utc_day_local_dates(utc_day))
+    
+    # Oldest first, so every streak builds on the day before it
+    for user_id, day in sorted(days):
+        recompute_user_day(connection, user_id, day)
+    return connection.scalar(select(func.count()).select_from(UserStatistics))
+
+
+def _first_learned_reviews(cards, changed_review_ids):
+    """
+    Per (user, card): when its first passing SM-2 review now falls, and when it fell
+    not counting changed_review_ids (reviews just added or edited), in one grouped query.
+    """
+    return select(
+        CardReview.user_id,
+        CardReview.card_id,
+        func.min(CardReview.reviewed_at),
+        func.min(case((CardReview.id.notin_(changed_review_ids), CardReview.reviewed_at)))
+    ).filter(
+        CardReview.card_id.in_({card_id for _, card_id in cards}),
+        _learned(CardReview)
+    ).group_by(CardReview.user_id, CardReview.card_id)
+
+
+def _add_to_user_day(connection, user_id, day, changes, session_ids=()):
+    """
+    Add counts ({column: delta}) and completed sessions to one (user, local date) row
+    with a single upsert. A day that gets its first reviews joins the streak of the day before.
+    """
+    values = {name: changes.get(name, 0) for name in _ADDED_COUNTS}
+    values['study_time_minutes'] = select(func.coalesce(func.sum(StudySession.duration_minutes), 0)).filter(
+        StudySession.id.in_(session_ids)
+    ).scalar_subquery() if session_ids else 0
+    statement = sqlite_insert(UserStatistics).values(
+        user_id=user_id,
+        date=day,
+        accuracy_percentage=_accuracy(literal(values['cards_correct']), literal(values['cards_studied'])),
+        streak_days=0,
+        **values
+    )
+    totals = {name: getattr(UserStatistics, name) + statement.excluded[name] for name in values}
+    cards_studied = connection.scalar(statement.on_conflict_do_update(
+        index_elements=[UserStatistics.user_id, UserStatistics.date],
+        set_={**totals, 'accuracy_percentage': _accuracy(totals['cards_correct'], totals['cards_studied'])}
+    ).returning(UserStatistics.cards_studied))
+    
+    if values['cards_studied'] and cards_studied == values['cards_studied']:
+        streak = _streak(connection, user_id, day, cards_studied)
+        connection.execute(update(UserStatistics).filter_by(user_id=user_id, date=day).values(streak_days=streak))
+        _carry_streak_forward(connection, user_id, day, streak)
+
+
+def _write_flushed_changes(connection, info):
+    """Apply the changes collected in session.info: one upsert per changed day, rebuilds for the rest"""
+    days = info.pop('changed_statistics_days', set())
+    reviews = info.pop('added_statistics_reviews', [])
+    sessions = info.pop('completed_statistics_sessions', {})
+    changed_cards = info.pop('changed_learned_reviews', {})
+    toggled_cards = info.pop('toggled_statistics_cards', set())
+    
+    if toggled_cards:
+        # Deactivating or restoring a card changes every day it was reviewed on
+        for user_id, utc_day in connection.execute(
+            select(CardReview.user_id, func.date(CardReview.reviewed_at))
+            .filter(CardReview.card_id.in_(toggled_cards)).distinct()
+        ):
+            days.update((user_id, day) for day in _utc_day_local_dates(utc_day))
+    
+    changes = defaultdict(Counter)
+    added_cards = {}
+    if reviews:
+        active = set(connection.scalars(select(Card.id).filter(
+            Card.id.in_({card_id for _, _, card_id, _, _, _ in reviews}), Card.is_active == True
+        )))
+        for review_id, user_id, card_id, day, rating, learned in reviews:
+            if card_id not in active:
+                continue
+            if rating is not None:
+                changes[user_id, day].update(
+                    cards_studied=1,
+                    cards_correct=int(rating >= PASSING_RATING),
+                    retention_points=RETENTION_POINTS.get(rating, 0)
+                )
+            if learned and (user_id, card_id) not in changed_cards:
+                added_cards.setdefault((user_id, card_id), set()).add(review_id)
+    
+    cards = {**added_cards, **changed_cards}
+    if cards:
+        changed_review_ids = set().union(*cards.values())
+        for user_id, card_id, first, first_before in connection.execute(_first_learned_reviews(cards, changed_review_ids)):
+            if (user_id, card_id) not in cards:
+                continue
+            learned_day = local_date(first)
+            learned_day_before = local_date(first_before) if first_before is not None else None
+            if (user_id, card_id) in changed_cards:
+                days.update((user_id, day) for day in (learned_day, learned_day_before) if day is not None)
+            elif learned_day != learned_day_before:
+                # Learned on an added review's day, rather than a later one or not at all
+                changes[user_id, learned_day]['cards_learned'] += 1
+                if learned_day_before is not None:
+                    changes[user_id, learned_day_before]['cards_learned'] -= 1
+    
+    for user_id, day in sessions:
+        changes[user_id, day]['sessions_completed'] += len(sessions[user_id, day])
+    
+    # Oldest first, so a day that starts a streak sees the day before it already written
+    for user_id, day in sorted(changes.keys() - days):
+        if any(changes[user_id, day].values()):
+            _add_to_user_day(connection, user_id, day, changes[user_id, day], sessions.get((user_id, day), ()))
+    for user_id, day in sorted(days):
+        recompute_user_day(connection, user_id, day)
+
+
+def _pending(target, key, factory):
+    """Changes collected in the target's session.info until its flush is written"""
+    session = Session.object_session(target)
+    return session.info.setdefault(key, factory()) if session is not None else factory()
+
+
+def _remember_day(target, user_id, day):
+    _pending(target, 'changed_statistics_days', set).add((user_id, day))
+
+
+def _remember_completed_session(target):
+    # Its duration is summed in SQL when the day is written
+    sessions = _pending(target, 'completed_statistics_sessions', dict)
+    sessions.setdefault((target.user_id, local_date(target.started_at)), []).append(target.id)
+
+
+@event.listens_for(CardReview, 'after_insert')
+def _remember_added_review(mapper, connection, target):
+    if target.reviewed_at is not None:
+        _pending(target, 'added_statistics_reviews', list).append((
+            target.id, target.user_id, target.card_id, local_date(target.reviewed_at),
+            target.response_quality, _is_learned(target)
+        ))
+
+
+def _remember_changed_review(target):
+    # Edited and deleted reviews rebuild their days (before and after the edit) and the card's learned days
+    history = get_history(target, 'reviewed_at')
+    for reviewed_at in (*history.deleted, *history.added, *history.unchanged):
+        if reviewed_at is not None:
+            _remember_day(target, target.user_id, local_date(reviewed_at))
+    return _pending(target, 'changed_learned_reviews', dict).setdefault((target.user_id, target.card_id), set())
+
+
+@event.listens_for(CardReview, 'after_update')
+def _remember_edited_review(mapper, connection, target):
+    # Left out when looking up where the card's learned date was before the edit
+    _remember_changed_review(target).add(target.id)
+
+
+@event.listens_for(CardReview, 'before_delete')
+def _remember_deleted_review(mapper, connection, target):
+    _remember_changed_review(target)
+
+
+@event.listens_for(StudySession, 'after_insert')
+def _remember_added_session(mapper, connection, target):
+    if target.started_at is not None and target.ended_at is not None:
+        _remember_completed_session(target)
+
+
+@event.listens_for(StudySession, 'after_update')
+def _remember_updated_session(mapper, connection, target):
+    timing = {name: get_history(target, name) for name in ('started_at', 'ended_at', 'total_paused_minutes')}
+    if target.started_at is None or not any(history.has_changes() for history in timing.values()):
+        return
+    ended_at = timing['ended_at']
+    if target.ended_at is not None and list(ended_at.deleted) == [None]:
+        _remember_completed_session(target)
+    elif target.ended_at is not None or any(ended_at.deleted):
+        # A completed session whose timing changed rebuilds its day (and the one it started on before)
+        for started_at in (*timing['started_at'].deleted, target.started_at):
+            if started_at is not None:
+                _remember_day(target, target.user_id, local_date(started_at))
+
+
+@event.listens_for(StudySession, 'before_delete')
+def _remember_deleted_session(mapper, connection, target):
+    if target.started_at is not None and target.ended_at is not None:
+        _remember_day(target, target.user_id, local_date(target.started_at))
+
+
+@event.listens_for(Card, 'after_update')
+def _remember_toggled_card(mapper, connection, target):
+    if get_history(target, 'is_active').has_changes():
+        _pending(target, 'toggled_statistics_cards', set).add(target.id)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _write_flushed_statistics(session, flush_context):
+    if any(key in session.info for key in _PENDING_KEYS):
+        _write_flushed_changes(session.connection(), session.info)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_rolled_back_changes(session, previous_transaction):
+    for key in _PENDING_KEYS:
+        session.info.pop(key, None)
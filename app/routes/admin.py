@@ -0,0 +1,43 @@
+# app/routes/admin.py
+import asyncio
+from sanic import Blueprint
+from sanic.response import json
+from models.database import get_engine
+from middleware.auth import require_admin
+from utils.rescheduler import apply_scheduling_params
+from utils.forecast import invalidate_forecast
+from utils.scheduler import validate_params
+
+admin_bp = Blueprint("admin", url_prefix="/api/admin")
+
+
+def _reschedule(user_id, changes):
+    with get_engine().begin() as connection:
+        return apply_scheduling_params(connection, user_id, changes)
+
+
+@admin_bp.route("/reschedule", methods=["POST"])
+@require_admin
+async def reschedule_user_cards(request):
+    """Change a user's scheduling parameters and reschedule every card they have reviewed"""
+    try:
+        data = request.json or {}
+        user_id = data.get("user_id")
+        if not isinstance(user_id, int):
+            return json({"error": "user_id must be an integer"}, status=400)
+        
+        changes, error = validate_params(data.get("scheduling", {}))
+        if error:
+            return json({"error": error}, status=400)
+        
+        # Bulk job: run it on a worker thread so the event loop keeps serving requests
+        summary = await asyncio.get_running_loop().run_in_executor(None, _reschedule, user_id, changes)
+        invalidate_forecast(user_id)
+        print(f"🗓️  Rescheduled {summary['updated']} of {summary['cards']} cards for user {user_id} in {summary['elapsed_ms']}ms")
+        
+        return json({"message": "Collection rescheduled", **summary})
+        
+    except LookupError as e:
+        return json({"error": str(e)}, status=404)
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
@@ -2,9 +2,11 @@
 from sanic import Blueprint
 from sanic.response import json, redirect
 from sanic import response as sanic_response
-from models.database import get_db_session, hash_password, verify_password
+from sqlalchemy import select
+from models.database import get_request_session, password_needs_rehash
 from models.user import User
 from middleware.auth import create_jwt_token, get_user_from_request
+from utils.password_hasher import password_hasher, PasswordHasherBusy
 from datetime import datetime, timedelta, timezone
 
 auth_bp = Blueprint("auth", url_prefix="/api/auth")
@@ -12,7 +14,7 @@ auth_bp = Blueprint("auth", url_prefix="/api/auth")
 @auth_bp.route("/register", methods=["POST"])
 async def register(request):
     """Register a new user"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         username = data.get("username")
@@ -27,9 +29,9 @@ async def register(request):
             return json({"error": "Password must be at least 6 characters long"}, status=400)
         
         # Check if user already exists
-        existing_user = session.query(User).filter(
+        existing_user = await session.scalar(select(User).filter(
             (User.username == username) | (User.email == email)
-        ).first()
+        ))
         
         if existing_user:
             if existing_user.username == username:
@@ -41,27 +43,28 @@ async def register(request):
         new_user = User(
             username=username,
             email=email,
-            password_hash=hash_password(password)
+            password_hash=await password_hasher.hash(password)
         )
         
         session.add(new_user)
-        session.commit()
+        await session.commit()
         
         return json({
             "message": "User registered successfully",
             "user": new_user.to_dict()
         }, status=201)
         
+    except PasswordHasherBusy:
+        await session.rollback()
+        return json({"error": "Server busy, please retry"}, status=503, headers={"Retry-After": "1"})
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 @auth_bp.route("/login", methods=["POST"])
 async def login(request):
     """Login user and create session"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         username = data.get("username")
@@ -71,20 +74,26 @@ async def login(request):
             return json({"error": "Missing username or password"}, status=400)
         
         # Find user by username or email
-        user = session.query(User).filter(
+        user = await session.scalar(select(User).filter(
             (User.username == username) | (User.email == username)
-        ).first()
+        ))
         
         if not user:
             return json({"error": "Invalid username or password"}, status=401)
         
         # Verify password
-        if not verify_password(password, user.password_hash):
+        if not await password_hasher.verify(password, user.password_hash):
             return json({"error": "Invalid username or password"}, status=401)
         
         if not user.is_active:
             return json({"error": "Account is deactivated"}, status=401)
         
+        # Upgrade legacy or weaker hashes now that we know the password
+        if password_needs_rehash(user.password_hash):
+            user.password_hash = await password_hasher.hash(password)
+            await session.commit()
+            print(f"🔐 Rehashed password for user {user.id}")
+        
         # Create JWT token (using the imported function that has fallback)
         token = create_jwt_token(user.id, user.username)
         
@@ -114,11 +123,12 @@ async def login(request):
         
         return response
         
+    except PasswordHasherBusy:
+        await session.rollback()
+        return json({"error": "Server busy, please retry"}, status=503, headers={"Retry-After": "1"})
     except Exception as e:
         print(f"❌ Login error: {e}")
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 @auth_bp.route("/logout", methods=["POST"])
 async def logout(request):
@@ -135,7 +145,7 @@ async def logout(request):
 @auth_bp.route("/me", methods=["GET"])
 async def get_current_user(request):
     """Get current user info"""
-    user = get_user_from_request(request)
+    user = await get_user_from_request(request)
     
     if not user:
         return json({"error": "Not authenticated"}, status=401)
@@ -145,9 +155,9 @@ async def get_current_user(request):
 @auth_bp.route("/user/<user_id:int>", methods=["GET"])
 async def get_user(request, user_id):
     """Get user profile"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
-        user = session.query(User).filter_by(id=user_id).first()
+        user = await session.scalar(select(User).filter_by(id=user_id))
         
         if not user:
             return json({"error": "User not found"}, status=404)
@@ -156,20 +166,16 @@ async def get_user(request, user_id):
         
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 @auth_bp.route("/users", methods=["GET"])
 async def list_users(request):
     """List all users (for development/admin)"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
-        users = session.query(User).filter_by(is_active=True).all()
+        users = (await session.scalars(select(User).filter_by(is_active=True))).all()
         users_data = [user.to_dict() for user in users]
         
         return json({"users": users_data})
         
     except Exception as e:
-        return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
\ No newline at end of file
+        return json({"error": str(e)}, status=500)
\ No newline at end of file
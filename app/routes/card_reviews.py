@@ -1,60 +1,52 @@
 # app/routes/card_reviews.py
 from sanic import Blueprint, json as sanic_json
 from sanic.response import json
-from sqlalchemy import desc
+from sqlalchemy import desc, select
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timezone
 from models.card_review import CardReview
+from models.card_state import CardState, card_state_upsert
 from models.card import Card
 from models.deck import Deck
-from models.database import get_db_session
+from models.database import get_request_session
 from models.pod import Pod
+from models.user import User
 from middleware.auth import require_auth
+from utils.review_queue import review_queue, ReviewQueueFull
+from utils.scheduler import UNSCHEDULED_STATE, get_params, is_valid_rating, next_state_after
 import traceback
 from config.timezone import tz_config
 
 card_reviews = Blueprint('card_reviews', url_prefix='/api/cards/reviews')
 
+# Largest number of ratings accepted by one batch submission
+MAX_REVIEW_BATCH = 500
+
+# Study modes a single review can come from
+REVIEW_MODES = ('full-spaced', 'simple-spaced')
+
 @card_reviews.route('/<deck_id:int>', methods=['GET'])
 @require_auth
 async def get_deck_reviews(request, deck_id):
     """Get all review data for cards in a deck"""
     print(f"🔍 GET /api/cards/reviews/{deck_id} called")
     
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         user_id = request.ctx.user['id']
         
         # Verify user owns the deck
-        deck = session.query(Deck).filter_by(id=deck_id, user_id=user_id).first()
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id, user_id=user_id))
         if not deck:
             return json({"error": "Deck not found"}, status=404)
         
-        # Get all cards in this deck
-        cards = session.query(Card).filter_by(deck_id=deck_id, is_active=True).all()
-        card_ids = [card.id for card in cards]
-        
-        if not card_ids:
-            return json([])
-        
-        # Get the latest review for each card (most recent review per card)
-        from sqlalchemy import func
-        
-        # Subquery to get the latest review date for each card
-        latest_reviews_subquery = session.query(
-            CardReview.card_id,
-            func.max(CardReview.reviewed_at).label('latest_reviewed_at')
-        ).filter(
-            CardReview.card_id.in_(card_ids),
-            CardReview.user_id == user_id
-        ).group_by(CardReview.card_id).subquery()
-        
-        # Join with the main reviews table to get the full review data
-        latest_reviews = session.query(CardReview).join(
-            latest_reviews_subquery,
-            (CardReview.card_id == latest_reviews_subquery.c.card_id) &
-            (CardReview.reviewed_at == latest_reviews_subquery.c.latest_reviewed_at) &
-            (CardReview.user_id == user_id)
-        ).all()
+        # Current state of every active card in this deck
+        latest_reviews = (await session.scalars(
+            select(CardState)
+            .join(Card, Card.id == CardState.card_id)
+            .filter(Card.deck_id == deck_id, Card.is_active == True)
+            .filter(CardState.user_id == user_id)
+        )).all()
         
         # Convert to list of dictionaries with timezone conversion
         reviews_data = []
@@ -83,60 +75,215 @@ async def get_deck_reviews(request, deck_id):
         print(f"❌ Error in get_deck_reviews: {e}")
         print(f"❌ Traceback: {traceback.format_exc()}")
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @card_reviews.route('', methods=['POST'])
 @require_auth
 async def create_review(request):
-    """Create a new card review - temporary minimal implementation"""
+    """Record a rating; the server schedules the card (SM-2 with the user's parameters)"""
     print(f"🔍 POST /api/cards/reviews called")
     
-    session = get_db_session() 
+    session = get_request_session(request)
     try:
         user_id = request.ctx.user['id']
         data = request.json
         print(f"✅ Creating review: {data}")
         
         # Validate required fields
-        required_fields = ['card_id', 'response_quality', 'ease_factor', 'interval_days', 'repetitions']
+        required_fields = ['card_id', 'response_quality']
         for field in required_fields:
             if field not in data:
                 return json({"error": f"Missing field: {field}"}, status=400)
         
+        # The server always schedules; scheduling values sent by the client are ignored
+        mode = data.get('mode', 'full-spaced')
+        if mode not in REVIEW_MODES:
+            return json({"error": f"mode must be one of: {', '.join(REVIEW_MODES)}"}, status=400)
+        if not is_valid_rating(data['response_quality']):
+            return json({"error": "response_quality must be an integer from 1 to 5"}, status=400)
+        
         # Verify user owns the card
-        card = session.query(Card)\
-            .join(Deck)\
-            .filter(Card.id == data['card_id'])\
-            .filter(Deck.user_id == user_id)\
-            .first()
+        card = await session.scalar(
+            select(Card)
+            .join(Deck)
+            .filter(Card.id == data['card_id'])
+            .filter(Deck.user_id == user_id)
+        )
         
         if not card:
             return json({"error": "Card not found"}, status=404)
         
-        # Create review
-        review = CardReview(
-            card_id=data['card_id'],
-            user_id=user_id,
-            session_id=data.get('session_id'),
-            response_quality=data['response_quality'],
-            response_time=data.get('response_time'),
-            ease_factor=data['ease_factor'],
-            interval_days=data['interval_days'],
-            repetitions=data['repetitions'],
-            next_review_date=datetime.fromisoformat(data['next_review_date'].replace('Z', '+00:00')) if data.get('next_review_date') else None,
-            reviewed_at=datetime.now(timezone.utc)
-        )
+        reviewed_at = datetime.now(timezone.utc)
+        if mode == 'full-spaced':
+            state = await session.scalar(select(CardState).filter_by(user_id=user_id, card_id=card.id))
+            params = get_params(await session.scalar(select(User.preferences).filter_by(id=user_id)))
+            schedule = next_state_after(data['response_quality'], state, reviewed_at, params)
+        else:
+            # Simple spaced mode records the rating without SM-2 scheduling
+            schedule = UNSCHEDULED_STATE
+        
+        # Release the ownership check's read transaction before waiting on the writer
+        await session.commit()
         
-        session.add(review)
-        session.commit()
+        # Queue the review; it is committed with other reviews in one transaction
+        review = await review_queue.submit({
+            'card_id': data['card_id'],
+            'user_id': user_id,
+            'session_id': data.get('session_id'),
+            'response_quality': data['response_quality'],
+            'response_time': data.get('response_time'),
+            'reviewed_at': reviewed_at,
+            **schedule
+        })
         
-        return json(review.to_dict(), status=201)
+        return json(review, status=201)
         
+    except ReviewQueueFull as e:
+        print(f"Review queue full: {e}")
+        return json({"error": "Server busy, please retry"}, status=503, headers={"Retry-After": "1"})
     except Exception as e:
         print(f"Error creating review: {e}")
-        request.app.db.rollback()
+        await session.rollback()
+        return json({"error": "Internal server error"}, status=500)
+
+def parse_batch_review(item):
+    """Validate one entry of a batch submission; returns (values, error)"""
+    if not isinstance(item, dict):
+        return None, "Each review must be an object"
+    
+    client_review_id = item.get('client_review_id')
+    if not isinstance(client_review_id, str) or not 0 < len(client_review_id) <= 64:
+        return None, "client_review_id must be a string of 1-64 characters"
+    if not isinstance(item.get('card_id'), int):
+        return None, "card_id must be an integer"
+    if not is_valid_rating(item.get('response_quality')):
+        return None, "response_quality must be an integer from 1 to 5"
+    
+    # Offline clients send when the card was actually rated; never later than now
+    now = datetime.now(timezone.utc)
+    reviewed_at = now
+    if item.get('reviewed_at'):
+        try:
+            reviewed_at = datetime.fromisoformat(item['reviewed_at'].replace('Z', '+00:00'))
+        except (TypeError, ValueError):
+            return None, "reviewed_at must be an ISO 8601 timestamp"
+        if reviewed_at.tzinfo is None:
+            reviewed_at = reviewed_at.replace(tzinfo=timezone.utc)
+        reviewed_at = min(reviewed_at, now)
+    
+    return {
+        'client_review_id': client_review_id,
+        'card_id': item['card_id'],
+        'session_id': item.get('session_id'),
+        'response_quality': item['response_quality'],
+        'response_time': item.get('response_time'),
+        'reviewed_at': reviewed_at.astimezone(timezone.utc).replace(tzinfo=None)
+    }, None
+
+
+async def write_review_batch(db_session, user_id, reviews):
+    """
+    Schedule and insert a batch of reviews with their card_state updates in one transaction.
+    Returns {client_review_id: (status, review)} where status is 'created' or 'duplicate';
+    reviews of cards the user does not own are left out.
+    """
+    params = get_params(await db_session.scalar(select(User.preferences).filter_by(id=user_id)))
+    client_ids = [review['client_review_id'] for review in reviews]
+    existing = {
+        review.client_review_id: review
+        for review in (await db_session.scalars(
+            select(CardReview).filter(CardReview.user_id == user_id, CardReview.client_review_id.in_(client_ids))
+        )).all()
+    }
+    pending = [review for review in reviews if review['client_review_id'] not in existing]
+    
+    card_ids = {review['card_id'] for review in pending}
+    owned_card_ids = set((await db_session.scalars(
+        select(Card.id).join(Deck).filter(Card.id.in_(card_ids), Deck.user_id == user_id)
+    )).all())
+    states = {
+        state.card_id: state
+        for state in (await db_session.scalars(
+            select(CardState).filter(CardState.user_id == user_id, CardState.card_id.in_(owned_card_ids))
+        )).all()
+    }
+    
+    # Oldest first, so several ratings of one card in a batch build on each other
+    created, latest = {}, {}
+    for values in sorted(pending, key=lambda review: review['reviewed_at']):
+        card_id = values['card_id']
+        if card_id not in owned_card_ids:
+            continue
+        schedule = next_state_after(values['response_quality'], latest.get(card_id) or states.get(card_id), values['reviewed_at'], params)
+        review = CardReview(user_id=user_id, **values, **schedule)
+        created[values['client_review_id']] = review
+        latest[card_id] = review
+    
+    db_session.add_all(created.values())
+    await db_session.flush()
+    for review in latest.values():
+        await db_session.execute(card_state_upsert(review))
+    await db_session.commit()
+    
+    results = {client_id: ('duplicate', review) for client_id, review in existing.items()}
+    results.update({client_id: ('created', review) for client_id, review in created.items()})
+    return results
+
+
+@card_reviews.route('/batch', methods=['POST'])
+@require_auth
+async def create_reviews_batch(request):
+    """
+    Record many ratings at once. The server schedules each card with SM-2 from its
+    current state and commits every review and state update in one transaction.
+    Resubmitting a client_review_id returns the stored review instead of a new one,
+    so offline queues can safely retry.
+    """
+    session = get_request_session(request)
+    try:
+        user_id = request.ctx.user['id']
+        items = (request.json or {}).get('reviews')
+        
+        if not isinstance(items, list) or not items:
+            return json({"error": "reviews must be a non-empty list"}, status=400)
+        if len(items) > MAX_REVIEW_BATCH:
+            return json({"error": f"At most {MAX_REVIEW_BATCH} reviews per batch"}, status=400)
+        
+        reviews = []
+        for index, item in enumerate(items):
+            values, error = parse_batch_review(item)
+            if error:
+                return json({"error": f"reviews[{index}]: {error}"}, status=400)
+            reviews.append(values)
+        if len({review['client_review_id'] for review in reviews}) != len(reviews):
+            return json({"error": "client_review_id values must be unique within a batch"}, status=400)
+        
+        try:
+            results = await write_review_batch(session, user_id, reviews)
+        except IntegrityError:
+            # A concurrent retry stored some of these ids first; they now come back as duplicates
+            await session.rollback()
+            results = await write_review_batch(session, user_id, reviews)
+        
+        response = []
+        for review in reviews:
+            client_id = review['client_review_id']
+            if client_id in results:
+                status, stored = results[client_id]
+                response.append({"client_review_id": client_id, "status": status, "review": stored.to_dict()})
+            else:
+                response.append({"client_review_id": client_id, "status": "error", "error": "Card not found"})
+        
+        return json({
+            "results": response,
+            "created": sum(1 for item in response if item['status'] == 'created'),
+            "duplicates": sum(1 for item in response if item['status'] == 'duplicate'),
+            "errors": sum(1 for item in response if item['status'] == 'error')
+        })
+        
+    except Exception as e:
+        print(f"Error creating review batch: {e}")
+        await session.rollback()
         return json({"error": "Internal server error"}, status=500)
 
 @card_reviews.route('/<card_id:int>/history', methods=['GET'])
@@ -144,25 +291,27 @@ async def create_review(request):
 async def get_card_history(request, card_id):
     """Get review history for a specific card"""
     
-    session = get_db_session() 
+    session = get_request_session(request)
     
     try:
         user_id = request.ctx.user['id']
         # Verify user owns the card
-        card = session.query(Card)\
-            .join(Deck)\
-            .filter(Card.id == card_id)\
-            .filter(Deck.user_id == user_id)\
-            .first()
+        card = await session.scalar(
+            select(Card)
+            .join(Deck)
+            .filter(Card.id == card_id)
+            .filter(Deck.user_id == user_id)
+        )
         
         if not card:
             return json({"error": "Card not found"}, status=404)
         
         # Get all reviews for this card
-        reviews = session.query(CardReview)\
-            .filter_by(card_id=card_id, user_id=user_id)\
-            .order_by(desc(CardReview.reviewed_at))\
-            .all()
+        reviews = (await session.scalars(
+            select(CardReview)
+            .filter_by(card_id=card_id, user_id=user_id)
+            .order_by(desc(CardReview.reviewed_at))
+        )).all()
         
         return json([review.to_dict() for review in reviews])
         
@@ -175,7 +324,7 @@ async def get_card_history(request, card_id):
 @require_auth
 async def get_pod_card_reviews(request, pod_id):
     """Get card reviews for cards in a pod"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         user_id = request.ctx.user['id']
         data = request.json
@@ -185,27 +334,17 @@ async def get_pod_card_reviews(request, pod_id):
             return json([])
         
         # Verify pod belongs to user
-        pod = session.query(Pod).filter_by(id=pod_id, user_id=user_id).first()
+        pod = await session.scalar(select(Pod).filter_by(id=pod_id, user_id=user_id))
         if not pod:
             return json({"error": "Pod not found"}, status=404)
         
-        # Get latest review for each card (same logic as deck endpoint)
-        from sqlalchemy import func
-        
-        latest_reviews_subquery = session.query(
-            CardReview.card_id,
-            func.max(CardReview.reviewed_at).label('latest_reviewed_at')
-        ).filter(
-            CardReview.card_id.in_(card_ids),
-            CardReview.user_id == user_id
-        ).group_by(CardReview.card_id).subquery()
-        
-        latest_reviews = session.query(CardReview).join(
-            latest_reviews_subquery,
-            (CardReview.card_id == latest_reviews_subquery.c.card_id) &
-            (CardReview.reviewed_at == latest_reviews_subquery.c.latest_reviewed_at) &
-            (CardReview.user_id == user_id)
-        ).all()
+        # Current state of each requested card (same source as deck endpoint)
+        latest_reviews = (await session.scalars(
+            select(CardState).filter(
+                CardState.card_id.in_(card_ids),
+                CardState.user_id == user_id
+            )
+        )).all()
         
         # Convert to list of dictionaries with timezone conversion
         reviews_data = []
@@ -232,6 +371,4 @@ async def get_pod_card_reviews(request, pod_id):
         
     except Exception as e:
         print(f"❌ Error in get_pod_card_reviews: {e}")
-        return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
\ No newline at end of file
+        return json({"error": str(e)}, status=500)
\ No newline at end of file
@@ -1,17 +1,166 @@
 # app/routes/cards.py
 from sanic import Blueprint
 from sanic.response import json
-from sqlalchemy import func
-from models.database import get_db_session
+from sqlalchemy import bindparam, insert, select, update
+from models.database import get_request_session
 from models.deck import Deck
 from models.card import Card
+from models.card_search import highlight, match_expression, ranked_search, search_terms
+from middleware.auth import require_auth
+from utils.ordering import OrderedList, plan_order
+from utils.session_cache import invalidate_deck
 
 cards_bp = Blueprint("cards", url_prefix="/api/cards")
 
+# Card fields the bulk and sync endpoints create and update
+CARD_FIELDS = ("front_content", "back_content", "front_type", "back_type", "tags", "difficulty")
+
+# Search results per page (?limit=N on /search)
+DEFAULT_SEARCH_PAGE = 20
+MAX_SEARCH_PAGE = 100
+
+
+def parse_search_limit(value):
+    """Parse the search page size, capped at MAX_SEARCH_PAGE; raises ValueError on bad input"""
+    if value is None:
+        return DEFAULT_SEARCH_PAGE
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if value < 1:
+        raise ValueError("limit must be positive")
+    return min(value, MAX_SEARCH_PAGE)
+
+
+def parse_search_cursor(value):
+    """Parse a next_after cursor ('<score>:<card id>') into (score, card id); raises ValueError on bad input"""
+    if not value:
+        return None
+    try:
+        score, card_id = value.rsplit(':', 1)
+        return float(score), int(card_id)
+    except ValueError:
+        raise ValueError("after must be a cursor returned as next_after")
+
+
+def deck_card_order(deck_id):
+    """A deck's active cards, in display order"""
+    return OrderedList(
+        Card.__table__, Card.id, Card.display_order,
+        Card.deck_id == deck_id, Card.is_active == True,
+        tiebreak=(Card.created_at,)
+    )
+
+
+async def apply_card_changes(session, deck_id, creates=(), updates=(), deletes=(), order=None):
+    """
+    Apply a batch of changes to a deck's cards in the session's transaction (the caller commits).
+    creates: card dicts, each with front_content and back_content and an optional ref (a client key);
+    updates: dicts with a card id and the CARD_FIELDS to change; deletes: card ids (soft deleted);
+    order: the deck's final order as card ids and refs of created cards, or None to append the new cards.
+    Inserts and updates are executemany statements; the counter and search triggers follow them.
+    Raises ValueError for a change the deck cannot take.
+    """
+    cards = Card.__table__
+    card_order = deck_card_order(deck_id)
+    current = await card_order.load(session)
+    current_ids = {card_id for card_id, _ in current}
+    
+    new_cards, refs = [], {}
+    for index, card in enumerate(creates):
+        if not (card.get("front_content") and card.get("back_content")):
+            raise ValueError(f"Card {index} to create is missing front_content or back_content")
+        if card.get("ref") is not None:
+            if card["ref"] in refs:
+                raise ValueError(f"Duplicate ref {card['ref']!r}")
+            refs[card["ref"]] = index
+        new_cards.append({field: card[field] for field in CARD_FIELDS if field in card})
+    
+    deleted_ids = set(deletes)
+    changes = {}
+    for card in updates:
+        card_id = card.get("id")
+        if card_id not in current_ids:
+            raise ValueError(f"Card {card_id} is not in this deck")
+        if card_id in deleted_ids or card_id in changes:
+            raise ValueError(f"Card {card_id} is changed more than once")
+        changes[card_id] = {field: card[field] for field in CARD_FIELDS if field in card}
+    for card_id in deleted_ids:
+        if card_id not in current_ids:
+            raise ValueError(f"Card {card_id} is not in this deck")
+    
+    # New cards are keyed by their position in creates until they have ids
+    remaining = [(card_id, key) for card_id, key in current if card_id not in deleted_ids]
+    if order is None:
+        final = [card_id for card_id, _ in remaining] + [("new", index) for index in range(len(new_cards))]
+    else:
+        final = []
+        for item in order:
+            if isinstance(item, str):
+                if item not in refs:
+                    raise ValueError(f"Unknown ref {item!r} in order")
+                final.append(("new", refs[item]))
+            elif item in current_ids and item not in deleted_ids:
+                final.append(item)
+            else:
+                raise ValueError(f"Card {item} in order is not in this deck")
+        if len(set(final)) != len(final) or len(final) != len(remaining) + len(new_cards):
+            raise ValueError("order must list every remaining and created card exactly once")
+    keys, rebalanced = plan_order(remaining, final)
+    
+    # Soft deletes go through the ORM, so statistics and caches of reviewed cards follow them
+    if deleted_ids:
+        for card in (await session.scalars(select(Card).filter(Card.id.in_(deleted_ids)))).all():
+            card.is_active = False
+        await session.flush()
+    
+    created_ids = []
+    if new_cards:
+        rows = [
+            {"front_type": "text", "back_type": "text", "tags": "", "difficulty": 0, **card,
+             "deck_id": deck_id, "display_order": keys[("new", index)]}
+            for index, card in enumerate(new_cards)
+        ]
+        # Multi-row INSERT ... RETURNING; new cards' keys are unique in the deck, so rows map back by key
+        # (asking SQLAlchemy to sort RETURNING by parameter order makes it insert one row at a time on SQLite)
+        created = dict((await session.execute(
+            insert(cards).returning(cards.c.display_order, cards.c.id), rows
+        )).all())
+        created_ids = [created[row["display_order"]] for row in rows]
+    
+    # One executemany per set of changed fields
+    by_fields = {}
+    for card_id, fields in changes.items():
+        if fields:
+            by_fields.setdefault(tuple(sorted(fields)), []).append(
+                {"b_id": card_id, **{f"b_{field}": value for field, value in fields.items()}}
+            )
+    for fields, rows in by_fields.items():
+        await session.execute(
+            update(cards).where(cards.c.id == bindparam("b_id"), cards.c.deck_id == deck_id)
+            .values({field: bindparam(f"b_{field}") for field in fields}),
+            rows
+        )
+    
+    reordered = await card_order.write(
+        session, {card_id: key for card_id, key in keys.items() if not isinstance(card_id, tuple)}
+    )
+    version = await session.scalar(select(Deck.version).filter_by(id=deck_id))
+    return {
+        "created": created_ids,
+        "updated": sum(1 for fields in changes.values() if fields),
+        "deleted": len(deleted_ids),
+        "reordered": reordered,
+        "rebalanced": rebalanced,
+        "version": version
+    }
+
+
 @cards_bp.route("/deck/<deck_id:int>", methods=["POST"])
 async def create_card(request, deck_id):
     """Create a new card in a deck"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         front_content = data.get("front_content")
@@ -25,16 +174,13 @@ async def create_card(request, deck_id):
             return json({"error": "Missing required fields: front_content, back_content"}, status=400)
         
         # Verify deck exists
-        deck = session.query(Deck).filter_by(id=deck_id).first()
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id))
         if not deck:
             return json({"error": "Deck not found"}, status=404)
         
-        # If no display_order provided, set it to the next available position
+        # If no display_order provided, append the card after the last one
         if display_order is None:
-            max_order = session.query(func.max(Card.display_order)).filter_by(
-                deck_id=deck_id, is_active=True
-            ).scalar() or 0
-            display_order = max_order + 1
+            display_order = await deck_card_order(deck_id).next_key(session)
         
         # Create new card
         new_card = Card(
@@ -47,12 +193,9 @@ async def create_card(request, deck_id):
             display_order=display_order
         )
         
+        # The deck's (and its pods') card counts are kept by the counter triggers
         session.add(new_card)
-        
-        # Update deck card count
-        deck.card_count += 1
-        
-        session.commit()
+        await session.commit()
         
         return json({
             "message": "Card created successfully",
@@ -60,27 +203,67 @@ async def create_card(request, deck_id):
         }, status=201)
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
+        return json({"error": str(e)}, status=500)
+
+
+@cards_bp.route("/deck/<deck_id:int>/bulk", methods=["POST"])
+@require_auth
+async def bulk_create_cards(request, deck_id):
+    """
+    Create many cards in one of the user's decks, appended in the given order,
+    in one transaction ({"cards": [{front_content, back_content, ...}]}).
+    Returns the new card ids in the same order and the deck's version.
+    """
+    session = get_request_session(request)
+    try:
+        user_id = request.ctx.user['id']
+        cards = (request.json or {}).get("cards")
+        
+        if not cards or not isinstance(cards, list):
+            return json({"error": "Missing required field: cards"}, status=400)
+        
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id, user_id=user_id))
+        if not deck:
+            return json({"error": "Deck not found"}, status=404)
+        
+        try:
+            result = await apply_card_changes(session, deck_id, creates=cards)
+        except ValueError as e:
+            await session.rollback()
+            return json({"error": str(e)}, status=400)
+        
+        await session.commit()
+        invalidate_deck(deck_id)
+        
+        return json({
+            "message": f"Created {len(result['created'])} cards",
+            "created": result["created"],
+            "version": result["version"]
+        }, status=201)
+        
+    except Exception as e:
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @cards_bp.route("/deck/<deck_id:int>", methods=["GET"])
 async def get_deck_cards(request, deck_id):
     """Get all cards in a deck"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         # Verify deck exists
-        deck = session.query(Deck).filter_by(id=deck_id).first()
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id))
         if not deck:
             return json({"error": "Deck not found"}, status=404)
         
         # Get cards ordered by display_order, then by created_at
-        cards = session.query(Card).filter_by(
+        cards = (await session.scalars(
+            select(Card).filter_by(
             deck_id=deck_id, 
             is_active=True
-        ).order_by(Card.display_order, Card.created_at).all()
+            ).order_by(Card.display_order, Card.created_at)
+        )).all()
         
         cards_data = [card.to_dict() for card in cards]
         
@@ -91,59 +274,72 @@ async def get_deck_cards(request, deck_id):
     
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @cards_bp.route("/deck/<deck_id:int>/reorder", methods=["PUT"])
 async def reorder_deck_cards(request, deck_id):
-    """Reorder cards within a deck"""
-    session = get_db_session()
+    """
+    Reorder cards within a deck, either with moves (each card placed after another,
+    or first when after_id is null) or with explicit card_orders.
+    A move writes one row unless the deck has to be respaced; all changed orders
+    are written with one executemany UPDATE.
+    """
+    session = get_request_session(request)
     try:
         data = request.json
+        moves = data.get("moves", [])  # List of {card_id: int, after_id: int | null}
         card_orders = data.get("card_orders", [])  # List of {card_id: int, order: int}
         
-        if not card_orders:
-            return json({"error": "Missing card_orders"}, status=400)
+        if not (moves or card_orders):
+            return json({"error": "Missing moves or card_orders"}, status=400)
+        if moves and card_orders:
+            return json({"error": "Send either moves or card_orders, not both"}, status=400)
         
         # Verify deck exists
-        deck = session.query(Deck).filter_by(id=deck_id).first()
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id))
         if not deck:
             return json({"error": "Deck not found"}, status=404)
         
-        # Update display orders
-        for item in card_orders:
-            card_id = item.get("card_id")
-            new_order = item.get("order")
-            
-            if card_id is not None and new_order is not None:
-                card = session.query(Card).filter_by(
-                    id=card_id, 
-                    deck_id=deck_id
-                ).first()
-                
-                if card:
-                    card.display_order = new_order
-        
-        session.commit()
+        card_order = deck_card_order(deck_id)
+        rebalanced = False
+        if moves:
+            try:
+                keys, rebalanced = await card_order.plan(
+                    session, [(item.get("card_id"), item.get("after_id")) for item in moves]
+                )
+            except KeyError as e:
+                return json({"error": f"Card {e.args[0]} is not in this deck"}, status=400)
+        else:
+            current = dict(await card_order.load(session))
+            keys = {
+                item.get("card_id"): item.get("order")
+                for item in card_orders
+                if item.get("card_id") in current and item.get("order") is not None
+                and current[item.get("card_id")] != item.get("order")
+            }
+        
+        updated = await card_order.write(session, keys)
+        await session.commit()
+        invalidate_deck(deck_id)
         
         return json({
-            "message": "Card order updated successfully"
+            "message": "Card order updated successfully",
+            "updated": updated,
+            "rebalanced": rebalanced,
+            "display_orders": keys
         })
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @cards_bp.route("/<card_id:int>", methods=["GET"])
 async def get_card(request, card_id):
     """Get a specific card"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
-        card = session.query(Card).filter_by(id=card_id).first()
+        card = await session.scalar(select(Card).filter_by(id=card_id))
         
         if not card:
             return json({"error": "Card not found"}, status=404)
@@ -152,18 +348,16 @@ async def get_card(request, card_id):
     
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @cards_bp.route("/<card_id:int>", methods=["PUT"])
 async def update_card(request, card_id):
     """Update a card"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         
-        card = session.query(Card).filter_by(id=card_id).first()
+        card = await session.scalar(select(Card).filter_by(id=card_id))
         if not card:
             return json({"error": "Card not found"}, status=404)
         
@@ -183,7 +377,7 @@ async def update_card(request, card_id):
         if "difficulty" in data:
             card.difficulty = data["difficulty"]
         
-        session.commit()
+        await session.commit()
         
         return json({
             "message": "Card updated successfully",
@@ -191,78 +385,91 @@ async def update_card(request, card_id):
         })
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @cards_bp.route("/<card_id:int>", methods=["DELETE"])
 async def delete_card(request, card_id):
     """Delete a card (soft delete)"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
-        card = session.query(Card).filter_by(id=card_id).first()
+        card = await session.scalar(select(Card).filter_by(id=card_id))
         
         if not card:
             return json({"error": "Card not found"}, status=404)
         
-        # Soft delete - mark as inactive
+        # Soft delete - mark as inactive (the counter triggers update the card counts)
         card.is_active = False
-        
-        # Update deck card count
-        deck = session.query(Deck).filter_by(id=card.deck_id).first()
-        if deck:
-            deck.card_count = max(0, deck.card_count - 1)
-        
-        session.commit()
+        await session.commit()
         
         return json({
             "message": "Card deleted successfully"
         })
     
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @cards_bp.route("/search", methods=["GET"])
+@require_auth
 async def search_cards(request):
-    """Search cards by content or tags"""
-    session = get_db_session()
+    """
+    Full-text search over the user's cards (?q=...&limit=N&after=<cursor>).
+    Every word must match the content or tags, the last one as a prefix; results are ranked
+    with BM25 and come with highlighted snippets and the cursor of the next page.
+    """
+    session = get_request_session(request)
     try:
+        user_id = request.ctx.user['id']
         query = request.args.get("q", "")
-        user_id = request.args.get("user_id")
         
         if not query:
             return json({"error": "Search query required"}, status=400)
         
-        # Build search query
-        cards_query = session.query(Card).filter(Card.is_active == True)
-        
-        # Filter by user if provided
-        if user_id:
-            cards_query = cards_query.join(Deck).filter(Deck.user_id == user_id)
-        
-        # Search in front content, back content, and tags
-        search_filter = (
-            Card.front_content.contains(query) |
-            Card.back_content.contains(query) |
-            Card.tags.contains(query)
-        )
-        
-        cards = cards_query.filter(search_filter).limit(50).all()
-        cards_data = [card.to_dict() for card in cards]
+        try:
+            limit = parse_search_limit(request.args.get("limit"))
+            after = parse_search_cursor(request.args.get("after"))
+        except ValueError as e:
+            return json({"error": str(e)}, status=400)
+        
+        terms = search_terms(query)
+        match = match_expression(user_id, terms)
+        if match is None:
+            return json({"cards": [], "query": query, "count": 0, "has_more": False, "next_after": None})
+        
+        # One row past the page tells whether there is a next one
+        ranked = (await session.execute(ranked_search(match, limit + 1, after))).all()
+        has_more = len(ranked) > limit
+        ranked = ranked[:limit]
+        
+        card_ids = [card_id for card_id, _ in ranked]
+        cards_by_id = {}
+        if card_ids:
+            cards = (await session.scalars(select(Card).filter(Card.id.in_(card_ids)))).all()
+            cards_by_id = {card.id: card for card in cards}
+        
+        cards_data = []
+        for card_id, score in ranked:
+            card = cards_by_id.get(card_id)
+            if card:
+                cards_data.append({
+                    **card.to_dict(),
+                    "score": score,
+                    "highlights": {
+                        "front_content": highlight(card.front_content, terms),
+                        "back_content": highlight(card.back_content, terms)
+                    }
+                })
         
         return json({
             "cards": cards_data,
             "query": query,
-            "count": len(cards_data)
+            "count": len(cards_data),
+            "has_more": has_more,
+            "next_after": f"{ranked[-1][1]!r}:{ranked[-1][0]}" if has_more else None
         })
     
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
\ No newline at end of file
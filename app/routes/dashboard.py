@@ -4,10 +4,14 @@ Dashboard API routes for statistics and metrics.
 """
 
 from sanic import Blueprint
-from sanic.response import json
-from models.database import get_db_session
+from sanic.response import json, empty
+from models.database import get_request_session
 from middleware.auth import require_auth
 from utils.statistics import get_dashboard_stats
+from utils.forecast import get_review_forecast, FORECAST_MAX_DAYS
+from utils.dashboard_cache import dashboard_cache
+from config.timezone import tz_config
+from datetime import date, timedelta
 
 dashboard_bp = Blueprint("dashboard", url_prefix="/api/dashboard")
 
@@ -18,18 +22,25 @@ async def get_dashboard_statistics(request):
     """
     Get all dashboard statistics for the authenticated user.
     Returns metrics for cards learned, retention rate, total reviews, and study time.
+    Served from the per-user stats cache with an ETag; a matching If-None-Match gets 304.
     """
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         user_id = request.ctx.user['id']
         
-        # Get all dashboard statistics
-        stats = get_dashboard_stats(session, user_id)
+        # Get all dashboard statistics (computed once per change, shared by concurrent polls)
+        stats = await dashboard_cache.get(session, user_id, get_dashboard_stats)
+        
+        # Private to the user, and always revalidated
+        headers = {'ETag': stats.etag, 'Cache-Control': 'private, no-cache'}
+        if_none_match = request.headers.get('If-None-Match', '')
+        if stats.etag in (tag.strip() for tag in if_none_match.split(',')) or if_none_match.strip() == '*':
+            return empty(status=304, headers=headers)
         
         return json({
             'success': True,
-            'data': stats
-        })
+            'data': stats.data
+        }, headers=headers)
         
     except Exception as e:
         print(f"Error getting dashboard stats: {e}")
@@ -39,8 +50,6 @@ async def get_dashboard_statistics(request):
             'success': False,
             'error': 'Failed to load dashboard statistics'
         }, status=500)
-    finally:
-        session.close()
 
 
 @dashboard_bp.route("/stats/detailed", methods=["GET"])
@@ -51,7 +60,7 @@ async def get_detailed_statistics(request):
     Optional query parameters:
     - days: Number of days to look back (default: 30)
     """
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         user_id = request.ctx.user['id']
         days_back = int(request.args.get('days', 30))
@@ -65,10 +74,10 @@ async def get_detailed_statistics(request):
         
         # Get individual metrics with custom timeframe
         stats = {
-            'cards_learned': get_cards_learned_count(session, user_id),
-            'retention_rate': get_retention_rate(session, user_id, days_back),
-            'total_sessions': get_total_sessions_count(session, user_id),
-            'study_time_hours': get_total_study_time(session, user_id),
+            'cards_learned': await get_cards_learned_count(session, user_id),
+            'retention_rate': await get_retention_rate(session, user_id, days_back),
+            'total_sessions': await get_total_sessions_count(session, user_id),
+            'study_time_hours': await get_total_study_time(session, user_id),
             'timeframe_days': days_back
         }
         
@@ -85,5 +94,54 @@ async def get_detailed_statistics(request):
             'success': False,
             'error': 'Failed to load detailed statistics'
         }, status=500)
-    finally:
-        session.close()
\ No newline at end of file
+
+
+@dashboard_bp.route("/forecast", methods=["GET"])
+@require_auth
+async def get_forecast(request):
+    """
+    Forecast how many reviews fall on each of the next days (local time).
+    Optional query parameters:
+    - days: Number of days to forecast (default: 30, max: 365)
+    """
+    session = get_request_session(request)
+    try:
+        user_id = request.ctx.user['id']
+        try:
+            days = int(request.args.get('days', 30))
+        except ValueError:
+            return json({'success': False, 'error': 'days must be an integer'}, status=400)
+        if not 1 <= days <= FORECAST_MAX_DAYS:
+            return json({'success': False, 'error': f'days must be between 1 and {FORECAST_MAX_DAYS}'}, status=400)
+        
+        forecast = await get_review_forecast(session, user_id)
+        
+        start = date.fromisoformat(forecast['start_date'])
+        daily = [
+            {'date': (start + timedelta(days=offset)).isoformat(), 'reviews': reviews}
+            for offset, reviews in enumerate(forecast['daily'][:days])
+        ]
+        peak = max(daily, key=lambda day: day['reviews'])
+        
+        return json({
+            'success': True,
+            'data': {
+                'days': days,
+                'timezone': tz_config.tz_name,
+                'forecast': daily,
+                'total_reviews': sum(day['reviews'] for day in daily),
+                'peak': peak,
+                'cards_scheduled': forecast['cards_scheduled'],
+                'overdue': forecast['overdue'],
+                'assumptions': {'expected_rating': forecast['expected_rating'], 'lapses': False}
+            }
+        })
+        
+    except Exception as e:
+        print(f"Error getting review forecast: {e}")
+        import traceback
+        traceback.print_exc()
+        return json({
+            'success': False,
+            'error': 'Failed to load review forecast'
+        }, status=500)
@@ -4,19 +4,22 @@ import csv
 import io
 from sanic import Blueprint
 from sanic.response import json, HTTPResponse
-from sqlalchemy import desc, func, and_
+from sqlalchemy import desc, and_, case, func, literal, select, union_all
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta, timezone
-from models.database import get_db_session
+from models.database import get_request_session
 from models.study_session import StudySession
 from models.card_review import CardReview
+from models.card_state import CardState
 from models.user import User
 from models.deck import Deck
 from models.card import Card
 from models.pod_deck import PodDeck
-from models.pod import Pod
-from utils.statistics import calculate_sm2_retention, calculate_simple_retention
+from models.user_statistics import RETENTION_POINTS
 from middleware.auth import require_auth
 from config.timezone import tz_config
+from routes.cards import apply_card_changes
+from utils.session_cache import invalidate_deck
 import re
 
 decks_bp = Blueprint("decks", url_prefix="/api/decks")
@@ -25,7 +28,7 @@ decks_bp = Blueprint("decks", url_prefix="/api/decks")
 @require_auth
 async def create_deck(request):
     """Create a new deck"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         # Get user_id from authenticated user instead of request body
@@ -44,7 +47,7 @@ async def create_deck(request):
         )
         
         session.add(new_deck)
-        session.commit()
+        await session.commit()
         
         return json({
             "message": "Deck created successfully",
@@ -53,18 +56,16 @@ async def create_deck(request):
         }, status=201)
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @decks_bp.route("/<deck_id:int>", methods=["GET"])
 async def get_deck(request, deck_id):
     """Get a specific deck"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
-        deck = session.query(Deck).filter_by(id=deck_id).first()
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id))
         
         if not deck:
             return json({"error": "Deck not found"}, status=404)
@@ -73,18 +74,16 @@ async def get_deck(request, deck_id):
     
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @decks_bp.route("/<deck_id:int>", methods=["PUT"])
 async def update_deck(request, deck_id):
     """Update a deck"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         
-        deck = session.query(Deck).filter_by(id=deck_id).first()
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id))
         if not deck:
             return json({"error": "Deck not found"}, status=404)
         
@@ -96,7 +95,7 @@ async def update_deck(request, deck_id):
         if "is_public" in data:
             deck.is_public = data["is_public"]
         
-        session.commit()
+        await session.commit()
         
         return json({
             "message": "Deck updated successfully",
@@ -104,51 +103,82 @@ async def update_deck(request, deck_id):
         })
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @decks_bp.route("/<deck_id:int>", methods=["DELETE"])
 @require_auth 
 async def delete_deck(request, deck_id):
     """Delete a deck"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
-        deck = session.query(Deck).filter_by(id=deck_id).first()
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id))
         
         if not deck:
             return json({"error": "Deck not found"}, status=404)
         
-        # Update all pods that contain this deck BEFORE deletion
-        pod_decks = session.query(PodDeck).filter_by(deck_id=deck_id).all()
-        for pod_deck in pod_decks:
-            pod = session.query(Pod).filter_by(id=pod_deck.pod_id).first()
-            if pod:
-                pod.deck_count = max(0, pod.deck_count - 1)
-                pod.total_card_count = max(0, pod.total_card_count - deck.card_count)
-        
-        # Now delete the deck (cascade will handle pod_decks)
+        # Delete the deck (cascade handles cards and pod_decks, and the counter triggers the pods' counts)
         deck_name = deck.name
-        session.delete(deck)
-        session.commit()
+        await session.delete(deck)
+        await session.commit()
         
         return json({
             "message": f"Deck '{deck_name}' deleted successfully"
         })
     
     except Exception as e:
-        session.rollback()
+        await session.rollback()
+        return json({"error": str(e)}, status=500)
+
+
+@decks_bp.route("/<deck_id:int>/cards", methods=["PATCH"])
+@require_auth
+async def sync_deck_cards(request, deck_id):
+    """
+    Apply a deck editor save in one transaction:
+    {"version": n, "create": [{ref, front_content, back_content, ...}], "update": [{id, ...}],
+     "delete": [ids], "order": [card ids and refs]}. Every key is optional; with version,
+    the save is refused (409) if the deck's cards changed since that version was read.
+    Returns the created card ids (in create order) and the deck's new version.
+    """
+    session = get_request_session(request)
+    try:
+        user_id = request.ctx.user['id']
+        data = request.json or {}
+        
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id, user_id=user_id))
+        if not deck:
+            return json({"error": "Deck not found"}, status=404)
+        
+        if data.get("version") is not None and data["version"] != deck.version:
+            return json({"error": "The deck was changed since it was loaded", "version": deck.version}, status=409)
+        
+        try:
+            result = await apply_card_changes(
+                session, deck_id,
+                creates=data.get("create") or [],
+                updates=data.get("update") or [],
+                deletes=data.get("delete") or [],
+                order=data.get("order")
+            )
+        except ValueError as e:
+            await session.rollback()
+            return json({"error": str(e)}, status=400)
+        
+        await session.commit()
+        invalidate_deck(deck_id)
+        
+        return json({"message": "Deck cards updated successfully", **result})
+        
+    except Exception as e:
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @decks_bp.route("/import-file", methods=["POST"])
 async def import_file(request):
     """Parse uploaded CSV/TSV file and return card data"""
-    session = get_db_session()
     try:
         upload_file = request.files.get('file')
         if not upload_file:
@@ -188,7 +218,7 @@ async def import_file(request):
         
         # Parse CSV with proper handling
         cards_data = []
-
+        
         # Skip any initial empty rows, then check for header
         first_row = None
         for row in csv_reader:
@@ -196,7 +226,7 @@ async def import_file(request):
             if row and any(cell.strip() for cell in row):
                 first_row = row
                 break
-
+        
         # Check if first non-empty row is a header
         if first_row and first_row[0].lower().strip() == 'term':
             pass  # Skip header, continue with remaining rows
@@ -207,7 +237,7 @@ async def import_file(request):
                     'term': first_row[0].strip(),
                     'definition': first_row[1].strip()
                 })
-
+        
         # Process remaining rows
         for row in csv_reader:
             if len(row) >= 2 and row[0].strip():
@@ -223,25 +253,23 @@ async def import_file(request):
         
     except Exception as e:
         return json({"error": f"Failed to parse file: {str(e)}"}, status=400)
-    finally:
-        session.close()
 
 
 @decks_bp.route("/<deck_id:int>/export", methods=["GET"])
 async def export_deck(request, deck_id):
     """Export deck as CSV"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         # Get deck with verification
-        deck = session.query(Deck).filter_by(id=deck_id).first()
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id))
         if not deck:
             return json({"error": "Deck not found"}, status=404)
         
         # Get all active cards for this deck
-        cards = session.query(Card).filter_by(
+        cards = (await session.scalars(select(Card).filter_by(
             deck_id=deck_id, 
             is_active=True
-        ).order_by(Card.display_order, Card.created_at).all()
+        ).order_by(Card.display_order, Card.created_at))).all()
         
         # Create CSV content with metadata
         csv_lines = []
@@ -285,8 +313,6 @@ async def export_deck(request, deck_id):
         
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 # User specific routes
@@ -294,28 +320,30 @@ async def export_deck(request, deck_id):
 @require_auth
 async def get_my_decks(request):
     """Get current user's decks"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         # Get user ID from authenticated context
         user_id = request.ctx.user['id']
         
-        decks = session.query(Deck).filter_by(user_id=user_id).order_by(Deck.created_at.desc()).all()
+        decks = (await session.scalars(
+            select(Deck).filter_by(user_id=user_id).order_by(Deck.created_at.desc())
+        )).all()
         decks_data = [deck.to_dict() for deck in decks]
         
         return json({"decks": decks_data})
     
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
         
         
 @decks_bp.route("/users/<user_id:int>", methods=["GET"])
 async def get_user_decks(request, user_id):
     """Get all decks for a user"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
-        decks = session.query(Deck).filter_by(user_id=user_id).order_by(Deck.created_at.desc()).all()
+        decks = (await session.scalars(
+            select(Deck).filter_by(user_id=user_id).order_by(Deck.created_at.desc())
+        )).all()
         
         decks_data = [deck.to_dict() for deck in decks]
         
@@ -323,52 +351,34 @@ async def get_user_decks(request, user_id):
     
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @decks_bp.route('/my-decks-with-stats', methods=['GET'])
 @require_auth
 async def get_my_decks_with_stats(request):
     """Get user's decks with last session statistics including pod sessions"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         user_id = request.ctx.user['id']
         
-        # Get user's decks
-        decks = session.query(Deck).filter_by(user_id=user_id).order_by(Deck.created_at.desc()).all()
-        deck_data = []
+        # Get user's decks, with pod memberships loaded for to_dict(include_pods=True)
+        decks = (await session.scalars(
+            select(Deck).filter_by(user_id=user_id)
+            .options(joinedload(Deck.pod_decks).joinedload(PodDeck.pod))
+            .order_by(Deck.created_at.desc())
+        )).unique().all()
+        
+        # Everything below is computed for all decks at once, so the query count does not grow with the library
+        latest_sessions = await get_latest_trackable_sessions(session, user_id)
+        due_info = {}
+        if any(s.mode == 'full-spaced' for s in latest_sessions.values()):
+            due_info = await get_sm2_due_info(session, user_id)
+        retention = await calculate_deck_retention_rates(session, user_id) if latest_sessions else {}
         
+        deck_data = []
         for deck in decks:
-            # Get latest session for this deck (direct deck sessions)
-            # ONLY consider sessions with trackable modes (not 'basic')
-            latest_deck_session = session.query(StudySession).filter_by(
-                deck_id=deck.id, 
-                user_id=user_id
-            ).filter(
-                StudySession.ended_at.isnot(None),
-                StudySession.mode.in_(['simple-spaced', 'full-spaced'])  # Only trackable modes
-            ).order_by(StudySession.ended_at.desc()).first()
-            
-            # Get latest pod session that included this deck
-            # ONLY consider sessions with trackable modes (not 'basic')
-            latest_pod_session = session.query(StudySession).join(
-                PodDeck, StudySession.pod_id == PodDeck.pod_id
-            ).filter(
-                PodDeck.deck_id == deck.id,
-                StudySession.user_id == user_id,
-                StudySession.ended_at.isnot(None),
-                StudySession.mode.in_(['simple-spaced', 'full-spaced'])  # Only trackable modes
-            ).order_by(StudySession.ended_at.desc()).first()
-            
-            # Determine which session is more recent
-            latest_session = None
-            if latest_deck_session and latest_pod_session:
-                latest_session = latest_deck_session if latest_deck_session.ended_at > latest_pod_session.ended_at else latest_pod_session
-            elif latest_deck_session:
-                latest_session = latest_deck_session
-            elif latest_pod_session:
-                latest_session = latest_pod_session
+            latest_session = latest_sessions.get(deck.id)
+            deck_retention = retention.get(deck.id, {})
             
             session_stats = None
             if latest_session:
@@ -376,13 +386,13 @@ async def get_my_decks_with_stats(request):
                 
                 if latest_session.mode == 'full-spaced':
                     # SM-2 mode stats
-                    next_review, cards_due = get_sm2_due_info(session, deck.id, user_id)
+                    next_review, cards_due = due_info.get(deck.id, (None, 0))
                     session_stats = {
                         'mode': 'full-spaced',
                         'next_review': next_review.isoformat() if next_review else None,
                         'cards_due': cards_due,
                         'duration_minutes': duration_minutes,
-                        'retention_rate': calculate_sm2_retention(session, user_id, deck.id),
+                        'retention_rate': deck_retention.get('sm2', 0),
                         'is_overdue': tz_config.utc_to_local(next_review).date() <= tz_config.now().date() if next_review else False,
                         'last_studied': latest_session.ended_at.isoformat(),
                         'session_type': 'pod' if latest_session.pod_id else 'deck'
@@ -392,7 +402,7 @@ async def get_my_decks_with_stats(request):
                         'mode': 'simple-spaced',
                         'last_reviewed': latest_session.ended_at.isoformat(),
                         'duration_minutes': duration_minutes,
-                        'retention_rate': calculate_simple_retention_including_pods(session, deck.id, user_id),
+                        'retention_rate': deck_retention.get('simple', 0),
                         'total_cards': latest_session.cards_studied or 0,
                         'session_type': 'pod' if latest_session.pod_id else 'deck'
                     }
@@ -408,145 +418,180 @@ async def get_my_decks_with_stats(request):
         import traceback
         traceback.print_exc()
         return json({'error': str(e)}, status=500)
-    finally:
-        session.close()
 
 
-def get_sm2_due_info(db_session, deck_id, user_id):
-    """Get next review date and cards due for SM-2 mode"""
+async def get_latest_trackable_sessions(db_session, user_id):
+    """
+    Get the most recent completed session per deck, whether the deck was studied directly or through a pod.
+    Only trackable modes count (not 'basic'); on equal end times the pod session wins.
+    Returns {deck_id: StudySession}.
+    """
+    trackable = and_(
+        StudySession.user_id == user_id,
+        StudySession.ended_at.isnot(None),
+        StudySession.mode.in_(['simple-spaced', 'full-spaced'])
+    )
+    
+    deck_sessions = select(
+        StudySession.id.label('session_id'),
+        StudySession.deck_id.label('deck_id'),
+        StudySession.ended_at.label('ended_at'),
+        literal(0).label('via_pod')
+    ).filter(trackable, StudySession.deck_id.isnot(None))
+    
+    pod_sessions = select(
+        StudySession.id.label('session_id'),
+        PodDeck.deck_id.label('deck_id'),
+        StudySession.ended_at.label('ended_at'),
+        literal(1).label('via_pod')
+    ).join(PodDeck, StudySession.pod_id == PodDeck.pod_id).filter(trackable)
     
+    candidates = union_all(deck_sessions, pod_sessions).subquery()
+    ranked = select(
+        candidates.c.session_id,
+        candidates.c.deck_id,
+        func.row_number().over(
+            partition_by=candidates.c.deck_id,
+            order_by=(candidates.c.ended_at.desc(), candidates.c.via_pod.desc())
+        ).label('position')
+    ).subquery()
+    
+    rows = (await db_session.execute(
+        select(ranked.c.deck_id, StudySession)
+        .join(StudySession, StudySession.id == ranked.c.session_id)
+        .filter(ranked.c.position == 1)
+    )).all()
+    
+    return {deck_id: study_session for deck_id, study_session in rows}
+
+
+async def get_sm2_due_info(db_session, user_id):
+    """
+    Get next review date and cards due for SM-2 mode, for every deck of the user.
+    Returns {deck_id: (next_review, cards_due)}.
+    """
     try:
-        # Get cards from this deck
-        deck_cards = db_session.query(Card).filter_by(deck_id=deck_id, is_active=True).all()
-        if not deck_cards:
-            return None, 0
-        
-        card_ids = [card.id for card in deck_cards]
-        total_cards = len(card_ids)
-        
-        # Get the latest review for each card
-        latest_reviews_subquery = db_session.query(
-            CardReview.card_id,
-            func.max(CardReview.reviewed_at).label('latest_reviewed_at')
-        ).filter(
-            CardReview.card_id.in_(card_ids),
-            CardReview.user_id == user_id
-        ).group_by(CardReview.card_id).subquery()
-        
-        latest_reviews = db_session.query(CardReview).join(
-            latest_reviews_subquery,
-            and_(
-                CardReview.card_id == latest_reviews_subquery.c.card_id,
-                CardReview.reviewed_at == latest_reviews_subquery.c.latest_reviewed_at
-            )
-        ).filter(CardReview.user_id == user_id).all()
-        
-        # Build review schedule using configured timezone
         now = tz_config.now()  # Now using configured timezone
-        reviewed_card_ids = set()
-        review_dates = []
-        cards_due_now = 0
-        
-        for review in latest_reviews:
-            reviewed_card_ids.add(review.card_id)
-            if review.next_review_date:
-                review_date = review.next_review_date
-                if review_date.tzinfo is None:
-                    review_date = review_date.replace(tzinfo=timezone.utc)
-                
-                # Convert to local timezone for date comparison
-                local_review_date = tz_config.utc_to_local(review_date)
-                
-                if local_review_date.date() <= now.date():
-                    cards_due_now += 1
-                else:
-                    review_dates.append(review_date)
-        
-        # Cards never reviewed are also available now
-        never_reviewed_count = total_cards - len(reviewed_card_ids)
-        cards_due_now += never_reviewed_count
-        
-        # Find the next review session
-        if cards_due_now > 0:
-            # Cards are due now - find the earliest overdue date to show as "overdue since"
-            overdue_dates = []
-            for review in latest_reviews:
-                if review.next_review_date:
-                    review_date = review.next_review_date
-                    if review_date.tzinfo is None:
-                        review_date = review_date.replace(tzinfo=timezone.utc)
-                    
-                    # Convert to local timezone for comparison
-                    local_review_date = tz_config.utc_to_local(review_date)
-                    if local_review_date <= now:  # Use converted date
-                        overdue_dates.append(local_review_date)  # Store converted date
-            
-            if overdue_dates:
-                # Return the earliest overdue date
-                earliest_overdue = min(overdue_dates)
-                return earliest_overdue, cards_due_now
-            else:
-                # No specific overdue date available, return current time
-                return now, cards_due_now
-        elif review_dates:
-            # Find the earliest future review date (next session)
-            next_session_date = min(review_dates)
-            
-            # Count cards due at that next session date
-            # Convert to local timezone for date comparison
-            next_local_date = tz_config.utc_to_local(next_session_date)
-            cards_due_next_session = sum(
-                1 for date in review_dates 
-                if tz_config.utc_to_local(date).date() == next_local_date.date()
+        now_utc = now.astimezone(timezone.utc).replace(tzinfo=None)
+        tomorrow_start = tz_config.day_start_utc(1)
+        
+        # Per deck: active cards, reviewed cards, cards due by end of today,
+        # the earliest already-passed review date and the first future review date
+        rows = (await db_session.execute(
+            select(
+                Card.deck_id,
+                func.count(Card.id),
+                func.count(CardState.card_id),
+                func.sum(case((CardState.next_review_date < tomorrow_start, 1), else_=0)),
+                func.min(case((CardState.next_review_date <= now_utc, CardState.next_review_date))),
+                func.min(case((CardState.next_review_date >= tomorrow_start, CardState.next_review_date)))
             )
+            .join(Deck, Deck.id == Card.deck_id)
+            .outerjoin(CardState, and_(CardState.card_id == Card.id, CardState.user_id == user_id))
+            .filter(Deck.user_id == user_id, Card.is_active == True)
+            .group_by(Card.deck_id)
+        )).all()
+        
+        due_info = {}
+        upcoming = {}
+        for deck_id, total_cards, reviewed, due_reviewed, earliest_overdue, next_scheduled in rows:
+            # Cards never reviewed are also available now
+            cards_due_now = (due_reviewed or 0) + (total_cards - reviewed)
             
-            return next_session_date, cards_due_next_session
-        else:
-            # No future reviews scheduled
-            return None, 0
+            if cards_due_now > 0:
+                # Cards are due now - show the earliest overdue date as "overdue since", else the current time
+                if earliest_overdue:
+                    due_info[deck_id] = (tz_config.utc_to_local(earliest_overdue), cards_due_now)
+                else:
+                    due_info[deck_id] = (now, cards_due_now)
+            elif next_scheduled:
+                upcoming[deck_id] = next_scheduled.replace(tzinfo=timezone.utc)
+            else:
+                # No future reviews scheduled
+                due_info[deck_id] = (None, 0)
+        
+        if upcoming:
+            # Count cards due on the local day of each deck's next session
+            sessions_per_deck = await count_cards_on_next_review_day(db_session, user_id, tomorrow_start)
+            for deck_id, next_session_date in upcoming.items():
+                due_info[deck_id] = (next_session_date, sessions_per_deck.get(deck_id, 0))
+        
+        return due_info
         
     except Exception as e:
         print(f"Error getting SM-2 due info: {e}")
         import traceback
         traceback.print_exc()
-        return None, 0
+        return {}
+
+
+async def count_cards_on_next_review_day(db_session, user_id, tomorrow_start):
+    """Count, per deck, the cards scheduled on the same local day as the deck's first future review"""
+    scheduled = select(
+        Card.deck_id.label('deck_id'),
+        CardState.next_review_date.label('next_review_date'),
+        func.min(CardState.next_review_date).over(partition_by=Card.deck_id).label('first_review_date')
+    ).join(Card, Card.id == CardState.card_id).filter(
+        CardState.user_id == user_id,
+        CardState.next_review_date >= tomorrow_start,
+        Card.is_active == True
+    ).subquery()
     
+    # A local day never spans more than 25 hours, so two days bounds the rows fetched per deck
+    rows = (await db_session.execute(
+        select(scheduled.c.deck_id, scheduled.c.next_review_date, scheduled.c.first_review_date)
+        .filter(scheduled.c.next_review_date < func.datetime(scheduled.c.first_review_date, '+2 days'))
+    )).all()
+    
+    counts = {}
+    for deck_id, review_date, first_review_date in rows:
+        if tz_config.utc_to_local(review_date).date() == tz_config.utc_to_local(first_review_date).date():
+            counts[deck_id] = counts.get(deck_id, 0) + 1
+    return counts
+
 
-def calculate_simple_retention_including_pods(db_session, deck_id, user_id):
-    """Calculate retention rate including both deck and pod sessions by looking at card reviews"""
+async def calculate_deck_retention_rates(db_session, user_id):
+    """
+    Calculate 30-day retention for every deck of the user from card reviews,
+    which covers both direct deck sessions and pod sessions.
+    Returns {deck_id: {'sm2': average quality as a percentage, 'simple': percent remembered on active cards}}.
+    """
     try:
         thirty_days_ago = datetime.now() - timedelta(days=30)
         
-        # Get card IDs from this deck
-        deck_card_ids = [card.id for card in db_session.query(Card).filter_by(
-            deck_id=deck_id, 
-            is_active=True
-        ).all()]
-        
-        if not deck_card_ids:
-            return 0
+        # Quality as a percentage, the same credit the dashboard's SM-2 retention uses
+        quality_percent = case(RETENTION_POINTS, value=CardReview.response_quality, else_=0)
         
-        # Get all reviews for these cards in the last 30 days
-        # This automatically includes both direct deck sessions and pod sessions
-        reviews = db_session.query(CardReview).filter(
-            and_(
-                CardReview.card_id.in_(deck_card_ids),
+        rows = (await db_session.execute(
+            select(
+                Card.deck_id,
+                func.count(),
+                func.sum(quality_percent),
+                func.sum(case((Card.is_active == True, 1), else_=0)),
+                func.sum(case((and_(Card.is_active == True, CardReview.response_quality >= 3), 1), else_=0))
+            )
+            .select_from(CardReview)
+            .join(Card, Card.id == CardReview.card_id)
+            .filter(
                 CardReview.user_id == user_id,
                 CardReview.reviewed_at >= thirty_days_ago,
                 CardReview.response_quality.isnot(None)
             )
-        ).all()
-        
-        if not reviews:
-            return 0
-        
-        # Count reviews where response_quality >= 3 (remembered)
-        remembered_reviews = sum(1 for review in reviews if review.response_quality >= 3)
-        
-        return round((remembered_reviews / len(reviews)) * 100, 1)
+            .group_by(Card.deck_id)
+        )).all()
+        
+        retention = {}
+        for deck_id, reviews, percent_total, active_reviews, remembered in rows:
+            retention[deck_id] = {
+                # SM-2 retention covers every card of the deck
+                'sm2': round(percent_total / reviews) if reviews else 0,
+                # Simple retention only counts the deck's active cards
+                'simple': round((remembered / active_reviews) * 100, 1) if active_reviews else 0
+            }
+        return retention
         
     except Exception as e:
-        print(f"Error calculating retention with pods: {e}")
+        print(f"Error calculating deck retention rates: {e}")
         import traceback
         traceback.print_exc()
-        return 0
\ No newline at end of file
+        return {}
\ No newline at end of file
@@ -1,8 +1,8 @@
 # app/routes/pods.py
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 from sanic import Blueprint
 from sanic.response import json
-from models.database import get_db_session
+from models.database import get_request_session
 from models.user import User
 from models.pod import Pod
 from models.deck import Deck
@@ -11,16 +11,29 @@ from models.pod_deck import PodDeck
 from middleware.auth import require_auth
 from models.study_session import StudySession
 from models.card_review import CardReview
+from models.card_state import CardState
 from config.timezone import tz_config
-from sqlalchemy import func, and_
+from utils.ordering import OrderedList
+from utils.session_cache import invalidate_pod
+from sqlalchemy import and_, case, func, select
 
 pods_bp = Blueprint("pods", url_prefix="/api/pods")
 
+
+def pod_deck_order(pod_id):
+    """A pod's decks, in display order"""
+    return OrderedList(
+        PodDeck.__table__, PodDeck.deck_id, PodDeck.display_order,
+        PodDeck.pod_id == pod_id,
+        tiebreak=(PodDeck.id,)
+    )
+
+
 @pods_bp.route("", methods=["POST"])
 @require_auth  # Add this decorator
 async def create_pod(request):
     """Create a new pod"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         # Get user_id from authenticated user instead of request body
@@ -39,7 +52,7 @@ async def create_pod(request):
         )
         
         session.add(new_pod)
-        session.commit()
+        await session.commit()
         
         return json({
             "message": "Pod created successfully",
@@ -47,50 +60,50 @@ async def create_pod(request):
         }, status=201)
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @pods_bp.route("/my-pods", methods=["GET"])
 @require_auth
 async def get_user_pods(request):
     """Get current user's pods"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         user_id = request.ctx.user['id']
         include_stats = request.args.get('include_stats', 'false').lower() == 'true'
-
-        pods = session.query(Pod).filter_by(user_id=user_id).order_by(Pod.created_at.desc()).all()
+        
+        pods = (await session.scalars(
+            select(Pod).filter_by(user_id=user_id).order_by(Pod.created_at.desc())
+        )).all()
         pods_data = []
         
+        # Study statistics for every pod at once
+        pod_stats = await calculate_pods_study_stats(session, user_id, [pod.id for pod in pods]) if include_stats else {}
+        
         for pod in pods:
             pod_dict = pod.to_dict()
             
             if include_stats:
-                # Add study statistics
-                stats = calculate_pod_study_stats(session, pod.id)
-                pod_dict['study_stats'] = stats
+                pod_dict['study_stats'] = pod_stats[pod.id]
                 
             pods_data.append(pod_dict)
-
+        
         return json({"pods": pods_data})
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @pods_bp.route("/<pod_id:int>", methods=["GET"])
 @require_auth 
 async def get_pod(request, pod_id):
     """Get a single pod"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
+        user_id = request.ctx.user['id']
         include_stats = request.args.get('include_stats', 'false').lower() == 'true'
         
-        pod = session.query(Pod).filter_by(id=pod_id).first()
+        pod = await session.scalar(select(Pod).filter_by(id=pod_id, user_id=user_id))
         if not pod:
             return json({"error": "Pod not found"}, status=404)
         
@@ -98,134 +111,143 @@ async def get_pod(request, pod_id):
         
         if include_stats:
             # Add study statistics
-            stats = calculate_pod_study_stats(session, pod_id)
-            pod_dict['study_stats'] = stats
+            stats = await calculate_pods_study_stats(session, user_id, [pod_id])
+            pod_dict['study_stats'] = stats[pod_id]
             
         return json({"pod": pod_dict})
         
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
-def calculate_pod_study_stats(session, pod_id):
-    """Calculate study statistics for a pod"""
+async def calculate_pods_study_stats(session, user_id, pod_ids):
+    """
+    Calculate study statistics for a user's pods in three grouped queries
+    (sessions, simple-spaced reviews, cards due), however many pods there are.
+    Sessions, reviews and card states are all scoped to the user.
+    Returns {pod_id: stats}.
+    """
+    pod_stats = {
+        pod_id: {
+            'total_sessions': 0,
+            'cards_due': 0,
+            'total_cards_studied': 0,
+            'average_accuracy': 0,
+            'total_study_time_minutes': 0,
+            'last_studied': None
+        }
+        for pod_id in pod_ids
+    }
+    if not pod_ids:
+        return pod_stats
     
-    # Get recent sessions (last 30 days)
+    # Recent sessions (last 30 days)
     thirty_days_ago = datetime.now() - timedelta(days=30)
-    
-    sessions = session.query(StudySession).filter(
-        StudySession.pod_id == pod_id,
+    recent_sessions = and_(
+        StudySession.user_id == user_id,
+        StudySession.pod_id.in_(pod_ids),
         StudySession.started_at >= thirty_days_ago
-    ).all()
+    )
     
-    total_sessions = len(sessions)
-    total_cards_studied = sum(s.cards_studied for s in sessions)
+    # Accuracy by session mode: full-spaced sessions count their own cards_correct,
+    # simple-spaced sessions count the response quality of their reviews
+    full_spaced = and_(StudySession.mode == 'full-spaced', StudySession.cards_studied > 0)
+    accuracy = {pod_id: [0, 0] for pod_id in pod_ids}  # [studied, correct]
     
-    # Get total study time
-    completed_sessions = [s for s in sessions if s.ended_at]
-    total_minutes = sum(s.duration_minutes or 0 for s in completed_sessions)
-
-    # Calculate cards due for this pod
-    cards_due = calculate_pod_cards_due(session, pod_id)
+    session_rows = (await session.execute(
+        select(
+            StudySession.pod_id,
+            func.count(StudySession.id),
+            func.coalesce(func.sum(StudySession.cards_studied), 0),
+            func.coalesce(func.sum(StudySession.duration_minutes), 0),  # 0 for sessions still open
+            func.max(StudySession.started_at),
+            func.coalesce(func.sum(case((full_spaced, StudySession.cards_studied), else_=0)), 0),
+            func.coalesce(func.sum(case((full_spaced, func.coalesce(StudySession.cards_correct, 0)), else_=0)), 0)
+        )
+        .filter(recent_sessions)
+        .group_by(StudySession.pod_id)
+    )).all()
+    for pod_id, sessions, cards_studied, minutes, last_studied, full_studied, full_correct in session_rows:
+        pod_stats[pod_id].update({
+            'total_sessions': sessions,
+            'total_cards_studied': cards_studied,
+            'total_study_time_minutes': minutes,
+            'last_studied': last_studied.isoformat() if last_studied else None
+        })
+        accuracy[pod_id][0] += full_studied
+        accuracy[pod_id][1] += full_correct
     
-    # Calculate retention based on mode
-    retention_rate = calculate_pod_retention(session, pod_id, sessions)
+    review_rows = (await session.execute(
+        select(
+            StudySession.pod_id,
+            func.count(CardReview.id),
+            func.sum(case((CardReview.response_quality >= 3, 1), else_=0))
+        )
+        .join(CardReview, CardReview.session_id == StudySession.id)
+        .filter(
+            recent_sessions,
+            StudySession.mode == 'simple-spaced',
+            CardReview.response_quality.isnot(None)
+        )
+        .group_by(StudySession.pod_id)
+    )).all()
+    for pod_id, reviews, remembered in review_rows:
+        accuracy[pod_id][0] += reviews
+        accuracy[pod_id][1] += remembered
     
-    return {
-        'total_sessions': total_sessions,
-        'cards_due': cards_due,
-        'total_cards_studied': total_cards_studied,
-        'average_accuracy': retention_rate,
-        'total_study_time_minutes': total_minutes,
-        'last_studied': sessions[0].started_at.isoformat() if sessions else None
-    }
-
-def calculate_pod_retention(db_session, pod_id, sessions=None):
-    """
-    Calculate retention rate for a pod based on session mode.
-    For full-spaced: use session.cards_correct
-    For simple-spaced: use CardReview.response_quality
-    """
-    try:
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        
-        # Get sessions if not provided
-        if sessions is None:
-            sessions = db_session.query(StudySession).filter(
-                StudySession.pod_id == pod_id,
-                StudySession.started_at >= thirty_days_ago
-            ).all()
-        
-        if not sessions:
-            return 0
-        
-        # Separate sessions by mode
-        full_spaced_sessions = [s for s in sessions if s.mode == 'full-spaced']
-        simple_spaced_sessions = [s for s in sessions if s.mode == 'simple-spaced']
-        
-        total_studied = 0
-        total_correct = 0
-        
-        # Handle full-spaced sessions (use cards_correct from session)
-        for session in full_spaced_sessions:
-            if session.cards_studied and session.cards_studied > 0:
-                total_studied += session.cards_studied
-                total_correct += session.cards_correct or 0
-        
-        # Handle simple-spaced sessions (use CardReview data)
-        if simple_spaced_sessions:
-            # Get all session IDs
-            simple_session_ids = [s.id for s in simple_spaced_sessions]
-            
-            # Get reviews from these sessions
-            reviews = db_session.query(CardReview).filter(
-                and_(
-                    CardReview.session_id.in_(simple_session_ids),
-                    CardReview.response_quality.isnot(None)
-                )
-            ).all()
-            
-            if reviews:
-                total_studied += len(reviews)
-                total_correct += sum(1 for r in reviews if r.response_quality >= 3)
-        
-        return round((total_correct / total_studied) * 100, 1) if total_studied > 0 else 0
-        
-    except Exception as e:
-        print(f"Error calculating pod retention: {e}")
-        import traceback
-        traceback.print_exc()
-        return 0
+    for pod_id, (studied, correct) in accuracy.items():
+        pod_stats[pod_id]['average_accuracy'] = round((correct / studied) * 100, 1) if studied > 0 else 0
+    
+    # Active cards of each pod: due when the user never reviewed them or they are scheduled today or earlier (local)
+    tomorrow_start = tz_config.day_start_utc(1)
+    due_rows = (await session.execute(
+        select(
+            PodDeck.pod_id,
+            func.count(Card.id),
+            func.count(CardState.card_id),
+            func.sum(case((CardState.next_review_date < tomorrow_start, 1), else_=0))
+        )
+        .join(Card, Card.deck_id == PodDeck.deck_id)
+        .outerjoin(CardState, and_(CardState.card_id == Card.id, CardState.user_id == user_id))
+        .filter(PodDeck.pod_id.in_(pod_ids), Card.is_active == True)
+        .group_by(PodDeck.pod_id)
+    )).all()
+    for pod_id, total_cards, reviewed, due_reviewed in due_rows:
+        pod_stats[pod_id]['cards_due'] = (due_reviewed or 0) + (total_cards - reviewed)
+    
+    return pod_stats
 
 @pods_bp.route("/<pod_id:int>/decks", methods=["POST"])
 @require_auth 
 async def add_deck_to_pod(request, pod_id):
     """Add a deck to a pod"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         deck_id = data.get("deck_id")
-        display_order = data.get("display_order", 0)
+        display_order = data.get("display_order")
         
         if not deck_id:
             return json({"error": "Missing required field: deck_id"}, status=400)
         
         # Verify pod exists
-        pod = session.query(Pod).filter_by(id=pod_id).first()
+        pod = await session.scalar(select(Pod).filter_by(id=pod_id))
         if not pod:
             return json({"error": "Pod not found"}, status=404)
         
         # Verify deck exists
-        deck = session.query(Deck).filter_by(id=deck_id).first()
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id))
         if not deck:
             return json({"error": "Deck not found"}, status=404)
         
         # Check if deck already in pod
-        existing = session.query(PodDeck).filter_by(pod_id=pod_id, deck_id=deck_id).first()
+        existing = await session.scalar(select(PodDeck).filter_by(pod_id=pod_id, deck_id=deck_id))
         if existing:
             return json({"error": "Deck already in pod"}, status=409)
         
+        # If no display_order provided, append the deck after the last one
+        if display_order is None:
+            display_order = await pod_deck_order(pod_id).next_key(session)
+        
         # Add deck to pod
         pod_deck = PodDeck(
             pod_id=pod_id,
@@ -233,13 +255,9 @@ async def add_deck_to_pod(request, pod_id):
             display_order=display_order
         )
         
+        # The pod's counts are kept by the counter triggers
         session.add(pod_deck)
-        
-        # Update pod counts
-        pod.deck_count += 1
-        pod.total_card_count += deck.card_count
-        
-        session.commit()
+        await session.commit()
         
         return json({
             "message": "Deck added to pod successfully",
@@ -247,58 +265,44 @@ async def add_deck_to_pod(request, pod_id):
         }, status=201)
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @pods_bp.route("/<pod_id:int>/decks/<deck_id:int>", methods=["DELETE"])
 @require_auth 
 async def remove_deck_from_pod(request, pod_id, deck_id):
     """Remove a deck from a pod"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         # Find the pod-deck relationship
-        pod_deck = session.query(PodDeck).filter_by(pod_id=pod_id, deck_id=deck_id).first()
+        pod_deck = await session.scalar(select(PodDeck).filter_by(pod_id=pod_id, deck_id=deck_id))
         
         if not pod_deck:
             return json({"error": "Deck not found in pod"}, status=404)
         
-        # Get deck info for updating counts
-        deck = session.query(Deck).filter_by(id=deck_id).first()
-        pod = session.query(Pod).filter_by(id=pod_id).first()
-        
-        # Remove the relationship
-        session.delete(pod_deck)
-        
-        # Update pod counts
-        if pod and deck:
-            pod.deck_count = max(0, pod.deck_count - 1)
-            pod.total_card_count = max(0, pod.total_card_count - deck.card_count)
-        
-        session.commit()
+        # Remove the relationship (the counter triggers update the pod's counts)
+        await session.delete(pod_deck)
+        await session.commit()
         
         return json({
             "message": "Deck removed from pod successfully"
         })
     
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @pods_bp.route("/<pod_id:int>", methods=["PUT"])
 @require_auth 
 async def update_pod(request, pod_id):
     """Update a pod"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         
-        pod = session.query(Pod).filter_by(id=pod_id).first()
+        pod = await session.scalar(select(Pod).filter_by(id=pod_id))
         if not pod:
             return json({"error": "Pod not found"}, status=404)
         
@@ -312,7 +316,7 @@ async def update_pod(request, pod_id):
         if "study_settings" in data:
             pod.study_settings = data["study_settings"]
         
-        session.commit()
+        await session.commit()
         
         return json({
             "message": "Pod updated successfully",
@@ -320,105 +324,108 @@ async def update_pod(request, pod_id):
         })
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @pods_bp.route("/<pod_id:int>", methods=["DELETE"])
 @require_auth 
 async def delete_pod(request, pod_id):
     """Delete a pod"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
-        pod = session.query(Pod).filter_by(id=pod_id).first()
+        pod = await session.scalar(select(Pod).filter_by(id=pod_id))
         
         if not pod:
             return json({"error": "Pod not found"}, status=404)
         
         pod_name = pod.name
-        session.delete(pod)
-        session.commit()
+        await session.delete(pod)
+        await session.commit()
         
         return json({
             "message": f"Pod '{pod_name}' deleted successfully"
         })
     
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @pods_bp.route("/<pod_id:int>/decks/reorder", methods=["PUT"])
 @require_auth 
 async def reorder_pod_decks(request, pod_id):
-    """Reorder decks within a pod"""
-    session = get_db_session()
+    """
+    Reorder decks within a pod, either with moves (each deck placed after another,
+    or first when after_id is null) or with explicit deck_orders.
+    A move writes one row unless the pod has to be respaced; all changed orders
+    are written with one executemany UPDATE.
+    """
+    session = get_request_session(request)
     try:
         data = request.json
+        moves = data.get("moves", [])  # List of {deck_id: int, after_id: int | null}
         deck_orders = data.get("deck_orders", [])  # List of {deck_id: int, order: int}
         
-        if not deck_orders:
-            return json({"error": "Missing deck_orders"}, status=400)
+        if not (moves or deck_orders):
+            return json({"error": "Missing moves or deck_orders"}, status=400)
+        if moves and deck_orders:
+            return json({"error": "Send either moves or deck_orders, not both"}, status=400)
         
         # Verify pod exists
-        pod = session.query(Pod).filter_by(id=pod_id).first()
+        pod = await session.scalar(select(Pod).filter_by(id=pod_id))
         if not pod:
             return json({"error": "Pod not found"}, status=404)
         
-        # Update display orders
-        for item in deck_orders:
-            deck_id = item.get("deck_id")
-            new_order = item.get("order")
-            
-            if deck_id is not None and new_order is not None:
-                pod_deck = session.query(PodDeck).filter_by(
-                    pod_id=pod_id, 
-                    deck_id=deck_id
-                ).first()
-                
-                if pod_deck:
-                    pod_deck.display_order = new_order
-        
-        session.commit()
+        deck_order = pod_deck_order(pod_id)
+        rebalanced = False
+        if moves:
+            try:
+                keys, rebalanced = await deck_order.plan(
+                    session, [(item.get("deck_id"), item.get("after_id")) for item in moves]
+                )
+            except KeyError as e:
+                return json({"error": f"Deck {e.args[0]} is not in this pod"}, status=400)
+        else:
+            current = dict(await deck_order.load(session))
+            keys = {
+                item.get("deck_id"): item.get("order")
+                for item in deck_orders
+                if item.get("deck_id") in current and item.get("order") is not None
+                and current[item.get("deck_id")] != item.get("order")
+            }
+        
+        updated = await deck_order.write(session, keys)
+        await session.commit()
+        invalidate_pod(pod_id)
         
         return json({
-            "message": "Deck order updated successfully"
+            "message": "Deck order updated successfully",
+            "updated": updated,
+            "rebalanced": rebalanced,
+            "display_orders": keys
         })
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @pods_bp.route("/<pod_id:int>/cards", methods=["GET"])
 @require_auth 
 async def get_pod_cards(request, pod_id):
     """Get all cards from all decks in a pod"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         user_id = request.ctx.user['id']
         
         # Verify pod exists and belongs to user
-        pod = session.query(Pod).filter_by(id=pod_id, user_id=user_id).first()
+        pod = await session.scalar(select(Pod).filter_by(id=pod_id, user_id=user_id))
         if not pod:
             return json({"error": "Pod not found"}, status=404)
         
         # Get all cards from all decks in this pod
-        cards = []
-        for pod_deck in pod.pod_decks:
-            from models.card import Card
-            deck_cards = session.query(Card).filter_by(deck_id=pod_deck.deck_id).all()
-            for card in deck_cards:
-                card_dict = card.to_dict()
-                card_dict['source_deck_id'] = pod_deck.deck_id
-                card_dict['source_deck_name'] = pod_deck.deck.name
-                cards.append(card_dict)
+        cards = await load_pod_cards(session, pod_id)
         
         return json({
             "pod": pod.to_dict(),
@@ -427,68 +434,43 @@ async def get_pod_cards(request, pod_id):
         
     except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
-def calculate_pod_cards_due(session, pod_id):
-    """Calculate how many cards are due for review in a pod"""    
-    try:
-        
-        # Get all cards from all decks in this pod
-        pod_cards = session.query(Card).join(
-            PodDeck, Card.deck_id == PodDeck.deck_id
-        ).filter(
-            PodDeck.pod_id == pod_id,
-            Card.is_active == True
-        ).all()
-        
-        if not pod_cards:
-            return 0
-        
-        card_ids = [card.id for card in pod_cards]
-        now = tz_config.now()  # Use timezone config's now() method
-        
-        # Get latest review for each card
-        latest_reviews_subquery = session.query(
-            CardReview.card_id,
-            func.max(CardReview.reviewed_at).label('latest_reviewed_at')
-        ).filter(
-            CardReview.card_id.in_(card_ids)
-        ).group_by(CardReview.card_id).subquery()
-        
-        latest_reviews = session.query(CardReview).join(
-            latest_reviews_subquery,
-            and_(
-                CardReview.card_id == latest_reviews_subquery.c.card_id,
-                CardReview.reviewed_at == latest_reviews_subquery.c.latest_reviewed_at
-            )
-        ).all()
-        
-        # Count cards due for review
-        reviewed_card_ids = set()
-        cards_due_now = 0
-        
-        for review in latest_reviews:
-            reviewed_card_ids.add(review.card_id)
-            if review.next_review_date:
-                review_date = review.next_review_date
-                if review_date.tzinfo is None:
-                    review_date = review_date.replace(tzinfo=timezone.utc)
-                
-                # Convert to local timezone for date comparison (same as decks.py)
-                local_review_date = tz_config.utc_to_local(review_date)
-                
-                # Card is due if next review date is today or before
-                if local_review_date.date() <= now.date():
-                    cards_due_now += 1
-        
-        # Cards never reviewed are also due now
-        never_reviewed_count = len(card_ids) - len(reviewed_card_ids)
-        cards_due_now += never_reviewed_count
-        
-        return cards_due_now
-        
-    except Exception as e:
-        print(f"Error calculating pod cards due: {e}")
-        return 0
\ No newline at end of file
+# Card columns in Card.to_dict() order, plus the source deck's name
+POD_CARD_COLUMNS = (
+    Card.id, Card.deck_id, Card.front_content, Card.back_content, Card.front_type, Card.back_type,
+    Card.difficulty, Card.display_order, Card.tags, Card.is_active, Card.created_at, Card.updated_at,
+    Deck.name.label('source_deck_name')
+)
+
+def pod_cards_select(pod_id, *columns):
+    """Select columns for the active cards of a pod in study order (pod deck order, then card order)"""
+    return (
+        select(*columns)
+        .join(PodDeck, PodDeck.deck_id == Card.deck_id)
+        .filter(PodDeck.pod_id == pod_id, Card.is_active == True)
+        .order_by(PodDeck.display_order, PodDeck.id, Card.display_order, Card.created_at, Card.id)
+    )
+
+def pod_card_dict(row):
+    """Format a POD_CARD_COLUMNS row like Card.to_dict() plus source_deck_id and source_deck_name"""
+    card_dict = dict(row)
+    card_dict['created_at'] = row['created_at'].isoformat() if row['created_at'] else None
+    card_dict['updated_at'] = row['updated_at'].isoformat() if row['updated_at'] else None
+    card_dict['source_deck_id'] = row['deck_id']
+    card_dict['source_deck_name'] = card_dict.pop('source_deck_name')
+    return card_dict
+
+async def load_pod_cards(session, pod_id):
+    """
+    Load the active cards of every deck in a pod with one joined query, ordered by
+    the pod's deck order and then each deck's card order.
+    """
+    rows = (await session.execute(
+        pod_cards_select(pod_id, *POD_CARD_COLUMNS).join(Deck, Deck.id == Card.deck_id)
+    )).mappings().all()
+    return [pod_card_dict(row) for row in rows]
+
+async def load_pod_card_ids(session, pod_id):
+    """Load the ids of a pod's active cards in the same order as load_pod_cards"""
+    return list((await session.scalars(pod_cards_select(pod_id, Card.id))).all())
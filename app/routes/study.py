@@ -1,40 +1,164 @@
 # app/routes/study.py
 from sanic import Blueprint
 from sanic.response import json
-from models.database import get_db_session
+from sqlalchemy import and_, case, func, select
+from models.database import get_request_session
 from models.deck import Deck
 from models.card import Card
 from models.study_session import StudySession
 from models.card_review import CardReview
+from models.card_state import CardState
+from models.pod import Pod
+from models.pod_deck import PodDeck
 from middleware.auth import require_auth
+from utils.progress_buffer import progress_buffer
+from utils.session_cache import session_cache, session_response
+from routes.pods import load_pod_cards, load_pod_card_ids, pod_card_dict, POD_CARD_COLUMNS
 from datetime import datetime, timezone
 from config.timezone import tz_config
+import random
+import secrets
 
 study_bp = Blueprint("study", url_prefix="/api/study")
 
+# Windowed card delivery: ?window=N on the session endpoints, ?limit=N on /session/<id>/cards
+MAX_CARD_WINDOW = 500
+DEFAULT_CARD_PAGE = 50
+
+
+def parse_card_limit(value, name, default=None):
+    """Parse a window/limit query argument, capped at MAX_CARD_WINDOW; raises ValueError on bad input"""
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if value < 1:
+        raise ValueError(f"{name} must be positive")
+    return min(value, MAX_CARD_WINDOW)
+
+
+def ordered_session_cards(card_ids, shuffle):
+    """Study order for a new windowed session, shuffled with a fresh seed if requested"""
+    if not shuffle:
+        return {"card_order": card_ids, "shuffle_seed": None}
+    seed = secrets.randbelow(2 ** 31)
+    card_order = list(card_ids)
+    random.Random(seed).shuffle(card_order)
+    return {"card_order": card_order, "shuffle_seed": seed}
+
+
+async def load_deck_card_ids(session, deck_id):
+    """Load the ids of a deck's active cards in display order"""
+    return list((await session.scalars(
+        select(Card.id).filter_by(deck_id=deck_id, is_active=True)
+        .order_by(Card.display_order, Card.created_at, Card.id)
+    )).all())
+
+
+async def load_cards_by_id(session, card_ids, source_deck=False):
+    """Load active cards by id in the given order; source_deck adds the deck id/name like pod sessions"""
+    if not card_ids:
+        return []
+    
+    if source_deck:
+        rows = (await session.execute(
+            select(*POD_CARD_COLUMNS).join(Deck, Deck.id == Card.deck_id)
+            .filter(Card.id.in_(card_ids), Card.is_active == True)
+        )).mappings().all()
+        cards_by_id = {row['id']: pod_card_dict(row) for row in rows}
+    else:
+        cards = (await session.scalars(
+            select(Card).filter(Card.id.in_(card_ids), Card.is_active == True)
+        )).all()
+        cards_by_id = {card.id: card.to_dict() for card in cards}
+    
+    # Cards deleted since the session started are skipped
+    return [cards_by_id[card_id] for card_id in card_ids if card_id in cards_by_id]
+
+
+async def card_window(session, study_session, start, limit):
+    """Cards of a windowed session from position start, with the cursor for the next window"""
+    card_ids = study_session.card_order or []
+    start = min(start, len(card_ids))
+    window_ids = card_ids[start:start + limit]
+    has_more = start + limit < len(card_ids)
+    return {
+        "cards": await load_cards_by_id(session, window_ids, source_deck=study_session.pod_id is not None),
+        "has_more": has_more,
+        "next_after": window_ids[-1] if has_more else None
+    }
+
+
+async def windowed_session_payload(session, study_session, window):
+    """Session response fields for windowed delivery: full card order plus the window at the saved position"""
+    card_ids = study_session.card_order or []
+    current_index = min(study_session.current_index or 0, len(card_ids))
+    return {
+        "card_ids": card_ids,
+        "shuffle_seed": study_session.shuffle_seed,
+        "total_cards": len(card_ids),
+        "current_index": current_index,
+        "window": window,
+        **await card_window(session, study_session, current_index, window)
+    }
+
+
+async def serialized_deck_cards(session, deck_id):
+    """A deck's active cards for a full session, serialized for the session cache"""
+    versions = session_cache.versions([('deck', deck_id)])
+    cards = (await session.scalars(select(Card).filter_by(
+        deck_id=deck_id, 
+        is_active=True
+    ).order_by(Card.created_at))).all()
+    return session_cache.serialize(versions, [card.to_dict() for card in cards])
+
+
+async def serialized_pod_cards(session, pod_id):
+    """A pod's active cards for a full session, serialized for the session cache"""
+    # The pod's version is taken first so a deck added meanwhile still invalidates the entry
+    versions = session_cache.versions([('pod', pod_id)])
+    deck_ids = (await session.scalars(select(PodDeck.deck_id).filter_by(pod_id=pod_id))).all()
+    versions += session_cache.versions([('deck', deck_id) for deck_id in deck_ids])
+    return session_cache.serialize(versions, await load_pod_cards(session, pod_id))
+
+
 @study_bp.route("/deck/<deck_id:int>/session", methods=["GET", "POST"])
 @require_auth
 async def get_or_create_study_session(request, deck_id):
     """Get existing study session or create a new one for a deck"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         user_id = request.ctx.user['id']
         
+        # Optional windowed delivery: card order plus the first `window` cards
+        try:
+            window = parse_card_limit(request.args.get('window'), 'window')
+        except ValueError as e:
+            return json({"error": str(e)}, status=400)
+        shuffle = request.args.get('shuffle', 'false').lower() == 'true'
+        
         # Verify deck exists and user has access
-        deck = session.query(Deck).filter_by(id=deck_id).first()
+        deck = await session.scalar(select(Deck).filter_by(id=deck_id))
         if not deck:
             return json({"error": "Deck not found"}, status=404)
         
         # Check for existing active session
-        existing_session = session.query(StudySession).filter_by(
+        existing_session = await session.scalar(select(StudySession).filter_by(
             user_id=user_id,
             deck_id=deck_id,
             ended_at=None  # Session is still active
-        ).order_by(StudySession.started_at.desc()).first()
+        ).order_by(StudySession.started_at.desc()).limit(1))
         
         if existing_session:
             print(f"Found existing active session {existing_session.id} for deck {deck_id}")
             
+            # Resume from the latest progress, including updates still buffered
+            if progress_buffer.has_pending(existing_session.id):
+                await progress_buffer.flush([existing_session.id])
+                await session.refresh(existing_session)
+            
             if existing_session.paused_at:
                 try:
                     now_local = tz_config.now()
@@ -47,43 +171,72 @@ async def get_or_create_study_session(request, deck_id):
                     existing_session.total_paused_minutes = (existing_session.total_paused_minutes or 0) + round(paused_duration)
                     existing_session.paused_at = None
                     
-                    session.commit()
+                    await session.commit()
                     print(f"Resumed session after {round(paused_duration)} minutes of pause")
                 except Exception as resume_error:
                     print(f"Error updating pause state: {resume_error}")
-                    session.rollback()
-                
-            # Get all active cards in the deck
-            cards = session.query(Card).filter_by(
-                deck_id=deck_id, 
-                is_active=True
-            ).order_by(Card.created_at).all()
-            
-            if not cards:
-                return json({"error": "No cards found in this deck"}, status=404)
+                    await session.rollback()
             
-            # Prepare cards data
-            cards_data = [card.to_dict() for card in cards]
+            if window:
+                # Sessions started without a window get their order fixed on first windowed resume
+                if existing_session.card_order is None:
+                    existing_session.card_order = await load_deck_card_ids(session, deck_id)
+                    await session.commit()
+                if not existing_session.card_order:
+                    return json({"error": "No cards found in this deck"}, status=404)
+                
+                return json({
+                    "session": existing_session.to_dict(),
+                    "deck": deck.to_dict(),
+                    **await windowed_session_payload(session, existing_session, window),
+                    "resumed": True
+                })
+                
+            # Cards are served from the session cache until the deck changes
+            cards = session_cache.get(existing_session.id)
+            if cards is None:
+                cards = await serialized_deck_cards(session, deck_id)
+                if not cards.count:
+                    return json({"error": "No cards found in this deck"}, status=404)
+                session_cache.put(existing_session.id, cards)
             
-            return json({
+            return session_response({
                 "session": existing_session.to_dict(),
                 "deck": deck.to_dict(),
-                "cards": cards_data,
-                "total_cards": len(cards_data),
+                "total_cards": cards.count,
                 "current_index": 0,
                 "resumed": True
-            })
+            }, cards)
         
         # No existing session found, create a new one
         print(f"Creating new session for deck {deck_id}")
         
+        if window:
+            card_ids = await load_deck_card_ids(session, deck_id)
+            if not card_ids:
+                return json({"error": "No cards found in this deck"}, status=404)
+            
+            study_session = StudySession(
+                user_id=user_id,
+                deck_id=deck_id,
+                session_type='review',
+                current_index=0,
+                **ordered_session_cards(card_ids, shuffle)
+            )
+            session.add(study_session)
+            await session.commit()
+            
+            return json({
+                "session": study_session.to_dict(),
+                "deck": deck.to_dict(),
+                **await windowed_session_payload(session, study_session, window),
+                "resumed": False
+            })
+        
         # Get all active cards in the deck
-        cards = session.query(Card).filter_by(
-            deck_id=deck_id, 
-            is_active=True
-        ).order_by(Card.created_at).all()
+        cards = await serialized_deck_cards(session, deck_id)
         
-        if not cards:
+        if not cards.count:
             return json({"error": "No cards found in this deck"}, status=404)
         
         # Create a new study session
@@ -94,40 +247,58 @@ async def get_or_create_study_session(request, deck_id):
         )
         
         session.add(study_session)
-        session.commit()
+        await session.commit()
         
-        # Prepare cards data
-        cards_data = [card.to_dict() for card in cards]
+        # Cached up front so the first resume is already a hit
+        session_cache.put(study_session.id, cards)
         
-        return json({
+        return session_response({
             "session": study_session.to_dict(),
             "deck": deck.to_dict(),
-            "cards": cards_data,
-            "total_cards": len(cards_data),
+            "total_cards": cards.count,
             "current_index": 0,
             "resumed": False
-        })
+        }, cards)
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @study_bp.route("/session/<session_id:int>/progress", methods=["POST"])
 @require_auth
 async def update_session_progress(request, session_id):
     """Update study session progress (for basic review mode)"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         cards_studied = data.get("cards_studied")
         cards_correct = data.get("cards_correct")  # Add this
         mode = data.get("mode") 
+        current_index = data.get("current_index")  # Resume position for windowed sessions
+        if current_index is not None and (not isinstance(current_index, int) or current_index < 0):
+            return json({"error": "current_index must be a non-negative integer"}, status=400)
+        
+        if progress_buffer.running:
+            # Coalesced in memory and written by the next flush
+            values = {
+                field: value for field, value in (
+                    ('cards_studied', cards_studied),
+                    ('cards_correct', cards_correct),
+                    ('mode', mode),
+                    ('current_index', current_index)
+                ) if value is not None
+            }
+            session_data = await progress_buffer.record(session, session_id, values)
+            if session_data is None:
+                return json({"error": "Study session not found"}, status=404)
+            return json({
+                "message": "Progress updated",
+                "session": session_data
+            })
         
         # Get the study session
-        study_session = session.query(StudySession).filter_by(id=session_id).first()
+        study_session = await session.scalar(select(StudySession).filter_by(id=session_id))
         if not study_session:
             return json({"error": "Study session not found"}, status=404)
         
@@ -138,9 +309,11 @@ async def update_session_progress(request, session_id):
             study_session.cards_correct = cards_correct
         if mode is not None:  # Add this block
             study_session.mode = mode
+        if current_index is not None:
+            study_session.current_index = current_index
+        
+        await session.commit()
         
-        session.commit()
-
         return json({
             "message": "Progress updated",
             "session": study_session.to_dict()
@@ -150,27 +323,30 @@ async def update_session_progress(request, session_id):
         print(f"❌ DEBUG: Error in update_session_progress: {e}")
         import traceback
         traceback.print_exc()
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @study_bp.route("/session/<session_id:int>/complete", methods=["POST"])
 @require_auth
 async def complete_study_session(request, session_id):
     """Complete a study session"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
+        # Buffered progress must be on disk before the session is closed
+        await progress_buffer.flush([session_id])
+        progress_buffer.forget(session_id)
+        
         # Get the study session
-        study_session = session.query(StudySession).filter_by(id=session_id).first()
+        study_session = await session.scalar(select(StudySession).filter_by(id=session_id))
         if not study_session:
             return json({"error": "Study session not found"}, status=404)
         
         # Mark session as completed
         study_session.ended_at = datetime.now(timezone.utc)
         
-        session.commit()
+        await session.commit()
+        session_cache.invalidate(session_id)
         
         return json({
             "message": "Study session completed",
@@ -178,21 +354,19 @@ async def complete_study_session(request, session_id):
         })
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @study_bp.route("/card/<card_id:int>", methods=["PUT"])
 @require_auth
 async def update_card_during_study(request, card_id):
     """Update a card during study session"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         data = request.json
         
-        card = session.query(Card).filter_by(id=card_id).first()
+        card = await session.scalar(select(Card).filter_by(id=card_id))
         if not card:
             return json({"error": "Card not found"}, status=404)
         
@@ -204,7 +378,7 @@ async def update_card_during_study(request, card_id):
         if "tags" in data:
             card.tags = data["tags"]
         
-        session.commit()
+        await session.commit()
         
         return json({
             "message": "Card updated successfully",
@@ -212,38 +386,61 @@ async def update_card_during_study(request, card_id):
         })
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @study_bp.route("/pod/<pod_id:int>/session", methods=["GET", "POST"])
 @require_auth
 async def get_or_create_pod_study_session(request, pod_id):
     """Get existing study session or create a new one for a pod"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
         user_id = request.ctx.user['id']
         
-        # Import Pod model
-        from models.pod import Pod
+        # Optional windowed delivery: card order plus the first `window` cards
+        try:
+            window = parse_card_limit(request.args.get('window'), 'window')
+        except ValueError as e:
+            return json({"error": str(e)}, status=400)
+        shuffle = request.args.get('shuffle', 'false').lower() == 'true'
         
         # Verify pod exists and user has access
-        pod = session.query(Pod).filter_by(id=pod_id, user_id=user_id).first()
+        pod = await session.scalar(select(Pod).filter_by(id=pod_id, user_id=user_id))
         if not pod:
             return json({"error": "Pod not found"}, status=404)
         
         # Check for existing active session
-        existing_session = session.query(StudySession).filter_by(
+        existing_session = await session.scalar(select(StudySession).filter_by(
             user_id=user_id,
             pod_id=pod_id,
             ended_at=None  # Session is still active
-        ).order_by(StudySession.started_at.desc()).first()
+        ).order_by(StudySession.started_at.desc()).limit(1))
+        
+        if window:
+            # Windowed sessions only need the card order; resumed ones already have it
+            if existing_session and existing_session.card_order is not None:
+                card_ids = existing_session.card_order
+            else:
+                card_ids = await load_pod_card_ids(session, pod_id)
+            if not card_ids:
+                return json({"error": "No cards found in this pod"}, status=404)
+        else:
+            # Get all active cards from all decks in the pod, cached per session until the pod changes
+            cards = session_cache.get(existing_session.id) if existing_session else None
+            if cards is None:
+                cards = await serialized_pod_cards(session, pod_id)
+                if not cards.count:
+                    return json({"error": "No cards found in this pod"}, status=404)
         
         if existing_session:
             print(f"Found existing active session {existing_session.id} for pod {pod_id}")
             
+            # Resume from the latest progress, including updates still buffered
+            if progress_buffer.has_pending(existing_session.id):
+                await progress_buffer.flush([existing_session.id])
+                await session.refresh(existing_session)
+            
             # Handle paused session resumption
             if existing_session.paused_at:
                 try:
@@ -256,107 +453,240 @@ async def get_or_create_pod_study_session(request, pod_id):
                     paused_duration = (now_local - paused_at_local).total_seconds() / 60
                     existing_session.total_paused_minutes = (existing_session.total_paused_minutes or 0) + round(paused_duration)
                     existing_session.paused_at = None
-                    session.commit()  # Commit immediately after updating pause state
+                    await session.commit()  # Commit immediately after updating pause state
                     print(f"Resumed session after {round(paused_duration)} minutes of pause")
                 except Exception as resume_error:
                     print(f"Error updating pause state: {resume_error}")
-                    session.rollback()
+                    await session.rollback()
             
-            # Get all active cards from all decks in the pod
-            cards = []
-            for pod_deck in pod.pod_decks:
-                deck_cards = session.query(Card).filter_by(
-                    deck_id=pod_deck.deck_id, 
-                    is_active=True
-                ).order_by(Card.created_at).all()
+            if window:
+                # Sessions started without a window get their order fixed on first windowed resume
+                if existing_session.card_order is None:
+                    existing_session.card_order = card_ids
+                    await session.commit()
                 
-                # Add source deck information to each card
-                for card in deck_cards:
-                    card_dict = card.to_dict()
-                    card_dict['source_deck_id'] = pod_deck.deck_id
-                    card_dict['source_deck_name'] = pod_deck.deck.name
-                    cards.append(card_dict)
+                return json({
+                    "session": existing_session.to_dict(),
+                    "pod": pod.to_dict(),
+                    **await windowed_session_payload(session, existing_session, window),
+                    "resumed": True
+                })
             
-            if not cards:
-                return json({"error": "No cards found in this pod"}, status=404)
-            
-            return json({
+            session_cache.put(existing_session.id, cards)
+            return session_response({
                 "session": existing_session.to_dict(),
                 "pod": pod.to_dict(),
-                "cards": cards,
-                "total_cards": len(cards),
+                "total_cards": cards.count,
                 "current_index": 0,
                 "resumed": True  # Flag to indicate this is a resumed session
-            })
+            }, cards)
         
         # No existing session found, create a new one
         print(f"Creating new session for pod {pod_id}")
         
-        # Get all active cards from all decks in the pod
-        cards = []
-        for pod_deck in pod.pod_decks:
-            deck_cards = session.query(Card).filter_by(
-                deck_id=pod_deck.deck_id, 
-                is_active=True
-            ).order_by(Card.created_at).all()
-            
-            # Add source deck information to each card
-            for card in deck_cards:
-                card_dict = card.to_dict()
-                card_dict['source_deck_id'] = pod_deck.deck_id
-                card_dict['source_deck_name'] = pod_deck.deck.name
-                cards.append(card_dict)
-        
-        if not cards:
-            return json({"error": "No cards found in this pod"}, status=404)
-        
         # Create a new study session for the pod
         study_session = StudySession(
             user_id=user_id,
             pod_id=pod_id,
-            session_type='review'
+            session_type='review',
+            current_index=0,
+            **(ordered_session_cards(card_ids, shuffle) if window else {})
         )
         
         session.add(study_session)
-        session.commit()
+        await session.commit()
         
-        return json({
+        if window:
+            return json({
+                "session": study_session.to_dict(),
+                "pod": pod.to_dict(),
+                **await windowed_session_payload(session, study_session, window),
+                "resumed": False
+            })
+        
+        session_cache.put(study_session.id, cards)
+        return session_response({
             "session": study_session.to_dict(),
             "pod": pod.to_dict(),
-            "cards": cards,
-            "total_cards": len(cards),
+            "total_cards": cards.count,
             "current_index": 0,
             "resumed": False  # Flag to indicate this is a new session
-        })
+        }, cards)
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
 
 
 @study_bp.route("/session/<session_id:int>/pause", methods=["POST"])
 @require_auth
 async def pause_study_session(request, session_id):
     """Pause a study session"""
-    session = get_db_session()
+    session = get_request_session(request)
     try:
+        # Buffered progress must be on disk before the session is paused
+        await progress_buffer.flush([session_id])
+        progress_buffer.forget(session_id)
+        
         # Get the study session
-        study_session = session.query(StudySession).filter_by(id=session_id).first()
+        study_session = await session.scalar(select(StudySession).filter_by(id=session_id))
         if not study_session:
             return json({"error": "Study session not found"}, status=404)
         
+        # Optional resume position for windowed sessions
+        current_index = (request.json or {}).get("current_index") if request.body else None
+        if current_index is not None and (not isinstance(current_index, int) or current_index < 0):
+            return json({"error": "current_index must be a non-negative integer"}, status=400)
+        
         # Only pause if not already paused
         if not study_session.paused_at and not study_session.ended_at:
             study_session.paused_at = datetime.now(timezone.utc)
-            session.commit()
+            if current_index is not None:
+                study_session.current_index = current_index
+            await session.commit()
             print(f"Paused session {session_id}")
         
         return json({"message": "Session paused"})
         
     except Exception as e:
-        session.rollback()
+        await session.rollback()
+        return json({"error": str(e)}, status=500)
+
+@study_bp.route("/session/<session_id:int>/cards", methods=["GET"])
+@require_auth
+async def get_session_cards(request, session_id):
+    """Get the next window of cards of a windowed study session (?after=<card id>&limit=N)"""
+    session = get_request_session(request)
+    try:
+        user_id = request.ctx.user['id']
+        
+        try:
+            limit = parse_card_limit(request.args.get('limit'), 'limit', DEFAULT_CARD_PAGE)
+        except ValueError as e:
+            return json({"error": str(e)}, status=400)
+        
+        study_session = await session.scalar(select(StudySession).filter_by(id=session_id, user_id=user_id))
+        if not study_session:
+            return json({"error": "Study session not found"}, status=404)
+        if study_session.card_order is None:
+            return json({"error": "Study session was not started with a card window"}, status=400)
+        
+        # Cursor is the last card id the client already has; none starts from the beginning
+        start = 0
+        after = request.args.get('after')
+        if after is not None:
+            try:
+                start = study_session.card_order.index(int(after)) + 1
+            except ValueError:
+                return json({"error": "after must be a card id of this session"}, status=400)
+        
+        return json({
+            "session_id": study_session.id,
+            "total_cards": len(study_session.card_order),
+            **await card_window(session, study_session, start, limit)
+        })
+        
+    except Exception as e:
+        return json({"error": str(e)}, status=500)
+
+@study_bp.route("/due", methods=["GET"])
+@require_auth
+async def get_due_summary(request):
+    """Get due, overdue and new card counts for every deck and pod of the user"""
+    session = get_request_session(request)
+    try:
+        user_id = request.ctx.user['id']
+        
+        limit = request.args.get('limit')
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                return json({"error": "limit must be an integer"}, status=400)
+            if limit < 1:
+                return json({"error": "limit must be positive"}, status=400)
+        
+        # Due means scheduled on or before today in the configured timezone
+        today_start = tz_config.day_start_utc()
+        tomorrow_start = tz_config.day_start_utc(1)
+        
+        decks = (await session.execute(
+            select(Deck.id, Deck.name).filter_by(user_id=user_id).order_by(Deck.created_at.desc())
+        )).all()
+        pod_rows = (await session.execute(
+            select(Pod.id, Pod.name, PodDeck.deck_id)
+            .outerjoin(PodDeck, PodDeck.pod_id == Pod.id)
+            .filter(Pod.user_id == user_id)
+            .order_by(Pod.created_at.desc())
+        )).all()
+        
+        # One range scan over (user_id, next_review_date) for everything due
+        due_rows = (await session.execute(
+            select(
+                Card.deck_id,
+                func.count(),
+                func.sum(case((CardState.next_review_date < today_start, 1), else_=0))
+            )
+            .select_from(CardState)
+            .join(Card, Card.id == CardState.card_id)
+            .filter(
+                CardState.user_id == user_id,
+                CardState.next_review_date < tomorrow_start,
+                Card.is_active == True
+            )
+            .group_by(Card.deck_id)
+        )).all()
+        
+        # Active cards the user has never reviewed
+        new_rows = (await session.execute(
+            select(Card.deck_id, func.count())
+            .join(Deck, Deck.id == Card.deck_id)
+            .outerjoin(CardState, and_(CardState.card_id == Card.id, CardState.user_id == user_id))
+            .filter(Deck.user_id == user_id, Card.is_active == True, CardState.card_id.is_(None))
+            .group_by(Card.deck_id)
+        )).all()
+        
+        due_by_deck = {deck_id: (due, overdue) for deck_id, due, overdue in due_rows}
+        new_by_deck = dict(new_rows)
+        
+        def counts_for(deck_ids):
+            due = sum(due_by_deck.get(deck_id, (0, 0))[0] for deck_id in deck_ids)
+            overdue = sum(due_by_deck.get(deck_id, (0, 0))[1] for deck_id in deck_ids)
+            new = sum(new_by_deck.get(deck_id, 0) for deck_id in deck_ids)
+            return {"due": due, "overdue": overdue, "new": new}
+        
+        decks_data = [{"deck_id": deck_id, "name": name, **counts_for([deck_id])} for deck_id, name in decks]
+        
+        pods = {}
+        for pod_id, name, deck_id in pod_rows:
+            pod = pods.setdefault(pod_id, {"pod_id": pod_id, "name": name, "deck_ids": []})
+            if deck_id is not None:
+                pod["deck_ids"].append(deck_id)
+        pods_data = [{**pod, **counts_for(pod["deck_ids"])} for pod in pods.values()]
+        
+        result = {
+            "totals": counts_for([deck_id for deck_id, _ in decks]),
+            "decks": decks_data,
+            "pods": pods_data,
+            "as_of": tz_config.now().isoformat(),
+            "timezone": tz_config.tz_name
+        }
+        
+        if limit is not None:
+            # Most overdue first, the same order the SM-2 mode studies them in
+            result["due_card_ids"] = (await session.scalars(
+                select(CardState.card_id)
+                .join(Card, Card.id == CardState.card_id)
+                .filter(
+                    CardState.user_id == user_id,
+                    CardState.next_review_date < tomorrow_start,
+                    Card.is_active == True
+                )
+                .order_by(CardState.next_review_date, CardState.card_id)
+                .limit(limit)
+            )).all()
+        
+        return json(result)
+        
+    except Exception as e:
         return json({"error": str(e)}, status=500)
-    finally:
-        session.close()
\ No newline at end of file
@@ -0,0 +1,165 @@
+# app/utils/dashboard_cache.py
+"""
+Per-user cache of /api/dashboard/stats.
+
+Each user's stats are computed once and served from the cache while the user
+is clean, together with an ETag so unchanged polls can be answered with 304.
+A user is marked dirty (and their entry dropped) once a change that moves
+their stats commits through the ORM: a review insert, a session completion or
+a card deletion. Entries also expire at the end of the local day (retention
+covers the last 30 days) and after DASHBOARD_CACHE_TTL seconds, which covers
+other workers and changes made outside the ORM.
+
+Concurrent requests for the same user share one computation.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from collections import namedtuple
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from models.card import Card
+from models.card_review import CardReview
+from models.study_session import StudySession
+from config.timezone import tz_config
+from utils.cache import TTLCache
+
+# Computed stats with their ETag and the local date they were computed for
+DashboardStats = namedtuple('DashboardStats', ['data', 'etag', 'date'])
+
+
+def stats_etag(data):
+    """Strong ETag for a stats payload (same values, same tag)"""
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+class DashboardStatsCache:
+    def __init__(self, max_size, ttl):
+        self._entries = TTLCache(max_size, ttl)
+        self._generations = {}  # user_id -> times marked dirty, so in-flight results can tell they are stale
+        self._pending = {}  # user_id -> future of the computation in progress
+        self.coalesced = 0
+    
+    def mark_dirty(self, user_id):
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self._entries.invalidate(user_id)
+    
+    async def get(self, db_session, user_id, compute):
+        """Cached DashboardStats for a user, running compute(db_session, user_id) at most once at a time"""
+        today = tz_config.now().date()
+        entry = self._entries.get(user_id)
+        if entry is not None and entry.date == today:
+            return entry
+        
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                # Shielded so one disconnecting client cannot cancel the others' result
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The request computing it went away; compute it here instead
+                return await self.get(db_session, user_id, compute)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._pending[user_id] = future
+        generation = self._generations.get(user_id, 0)
+        try:
+            data = await compute(db_session, user_id)
+            entry = DashboardStats(data, stats_etag(data), today)
+            
+            # A change committed while computing leaves the user dirty
+            if self._generations.get(user_id, 0) == generation:
+                self._entries.set(user_id, entry)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved here, so it is not reported when nobody else was waiting
+            raise
+        finally:
+            del self._pending[user_id]
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def stats(self):
+        return {
+            **self._entries.stats(),
+            'computing': len(self._pending),
+            'coalesced': self.coalesced
+        }
+
+
+dashboard_cache = DashboardStatsCache(
+    max_size=int(os.getenv('DASHBOARD_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('DASHBOARD_CACHE_TTL', '900'))
+)
+
+
+def mark_dashboard_dirty(user_id):
+    """Mark a user's cached stats as stale (call after changing their data with Core statements)"""
+    dashboard_cache.mark_dirty(user_id)
+
+
+def _remember_dirty_user(target, user_id):
+    # Marked once the change is committed, so a concurrent request cannot re-cache the old stats
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('dirty_dashboard_user_ids', set()).add(user_id)
+    else:
+        mark_dashboard_dirty(user_id)
+
+
+@event.listens_for(CardReview, 'after_insert')
+@event.listens_for(CardReview, 'after_delete')
+def _remember_review_user(mapper, connection, target):
+    _remember_dirty_user(target, target.user_id)
+
+
+@event.listens_for(StudySession, 'after_update')
+@event.listens_for(StudySession, 'after_delete')
+def _remember_completed_session_user(mapper, connection, target):
+    if target.ended_at is not None or get_history(target, 'ended_at').deleted:
+        _remember_dirty_user(target, target.user_id)
+
+
+@event.listens_for(Card, 'after_update')
+def _remember_deleted_card(mapper, connection, target):
+    # Deleting (deactivating) or restoring a card changes the stats of everyone who reviewed it
+    if get_history(target, 'is_active').has_changes():
+        session = Session.object_session(target)
+        if session is not None:
+            session.info.setdefault('toggled_dashboard_card_ids', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _remember_deleted_card_reviewers(session, flush_context):
+    # One query per flush for all of its deleted or restored cards
+    card_ids = session.info.pop('toggled_dashboard_card_ids', None)
+    if card_ids:
+        dirty_user_ids = session.info.setdefault('dirty_dashboard_user_ids', set())
+        dirty_user_ids.update(session.connection().scalars(
+            select(CardReview.user_id).filter(CardReview.card_id.in_(card_ids)).distinct()
+        ))
+
+
+@event.listens_for(Session, 'after_commit')
+def _mark_committed_users_dirty(session):
+    for user_id in session.info.pop('dirty_dashboard_user_ids', ()):
+        mark_dashboard_dirty(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_rolled_back_users(session, previous_transaction):
+    session.info.pop('dirty_dashboard_user_ids', None)
+    session.info.pop('toggled_dashboard_card_ids', None)
@@ -0,0 +1,207 @@
+# app/utils/forecast.py
+"""
+Review workload forecast.
+
+Projects how many reviews will fall on each of the next FORECAST_MAX_DAYS local
+days. Every scheduled card starts at its current SM-2 state (card_state) and is
+stepped forward review by review, all cards at once, assuming each future review
+gets the expected rating: the user's average passing rating over the last 90
+days (Good when there is no history). Lapses are not modelled, so the forecast
+is a lower bound for users who fail many cards. Overdue cards count as due today.
+
+Uses NumPy when installed and the same math in plain Python otherwise.
+
+Forecasts are cached per user for the local day, and dropped as soon as a new
+review for the user commits through the ORM or FORECAST_CACHE_TTL runs out.
+"""
+
+import asyncio
+import os
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from models.card import Card
+from models.card_review import CardReview
+from models.card_state import CardState
+from models.user import User
+from config.timezone import tz_config
+from utils.cache import TTLCache
+from utils.scheduler import DEFAULT_PARAMS, MIN_EASE_FACTOR, PASSING_RATING, get_params, round_half_up
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency
+    np = None
+
+FORECAST_MAX_DAYS = 365
+DEFAULT_EXPECTED_RATING = 3  # Good
+
+forecast_cache = TTLCache(
+    max_size=int(os.getenv('FORECAST_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('FORECAST_CACHE_TTL', '3600'))
+)
+
+
+def ease_delta(rating):
+    """SM-2 ease change for one review with the given rating"""
+    return 0.1 - (5 - rating) * (0.08 + (5 - rating) * 0.02)
+
+
+def day_boundaries(days):
+    """Start of each local day from today, as day offsets from today's start (days + 1 values)"""
+    today_start = tz_config.day_start_utc()
+    return [
+        (tz_config.day_start_utc(offset) - today_start) / timedelta(days=1)
+        for offset in range(days + 1)
+    ]
+
+
+def _simulate_numpy(due, intervals, repetitions, eases, bounds, rating, params):
+    days = len(bounds) - 1
+    bounds = np.asarray(bounds)
+    counts = np.zeros(days, dtype=np.int64)
+    
+    due = np.maximum(np.asarray(due, dtype=np.float64), 0)
+    intervals = np.asarray(intervals, dtype=np.float64)
+    repetitions = np.asarray(repetitions, dtype=np.int64)
+    eases = np.asarray(eases, dtype=np.float64)
+    delta = ease_delta(rating)
+    
+    active = due < bounds[-1]
+    while active.any():
+        # Only cards still inside the horizon take part in the next round
+        due, intervals, repetitions, eases = due[active], intervals[active], repetitions[active], eases[active]
+        counts += np.bincount(np.searchsorted(bounds, due, side='right') - 1, minlength=days)[:days]
+        
+        scaled = np.floor(intervals * eases * params['interval_modifier'] + 0.5)
+        intervals = np.where(repetitions == 0, 1, np.where(repetitions == 1, 6, scaled))
+        intervals = np.clip(intervals, 1, params['max_interval'])
+        repetitions = repetitions + 1
+        eases = np.maximum(MIN_EASE_FACTOR, eases + delta)
+        
+        due = due + intervals
+        active = due < bounds[-1]
+    
+    return counts.tolist()
+
+
+def _simulate_python(due, intervals, repetitions, eases, bounds, rating, params):
+    days = len(bounds) - 1
+    counts = [0] * days
+    delta = ease_delta(rating)
+    
+    for t, interval, reps, ease in zip(due, intervals, repetitions, eases):
+        t = max(t, 0)
+        while t < bounds[-1]:
+            counts[bisect_right(bounds, t) - 1] += 1
+            if reps == 0:
+                interval = 1
+            elif reps == 1:
+                interval = 6
+            else:
+                interval = round_half_up(interval * ease * params['interval_modifier'])
+            interval = max(1, min(interval, params['max_interval']))
+            reps += 1
+            ease = max(MIN_EASE_FACTOR, ease + delta)
+            t += interval
+    
+    return counts
+
+
+def simulate(due, intervals, repetitions, eases, bounds, rating=4, params=None):
+    """
+    Count reviews per local day. due holds each card's next review as a day offset from
+    today's start; bounds comes from day_boundaries. Every review is assumed to pass
+    with the given rating.
+    """
+    if rating < PASSING_RATING:
+        raise ValueError("The forecast assumes passing ratings")
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    intervals = [interval or 1 for interval in intervals]
+    repetitions = [reps or 0 for reps in repetitions]
+    eases = [ease or params['starting_ease'] for ease in eases]
+    
+    if np is not None:
+        return _simulate_numpy(due, intervals, repetitions, eases, bounds, rating, params)
+    return _simulate_python(due, intervals, repetitions, eases, bounds, rating, params)
+
+
+async def get_expected_rating(db_session, user_id):
+    """Average passing rating of the user's reviews over the last 90 days, rounded"""
+    since = datetime.now(timezone.utc) - timedelta(days=90)
+    average = await db_session.scalar(
+        select(func.avg(CardReview.response_quality))
+        .filter(CardReview.user_id == user_id, CardReview.reviewed_at >= since,
+                CardReview.response_quality >= PASSING_RATING)
+    )
+    return round_half_up(average) if average else DEFAULT_EXPECTED_RATING
+
+
+async def get_review_forecast(db_session, user_id):
+    """
+    Reviews per local day for the next FORECAST_MAX_DAYS days, served from the cache
+    while the user has not reviewed anything new today.
+    """
+    today = tz_config.now().date()
+    cached = forecast_cache.get(user_id)
+    if cached is not None and cached['start_date'] == today.isoformat():
+        return cached
+    
+    today_start = tz_config.day_start_utc()
+    rows = (await db_session.execute(
+        select(CardState.next_review_date, CardState.interval_days, CardState.repetitions, CardState.ease_factor)
+        .join(Card, Card.id == CardState.card_id)
+        .filter(CardState.user_id == user_id, Card.is_active == True, CardState.next_review_date.isnot(None))
+    )).all()
+    rating = await get_expected_rating(db_session, user_id)
+    params = get_params(await db_session.scalar(select(User.preferences).filter_by(id=user_id)))
+    
+    day = timedelta(days=1)
+    due = [(row.next_review_date - today_start) / day for row in rows]
+    intervals = [row.interval_days for row in rows]
+    repetitions = [row.repetitions for row in rows]
+    eases = [row.ease_factor for row in rows]
+    bounds = day_boundaries(FORECAST_MAX_DAYS)
+    
+    # CPU-bound for large collections, so keep it off the event loop
+    daily = await asyncio.get_running_loop().run_in_executor(
+        None, simulate, due, intervals, repetitions, eases, bounds, rating, params
+    )
+    
+    forecast = {
+        'start_date': today.isoformat(),
+        'daily': daily,
+        'cards_scheduled': len(rows),
+        'overdue': sum(1 for offset in due if offset < 0),
+        'expected_rating': rating,
+        'vectorized': np is not None
+    }
+    forecast_cache.set(user_id, forecast)
+    return forecast
+
+
+def invalidate_forecast(user_id):
+    """Drop a user's cached forecast (call after changing card_state with Core statements)"""
+    forecast_cache.invalidate(user_id)
+
+
+@event.listens_for(CardReview, 'after_insert')
+def _remember_reviewed_user(mapper, connection, target):
+    # Invalidate once the review is committed, so a concurrent request cannot re-cache the old forecast
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('reviewed_user_ids', set()).add(target.user_id)
+    else:
+        invalidate_forecast(target.user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_forecasts(session):
+    for user_id in session.info.pop('reviewed_user_ids', ()):
+        invalidate_forecast(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_rolled_back_reviews(session, previous_transaction):
+    session.info.pop('reviewed_user_ids', None)
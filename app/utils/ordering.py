@@ -0,0 +1,209 @@
+# app/utils/ordering.py
+"""
+Sparse ordering keys for cards in a deck and decks in a pod (display_order).
+
+Keys are integers spaced ORDER_STEP apart, so moving an item gives it a key
+between its new neighbours and writes that one row (reading only the item and
+its neighbours from the index). When two neighbours have
+no room left between them (about log2(ORDER_STEP) moves into the same gap, or
+the dense keys of older rows), the whole list is respaced first; rebalancing
+happens inside the same reorder request, so callers never see it. A whole
+new order (a saved deck edit) keeps the keys of the longest run of items that
+stayed in order and places the rest, new items included, in the gaps.
+
+Cards sort by (display_order, created_at, id) and a pod's decks by
+(display_order, pod_decks.id), as their lists do. Changed keys are written
+with one executemany UPDATE.
+"""
+
+from bisect import bisect_left
+from sqlalchemy import bindparam, func, select, tuple_, update
+
+# Gap between consecutive keys after a rebalance, and after the last item when appending
+ORDER_STEP = 65536
+
+
+def key_between(before, after):
+    """An integer key strictly between two neighbours' keys (None for no neighbour), or None if there is no room"""
+    if before is None and after is None:
+        return ORDER_STEP
+    if before is None:
+        return after - ORDER_STEP
+    if after is None:
+        return before + ORDER_STEP
+    if after - before < 2:
+        return None
+    return before + (after - before) // 2
+
+
+def plan_moves(order, moves):
+    """
+    Apply moves to an ordered list of (item_id, key) in memory.
+    moves is a list of (item_id, after_id), after_id None meaning first; each move sees the ones before it.
+    Returns ({item_id: new key} for the items whose key changed, whether the list was rebalanced).
+    Raises KeyError for an item (or after_id) that is not in the list.
+    """
+    ids = [item_id for item_id, _ in order]
+    keys = dict(order)
+    original = dict(order)
+    rebalanced = False
+    if any(key is None for key in keys.values()):
+        # Rows without a key cannot be placed between: respace before moving
+        keys = {item_id: (index + 1) * ORDER_STEP for index, item_id in enumerate(ids)}
+        rebalanced = True
+    
+    for item_id, after_id in moves:
+        if item_id not in keys or (after_id is not None and after_id not in keys):
+            raise KeyError(item_id if item_id not in keys else after_id)
+        if item_id == after_id:
+            continue
+        ids.remove(item_id)
+        position = ids.index(after_id) + 1 if after_id is not None else 0
+        ids.insert(position, item_id)
+        
+        before = keys[ids[position - 1]] if position > 0 else None
+        after = keys[ids[position + 1]] if position + 1 < len(ids) else None
+        key = key_between(before, after)
+        if key is None:
+            # No room between the neighbours: respace the whole list (the moved item included)
+            keys = {respaced_id: (index + 1) * ORDER_STEP for index, respaced_id in enumerate(ids)}
+            rebalanced = True
+        else:
+            keys[item_id] = key
+    
+    return {item_id: key for item_id, key in keys.items() if original[item_id] != key}, rebalanced
+
+
+def plan_order(order, final_ids):
+    """
+    Keys that put an ordered list of (item_id, key) into the order of final_ids, which lists
+    every item once and may add new ones (ids not in the list). The longest run of items that
+    kept their relative order keeps its keys; the other items, new ones included, are spread
+    evenly between their kept neighbours, and the whole list is respaced when a gap is too small.
+    Returns ({item_id: key} for new items and items whose key changed, whether the list was rebalanced).
+    Raises KeyError for an item of the list that is missing from final_ids.
+    """
+    original = dict(order)
+    missing = original.keys() - set(final_ids)
+    if missing:
+        raise KeyError(min(missing))
+    respaced = {item_id: (index + 1) * ORDER_STEP for index, item_id in enumerate(final_ids)}
+    if any(key is None for key in original.values()):
+        return _changed_keys(original, respaced), True
+    
+    # Longest run of existing items with increasing keys (patience sorting), kept in place
+    kept_ids = [item_id for item_id in final_ids if item_id in original]
+    tails, tail_keys, previous = [], [], {}
+    for item_id in kept_ids:
+        position = bisect_left(tail_keys, original[item_id])
+        previous[item_id] = tails[position - 1] if position > 0 else None
+        tails[position:position + 1] = [item_id]
+        tail_keys[position:position + 1] = [original[item_id]]
+    stay = set()
+    item_id = tails[-1] if tails else None
+    while item_id is not None:
+        stay.add(item_id)
+        item_id = previous[item_id]
+    
+    keys = {}
+    run = []
+    before = None
+    for item_id in [*final_ids, None]:
+        if item_id is not None and item_id not in stay:
+            run.append(item_id)
+            continue
+        # A run of moved or new items between two kept ones (or an end of the list)
+        after = original[item_id] if item_id is not None else None
+        if run:
+            step = ORDER_STEP
+            if before is not None and after is not None:
+                step = (after - before) // (len(run) + 1)
+                if step < 1:
+                    return _changed_keys(original, respaced), True
+            if before is not None:
+                first = before + step
+            elif after is not None:
+                first = after - step * len(run)
+            else:
+                first = ORDER_STEP
+            keys.update((run_id, first + index * step) for index, run_id in enumerate(run))
+            run = []
+        before = after
+    return _changed_keys(original, keys), False
+
+
+def _changed_keys(original, keys):
+    return {item_id: key for item_id, key in keys.items() if original.get(item_id) != key}
+
+
+class OrderedList:
+    """
+    One ordered list: the rows of a table matching criteria (e.g. a deck's active cards),
+    sorted by key_column, then the tiebreak columns, then id_column (the id moves refer to).
+    """
+    
+    def __init__(self, table, id_column, key_column, *criteria, tiebreak=()):
+        self.table = table
+        self.id_column = id_column
+        self.key_column = key_column
+        self.criteria = criteria
+        self.sort_columns = (key_column, *tiebreak, id_column)
+    
+    async def load(self, db_session):
+        """Ordered [(item_id, key)] of the whole list"""
+        return (await db_session.execute(
+            select(self.id_column, self.key_column).filter(*self.criteria).order_by(*self.sort_columns)
+        )).all()
+    
+    async def next_key(self, db_session):
+        """Key that appends an item after the last one"""
+        last = await db_session.scalar(select(func.max(self.key_column)).filter(*self.criteria))
+        return key_between(last, None)
+    
+    async def plan(self, db_session, moves):
+        """
+        plan_moves() against the stored list. A single move reads only the moved item
+        and its new neighbours; several moves, or a move with no room left, load the list.
+        """
+        if len(moves) == 1:
+            keys = await self._plan_single_move(db_session, *moves[0])
+            if keys is not None:
+                return keys, False
+        return plan_moves(await self.load(db_session), moves)
+    
+    async def _plan_single_move(self, db_session, item_id, after_id):
+        """{item_id: new key} read from the index, or None when the list needs respacing"""
+        wanted = [item_id] if after_id is None else [item_id, after_id]
+        found = {
+            row[-1]: row for row in (await db_session.execute(
+                select(*self.sort_columns).filter(*self.criteria, self.id_column.in_(wanted))
+            )).all()
+        }
+        for wanted_id in wanted:
+            if wanted_id not in found:
+                raise KeyError(wanted_id)
+        if item_id == after_id:
+            return {}
+        
+        following = select(self.key_column).filter(*self.criteria, self.id_column != item_id)
+        before = None
+        if after_id is not None:
+            before = found[after_id][0]
+            following = following.filter(tuple_(*self.sort_columns) > tuple_(*found[after_id]))
+        after = (await db_session.execute(following.order_by(*self.sort_columns).limit(1))).first()
+        
+        if (after_id is not None and before is None) or (after is not None and after[0] is None):
+            return None  # Rows without a key
+        key = key_between(before, after[0] if after is not None else None)
+        if key is None:
+            return None
+        return {item_id: key} if key != found[item_id][0] else {}
+    
+    async def write(self, db_session, keys):
+        """Write {item_id: key} with one executemany UPDATE; returns the row count"""
+        if keys:
+            statement = update(self.table).where(
+                *self.criteria, self.id_column == bindparam('b_id')
+            ).values({self.key_column.key: bindparam('b_key')})
+            await db_session.execute(statement, [{'b_id': item_id, 'b_key': key} for item_id, key in keys.items()])
+        return len(keys)
@@ -0,0 +1,77 @@
+# app/utils/password_hasher.py
+"""
+Password hashing off the event loop.
+
+PBKDF2 is deliberately slow, so login and register hand it to a dedicated
+thread pool (hashlib releases the GIL while hashing) instead of freezing the
+worker. At most PASSWORD_HASH_QUEUE hashes may be running or waiting per
+worker; beyond that callers wait up to PASSWORD_HASH_TIMEOUT seconds and then
+get PasswordHasherBusy, which the routes report as 503.
+
+PASSWORD_HASH_WORKERS=0 hashes inline on the event loop (the old behaviour).
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from models.database import hash_password, verify_password
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue stays full for longer than the timeout"""
+
+
+class PasswordHasher:
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._slots = None
+    
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        return self._executor
+    
+    def _get_slots(self):
+        # Created lazily so the semaphore belongs to the worker's running loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+    
+    async def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        
+        slots = self._get_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise PasswordHasherBusy(f"Password hashing queue is full ({self.max_pending} pending)")
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            slots.release()
+    
+    async def hash(self, password):
+        """Hash a password with the configured work factor"""
+        return await self._run(hash_password, password)
+    
+    async def verify(self, password, hashed):
+        """Verify a password against a stored hash of any supported format"""
+        return await self._run(verify_password, password, hashed)
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._slots = None
+
+
+# Global password hasher instance
+password_hasher = PasswordHasher(
+    workers=int(os.getenv('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1)))),
+    max_pending=int(os.getenv('PASSWORD_HASH_QUEUE', '64')),
+    timeout=float(os.getenv('PASSWORD_HASH_TIMEOUT', '5'))
+)
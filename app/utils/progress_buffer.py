@@ -0,0 +1,158 @@
+# app/utils/progress_buffer.py
+"""
+Write-behind buffer for study session progress.
+
+The study UI posts its running totals (cards_studied, cards_correct, mode and
+the windowed current_index) after every card. Instead of a write transaction
+per card, updates are merged in memory per session and answered immediately;
+a background task writes every changed session with one bulk UPDATE each
+flush interval.
+
+Crash safety:
+- Updates carry absolute totals, not increments, so coalescing never loses a
+  count; the newest value per field wins and the next update heals any gap.
+- Pause and complete flush the session before changing it, so a paused or
+  completed session's totals are always on disk when those calls return.
+- Graceful shutdown (SIGINT/SIGTERM) flushes everything still pending.
+- A hard crash (SIGKILL, power loss) loses at most the last flush interval of
+  progress updates for sessions still in progress. Reviews and SM-2 state are
+  not buffered here and are never lost this way.
+- A failed flush keeps its updates pending (newer values win) and retries on
+  the next flush.
+
+Each worker process buffers its own sessions; the study UI sticks to one
+session at a time, so there is no cross-worker ordering to preserve.
+"""
+
+import asyncio
+from sqlalchemy import select, update
+from models.database import create_session
+from models.study_session import StudySession
+from config.database import db_config
+from utils.cache import TTLCache
+
+# Fields the progress endpoint may update
+PROGRESS_FIELDS = ('cards_studied', 'cards_correct', 'mode', 'current_index')
+
+
+class SessionProgressBuffer:
+    def __init__(self, flush_interval_ms, max_sessions=4096):
+        self.flush_interval = flush_interval_ms / 1000
+        self._pending = {}  # session_id -> {field: value} not yet written
+        self._sessions = TTLCache(max_size=max_sessions, ttl=3600)  # session_id -> detached StudySession
+        self._flush_lock = None
+        self._flusher = None
+        
+        # Counters reported by /api/debug/db
+        self.updates_buffered = 0
+        self.flushes = 0
+        self.sessions_written = 0
+    
+    @property
+    def running(self):
+        return self._flusher is not None
+    
+    async def start(self):
+        """Start the periodic flusher on the current event loop"""
+        if self.running:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._flusher = asyncio.create_task(self._run())
+        print(f"📝 Session progress write-behind enabled (flush every {int(self.flush_interval * 1000)}ms)")
+    
+    async def stop(self):
+        """Stop the flusher and write everything still pending"""
+        if not self.running:
+            return
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        self._flusher = None
+        await self.flush()
+        print(f"📝 Session progress flushed ({self.sessions_written} session writes in {self.flushes} flushes)")
+    
+    async def record(self, db_session, session_id, values):
+        """
+        Merge a progress update and return the session as it will be once flushed,
+        or None if the session does not exist. Only the first update of a session
+        reads the database.
+        """
+        study_session = self._sessions.get(session_id)
+        if study_session is None:
+            study_session = await db_session.scalar(select(StudySession).filter_by(id=session_id))
+            if study_session is None:
+                return None
+            db_session.expunge(study_session)
+            # Updates still pending from before the session was evicted are newer than the row
+            for field, value in self._pending.get(session_id, {}).items():
+                setattr(study_session, field, value)
+            self._sessions.set(session_id, study_session)
+        
+        for field, value in values.items():
+            setattr(study_session, field, value)
+        self._pending.setdefault(session_id, {}).update(values)
+        self.updates_buffered += 1
+        return study_session.to_dict()
+    
+    def has_pending(self, session_id):
+        return session_id in self._pending
+    
+    def forget(self, session_id):
+        """Drop the cached copy of a session (after it is completed or changed elsewhere)"""
+        self._sessions.invalidate(session_id)
+    
+    async def flush(self, session_ids=None):
+        """Write pending updates (all sessions, or only session_ids) in one transaction"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        
+        async with self._flush_lock:
+            ids = list(self._pending) if session_ids is None else [i for i in session_ids if i in self._pending]
+            if not ids:
+                return 0
+            batch = {session_id: self._pending.pop(session_id) for session_id in ids}
+            
+            db_session = create_session()
+            try:
+                # ORM bulk UPDATE by primary key (executemany)
+                await db_session.execute(update(StudySession), [
+                    {'id': session_id, **values} for session_id, values in batch.items()
+                ])
+                await db_session.commit()
+            except Exception as e:
+                await db_session.rollback()
+                # Keep the updates for the next flush; anything recorded meanwhile is newer
+                for session_id, values in batch.items():
+                    self._pending[session_id] = {**values, **self._pending.get(session_id, {})}
+                print(f"⚠️  Session progress flush of {len(batch)} session(s) failed, will retry: {e}")
+                raise
+            finally:
+                await db_session.close()
+            
+            self.flushes += 1
+            self.sessions_written += len(batch)
+            return len(batch)
+    
+    def stats(self):
+        return {
+            'running': self.running,
+            'pending_sessions': len(self._pending),
+            'cached_sessions': len(self._sessions),
+            'updates_buffered': self.updates_buffered,
+            'flushes': self.flushes,
+            'sessions_written': self.sessions_written
+        }
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                pass  # Logged by flush(); the updates stay pending
+
+
+# Global session progress buffer instance
+progress_buffer = SessionProgressBuffer(flush_interval_ms=db_config.progress_flush_interval_ms)
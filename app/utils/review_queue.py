@@ -0,0 +1,161 @@
+# app/utils/review_queue.py
+"""
+Write-behind queue for card review inserts.
+
+Reviews from every request are collected by one background task and committed
+together (group commit), so a burst of card flips costs one SQLite write
+transaction instead of one per flip. A batch is written when it reaches the
+size threshold or when the batch interval has passed since its first review.
+
+Acknowledgement is durable: submit() only returns once the review's batch has
+committed, so a 201 response still means the review is on disk. When the queue
+is full, submit() waits up to the enqueue timeout and then raises
+ReviewQueueFull, which the route reports as 503.
+"""
+
+import asyncio
+from models.database import create_session
+from models.card_review import CardReview
+from models.card_state import card_state_upsert
+from config.database import db_config
+
+
+class ReviewQueueFull(Exception):
+    """Raised when a review cannot be queued before the enqueue timeout"""
+
+
+# Queued in place of a review to tell the writer to finish
+_STOP = object()
+
+
+class ReviewWriteQueue:
+    def __init__(self, batch_size, batch_interval_ms, max_pending, enqueue_timeout):
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval_ms / 1000
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = None
+        self._writer = None
+        
+        # Counters reported by /api/debug/db
+        self.batches_written = 0
+        self.reviews_written = 0
+    
+    @property
+    def running(self):
+        return self._writer is not None
+    
+    async def start(self):
+        """Start the background writer on the current event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._writer = asyncio.create_task(self._run())
+        print(f"📝 Review write-behind enabled (batch {self.batch_size}, {int(self.batch_interval * 1000)}ms)")
+    
+    async def stop(self):
+        """Flush everything already queued, then stop the writer"""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._writer
+        self._writer = None
+        
+        # Reviews queued while the writer was finishing
+        leftovers = []
+        while not self._queue.empty():
+            leftovers.append(self._queue.get_nowait())
+        if leftovers:
+            await self._write_batch(leftovers)
+        print(f"📝 Review queue flushed ({self.reviews_written} reviews in {self.batches_written} batches)")
+    
+    async def submit(self, values):
+        """Queue a review (CardReview column values) and return its dict once committed"""
+        if not self.running:
+            # Not started (disabled, CLI, shutting down): write it on its own
+            future = asyncio.get_running_loop().create_future()
+            await self._write_batch([(values, future)])
+            return await future
+        
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put((values, future)), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            raise ReviewQueueFull(f"Review queue is full ({self.max_pending} pending)")
+        
+        # Shield the write so a disconnecting client cannot cancel someone else's batch
+        return await asyncio.shield(future)
+    
+    def stats(self):
+        return {
+            'running': self.running,
+            'pending': self._queue.qsize() if self._queue is not None else 0,
+            'batches_written': self.batches_written,
+            'reviews_written': self.reviews_written
+        }
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            
+            # Collect more reviews until the batch is full or its interval has passed
+            batch = [item]
+            deadline = loop.time() + self.batch_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            await self._write_batch(batch)
+    
+    async def _write_batch(self, batch):
+        """Insert a batch of reviews and their card_state updates in one transaction"""
+        session = create_session()
+        try:
+            reviews = [CardReview(**values) for values, _ in batch]
+            session.add_all(reviews)
+            await session.flush()
+            
+            for review in reviews:
+                await session.execute(card_state_upsert(review))
+            await session.commit()
+            
+            self.batches_written += 1
+            self.reviews_written += len(reviews)
+            for review, (_, future) in zip(reviews, batch):
+                if not future.done():
+                    future.set_result(review.to_dict())
+        except Exception as e:
+            await session.rollback()
+            if len(batch) > 1:
+                # Retry one by one so a single bad review only fails its own request
+                print(f"⚠️  Review batch of {len(batch)} failed, retrying individually: {e}")
+                for item in batch:
+                    await self._write_batch([item])
+            else:
+                _, future = batch[0]
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            await session.close()
+
+
+# Global review queue instance
+review_queue = ReviewWriteQueue(
+    batch_size=db_config.review_batch_size,
+    batch_interval_ms=db_config.review_batch_interval_ms,
+    max_pending=db_config.review_queue_size,
+    enqueue_timeout=db_config.review_enqueue_timeout
+)
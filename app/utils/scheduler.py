@@ -0,0 +1,110 @@
+# app/utils/scheduler.py
+"""
+SM-2 spaced repetition scheduler.
+
+Computes a card's next scheduling state from its previous state and a rating.
+Every review is scheduled here, with the user's parameters: the study screen
+posts only the rating and shows the state the server returns.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_EASE_FACTOR = 2.5
+MIN_EASE_FACTOR = 1.3
+MIN_RATING = 1
+MAX_RATING = 5  # The study UI rates 1-4 (again, hard, good, easy)
+PASSING_RATING = 3
+
+# State stored with reviews recorded outside SM-2 (simple spaced mode); statistics
+# tell SM-2 reviews apart by their ease factor or next review date
+UNSCHEDULED_STATE = {'ease_factor': DEFAULT_EASE_FACTOR, 'interval_days': 1, 'repetitions': 0, 'next_review_date': None}
+
+# Per-user scheduling parameters, stored in User.preferences['scheduling']
+DEFAULT_PARAMS = {
+    'starting_ease': DEFAULT_EASE_FACTOR,  # Ease factor of a card's first review
+    'interval_modifier': 1.0,  # Multiplies every interval after the first two
+    'max_interval': 36500  # Longest interval in days
+}
+
+# Accepted range of each parameter
+PARAM_LIMITS = {
+    'starting_ease': (MIN_EASE_FACTOR, 5.0),
+    'interval_modifier': (0.1, 5.0),
+    'max_interval': (1, 36500)
+}
+
+
+def is_valid_rating(rating):
+    return isinstance(rating, int) and not isinstance(rating, bool) and MIN_RATING <= rating <= MAX_RATING
+
+
+def get_params(preferences):
+    """Scheduling parameters from a user's preferences, with defaults for anything unset"""
+    return {**DEFAULT_PARAMS, **((preferences or {}).get('scheduling') or {})}
+
+
+def validate_params(params):
+    """Validate a (partial) parameter update; returns (params, error)"""
+    if not isinstance(params, dict):
+        return None, "scheduling must be an object"
+    
+    validated = {}
+    for name, value in params.items():
+        if name not in PARAM_LIMITS:
+            return None, f"Unknown scheduling parameter: {name}"
+        low, high = PARAM_LIMITS[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+            return None, f"{name} must be a number from {low} to {high}"
+        validated[name] = int(value) if name == 'max_interval' else float(value)
+    return validated, None
+
+
+def round_half_up(value):
+    """Round halves up (like JavaScript's Math.round), as schedules always have"""
+    return math.floor(value + 0.5)
+
+
+def next_state(rating, ease_factor=None, interval_days=None, repetitions=None, reviewed_at=None, params=None):
+    """
+    Apply one SM-2 review. Missing previous values mean a new card.
+    Returns a dict with ease_factor, interval_days, repetitions and next_review_date.
+    """
+    if not is_valid_rating(rating):
+        raise ValueError(f"rating must be an integer from {MIN_RATING} to {MAX_RATING}")
+    
+    params = params or DEFAULT_PARAMS
+    ease_factor = ease_factor or params['starting_ease']
+    interval_days = interval_days or 1
+    repetitions = repetitions or 0
+    reviewed_at = reviewed_at or datetime.now(timezone.utc)
+    
+    if rating < PASSING_RATING:
+        # Failed review - reset to learning
+        repetitions = 0
+        interval_days = 1
+    else:
+        if repetitions == 0:
+            interval_days = 1
+        elif repetitions == 1:
+            interval_days = 6
+        else:
+            interval_days = round_half_up(interval_days * ease_factor * params['interval_modifier'])
+        interval_days = max(1, min(interval_days, params['max_interval']))
+        repetitions += 1
+    
+    ease_factor = max(MIN_EASE_FACTOR, ease_factor + (0.1 - (5 - rating) * (0.08 + (5 - rating) * 0.02)))
+    
+    return {
+        'ease_factor': ease_factor,
+        'interval_days': interval_days,
+        'repetitions': repetitions,
+        'next_review_date': reviewed_at + timedelta(days=interval_days)
+    }
+
+
+def next_state_after(rating, state, reviewed_at=None, params=None):
+    """Apply one review on top of a CardState (or None for a card never reviewed)"""
+    if state is None:
+        return next_state(rating, reviewed_at=reviewed_at, params=params)
+    return next_state(rating, state.ease_factor, state.interval_days, state.repetitions, reviewed_at, params)
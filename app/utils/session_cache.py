@@ -0,0 +1,196 @@
+# app/utils/session_cache.py
+"""
+Cache of serialized study session cards for instant resume.
+
+Resuming a full (non-windowed) session re-sends every active card of the deck
+or pod. The cards are cached per study session as the JSON the response sends,
+together with the content versions of everything they were built from: the
+deck for deck sessions, the pod and each of its decks for pod sessions. A
+version is a per-worker counter that is bumped once a change to a card, deck,
+or pod membership commits through the ORM (including edits made during study
+with PUT /api/study/card/<id>), so an entry built before the change no longer
+matches and is dropped.
+
+The cache is bounded by the total size of the serialized cards
+(SESSION_CACHE_MAX_BYTES), evicting least-recently-used sessions first, and
+entries expire after SESSION_CACHE_TTL seconds to cover other workers and
+changes made outside the ORM.
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict, namedtuple
+from sanic.response import HTTPResponse
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models.card import Card
+from models.deck import Deck
+from models.pod import Pod
+from models.pod_deck import PodDeck
+
+# Serialized cards plus the content versions (((kind, id), version) pairs) they were built from
+CachedCards = namedtuple('CachedCards', ['versions', 'body', 'count'])
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+class SessionPayloadCache:
+    """Least-recently-used cache of CachedCards per study session, bounded by serialized size"""
+    
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # session_id -> (CachedCards, expires_at)
+        self._dependents = {}  # (kind, id) -> session ids whose entry depends on it
+        self._versions = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def versions(self, dependencies):
+        """Snapshot the current versions of (kind, id) dependencies; take it before reading the content"""
+        return tuple((dependency, self._versions.get(dependency, 0)) for dependency in dependencies)
+    
+    def serialize(self, versions, cards):
+        """Serialize card dicts for the response and for caching"""
+        return CachedCards(versions, _dumps(cards), len(cards))
+    
+    def get(self, session_id):
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        cards, expires_at = entry
+        if expires_at <= time.monotonic() or any(
+            self._versions.get(dependency, 0) != version for dependency, version in cards.versions
+        ):
+            self.invalidate(session_id)
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        return cards
+    
+    def put(self, session_id, cards):
+        if len(cards.body) > self.max_bytes:
+            return
+        self.invalidate(session_id)
+        self._entries[session_id] = (cards, time.monotonic() + self.ttl)
+        self.bytes += len(cards.body)
+        for dependency, _ in cards.versions:
+            self._dependents.setdefault(dependency, set()).add(session_id)
+        
+        while self.bytes > self.max_bytes:
+            self.invalidate(next(iter(self._entries)))
+            self.evictions += 1
+    
+    def invalidate(self, session_id):
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return
+        cards, _ = entry
+        self.bytes -= len(cards.body)
+        for dependency, _ in cards.versions:
+            dependents = self._dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(session_id)
+                if not dependents:
+                    del self._dependents[dependency]
+    
+    def bump(self, dependency):
+        """Mark a deck or pod as changed, dropping every entry built from it"""
+        self._versions[dependency] = self._versions.get(dependency, 0) + 1
+        for session_id in list(self._dependents.get(dependency, ())):
+            self.invalidate(session_id)
+    
+    def clear(self):
+        self._entries.clear()
+        self._dependents.clear()
+        self.bytes = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def stats(self):
+        return {
+            'size': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+session_cache = SessionPayloadCache(
+    max_bytes=int(os.getenv('SESSION_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+    ttl=float(os.getenv('SESSION_CACHE_TTL', '600'))
+)
+
+
+def session_response(payload, cards):
+    """JSON response for a session payload with the serialized cards added as "cards" """
+    body = _dumps(payload)[:-1] + ',"cards":' + cards.body + '}'
+    return HTTPResponse(body, content_type="application/json")
+
+
+def invalidate_deck(deck_id):
+    """Drop cached sessions built from a deck (call after changing cards with Core statements)"""
+    session_cache.bump(('deck', deck_id))
+
+
+def invalidate_pod(pod_id):
+    """Drop cached sessions of a pod (call after changing its decks with Core statements)"""
+    session_cache.bump(('pod', pod_id))
+
+
+def _remember_change(target, dependency):
+    # Bump once the change is committed, so a concurrent resume cannot re-cache the old content
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_session_content', set()).add(dependency)
+    else:
+        session_cache.bump(dependency)
+
+
+@event.listens_for(Card, 'after_insert')
+@event.listens_for(Card, 'after_update')
+@event.listens_for(Card, 'after_delete')
+def _remember_changed_card(mapper, connection, target):
+    _remember_change(target, ('deck', target.deck_id))
+
+
+@event.listens_for(Deck, 'after_update')
+@event.listens_for(Deck, 'after_delete')
+def _remember_changed_deck(mapper, connection, target):
+    _remember_change(target, ('deck', target.id))
+
+
+@event.listens_for(PodDeck, 'after_insert')
+@event.listens_for(PodDeck, 'after_update')
+@event.listens_for(PodDeck, 'after_delete')
+def _remember_changed_pod_deck(mapper, connection, target):
+    _remember_change(target, ('pod', target.pod_id))
+
+
+@event.listens_for(Pod, 'after_delete')
+def _remember_deleted_pod(mapper, connection, target):
+    _remember_change(target, ('pod', target.id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_content(session):
+    for dependency in session.info.pop('changed_session_content', ()):
+        session_cache.bump(dependency)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_rolled_back_content(session, previous_transaction):
+    session.info.pop('changed_session_content', None)
@@ -2,24 +2,26 @@
 """
 Statistics utility module for dashboard metrics and retention calculations.
 Centralizes all statistical calculations for better maintainability.
+Every metric is a single aggregate query; no ORM objects are loaded.
 """
 
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_, func, distinct
+from sqlalchemy import and_, case, or_, func, distinct, select
 from models.card_review import CardReview
 from models.card import Card
 from models.deck import Deck
 from models.study_session import StudySession
+from models.user_statistics import UserStatistics, RETENTION_POINTS
 from config.timezone import tz_config
 
 
-def get_cards_learned_count(db_session, user_id):
+async def get_cards_learned_count(db_session, user_id):
     """
     Get total number of unique cards learned through SM-2 spaced repetition.
     Only counts cards that have SM-2 data and successful reviews.
     """
     try:
-        learned_cards = db_session.query(distinct(CardReview.card_id)).join(
+        learned_cards = await db_session.scalar(select(func.count(distinct(CardReview.card_id))).join(
             Card, CardReview.card_id == Card.id
         ).filter(
             and_(
@@ -33,7 +35,7 @@ def get_cards_learned_count(db_session, user_id):
                     CardReview.next_review_date.isnot(None)
                 )
             )
-        ).count()
+        ))
         
         return learned_cards
         
@@ -42,24 +44,24 @@ def get_cards_learned_count(db_session, user_id):
         return 0
 
 
-def get_retention_rate(db_session, user_id):
+async def get_retention_rate(db_session, user_id, days_back=30):
     """
     Calculate retention rate based only on SM-2 spaced repetition reviews.
     """
-    return calculate_sm2_retention(db_session, user_id, deck_id=None)
+    return await calculate_sm2_retention(db_session, user_id, deck_id=None, days_back=days_back)
 
 
-def get_total_sessions_count(db_session, user_id):
+async def get_total_sessions_count(db_session, user_id):
     """
     Get total number of completed study sessions.
     """
     try:
-        total_sessions = db_session.query(StudySession).filter(
+        total_sessions = await db_session.scalar(select(func.count(StudySession.id)).filter(
             and_(
                 StudySession.user_id == user_id,
                 StudySession.ended_at.isnot(None)
             )
-        ).count()
+        ))
         
         return total_sessions
         
@@ -68,30 +70,24 @@ def get_total_sessions_count(db_session, user_id):
         return 0
 
 
-def get_total_study_time(db_session, user_id):
+async def get_total_study_time(db_session, user_id):
     """
     Get total study time in hours from completed study sessions.
-    Uses the session's duration_minutes property which excludes pause time.
+    Sums StudySession.duration_minutes in SQL, which excludes pause time.
     """
     try:
-        # Get all completed study sessions
-        completed_sessions = db_session.query(StudySession).filter(
+        total_minutes = await db_session.scalar(select(
+            func.coalesce(func.sum(StudySession.duration_minutes), 0)
+        ).filter(
             and_(
                 StudySession.user_id == user_id,
                 StudySession.ended_at.isnot(None),
                 StudySession.started_at.isnot(None)
             )
-        ).all()
-        
-        total_minutes = 0
-        for session in completed_sessions:
-            # Use the model's duration_minutes property which excludes pause time
-            total_minutes += session.duration_minutes or 0
+        ))
         
         # Convert to hours - DON'T round here, let format_study_time handle it
-        total_hours = total_minutes / 60
-        
-        return total_hours 
+        return total_minutes / 60
         
     except Exception as e:
         print(f"Error calculating total study time: {e}")
@@ -121,17 +117,29 @@ def format_study_time(hours):
         return f"{minutes}m"
 
 
-def get_dashboard_stats(db_session, user_id):
+async def get_dashboard_stats(db_session, user_id):
     """
     Get all dashboard statistics in a single function call.
-    Returns a dictionary with all four main metrics.
+    Returns a dictionary with all four main metrics, read from the daily user_statistics rollup.
+    Retention covers the last 30 local days.
     """
     try:
+        retention_start = tz_config.now().date() - timedelta(days=30)
+        recent = UserStatistics.date >= retention_start
+        totals = (await db_session.execute(select(
+            func.coalesce(func.sum(UserStatistics.cards_learned), 0),
+            func.coalesce(func.sum(UserStatistics.sessions_completed), 0),
+            func.coalesce(func.sum(UserStatistics.study_time_minutes), 0),
+            func.coalesce(func.sum(case((recent, UserStatistics.retention_points), else_=0)), 0),
+            func.coalesce(func.sum(case((recent, UserStatistics.cards_studied), else_=0)), 0)
+        ).filter(UserStatistics.user_id == user_id))).one()
+        cards_learned, total_sessions, study_minutes, retention_points, recent_reviews = totals
+        
         stats = {
-            'cards_learned': get_cards_learned_count(db_session, user_id),
-            'retention_rate': get_retention_rate(db_session, user_id),
-            'total_sessions': get_total_sessions_count(db_session, user_id),
-            'study_time_hours': get_total_study_time(db_session, user_id)
+            'cards_learned': cards_learned,
+            'retention_rate': round(retention_points / recent_reviews) if recent_reviews else 0,
+            'total_sessions': total_sessions,
+            'study_time_hours': study_minutes / 60
         }
         
         # Format for display
@@ -160,147 +168,96 @@ def get_dashboard_stats(db_session, user_id):
         }
 
 
-def calculate_deck_retention_rate(db_session, deck_id, user_id, days_back=30):
+async def calculate_deck_retention_rate(db_session, deck_id, user_id, days_back=30):
     """
     Calculate retention rate for a specific deck.
     Only counts cards that still exist and are active.
     """
     try:
         cutoff_date = tz_config.now() - timedelta(days=days_back)
-        
-        # Get unique cards reviewed in this deck that still exist
-        total_cards_reviewed = db_session.query(distinct(CardReview.card_id)).join(
-            Card, CardReview.card_id == Card.id
-        ).filter(
-            and_(
-                Card.deck_id == deck_id,
-                CardReview.user_id == user_id,
-                CardReview.reviewed_at >= cutoff_date,
-                CardReview.response_quality.isnot(None),
-                Card.is_active == True
-            )
-        ).count()
-        
-        if total_cards_reviewed == 0:
-            return 0
-        
-        # Get unique cards with good retention that still exist
-        well_remembered_cards = db_session.query(distinct(CardReview.card_id)).join(
-            Card, CardReview.card_id == Card.id
-        ).filter(
-            and_(
-                Card.deck_id == deck_id,
-                CardReview.user_id == user_id,
-                CardReview.reviewed_at >= cutoff_date,
-                CardReview.response_quality >= 3,
-                CardReview.response_quality.isnot(None),
-                Card.is_active == True
-            )
-        ).count()
-        
-        retention_rate = round((well_remembered_cards / total_cards_reviewed) * 100)
-        return retention_rate
+        return await _card_retention(db_session, deck_id, user_id, cutoff_date)
         
     except Exception as e:
         print(f"Error calculating deck retention rate: {e}")
         return 0
 
 
-def calculate_sm2_retention(db_session, user_id, deck_id=None):
+def _card_retention_query(deck_id, user_id, cutoff_date):
+    """Unique active cards of a deck reviewed since cutoff_date, and how many of them were rated 3 or better"""
+    return select(
+        func.count(distinct(CardReview.card_id)),
+        func.count(distinct(case((CardReview.response_quality >= 3, CardReview.card_id))))
+    ).join(
+        Card, CardReview.card_id == Card.id
+    ).filter(
+        and_(
+            Card.deck_id == deck_id,
+            CardReview.user_id == user_id,
+            CardReview.reviewed_at >= cutoff_date,
+            CardReview.response_quality.isnot(None),
+            Card.is_active == True
+        )
+    )
+
+
+async def _card_retention(db_session, deck_id, user_id, cutoff_date):
+    total_cards_reviewed, well_remembered_cards = (
+        await db_session.execute(_card_retention_query(deck_id, user_id, cutoff_date))
+    ).one()
+    if total_cards_reviewed == 0:
+        return 0
+    return round((well_remembered_cards / total_cards_reviewed) * 100)
+
+
+async def calculate_sm2_retention(db_session, user_id, deck_id=None, days_back=30):
     """
     Calculate retention rate for SM-2 mode.
     If deck_id is provided, calculates for that deck only.
     If deck_id is None, calculates across all user's decks.
     """
     try:
-        # Get cards based on whether deck_id is specified
+        cutoff_date = datetime.now() - timedelta(days=days_back)
+        
+        # For SM-2, retention = average response quality as percentage (see RETENTION_POINTS)
+        query = select(
+            func.avg(case(RETENTION_POINTS, value=CardReview.response_quality, else_=0))
+        ).join(
+            Card, CardReview.card_id == Card.id
+        ).filter(
+            and_(
+                CardReview.user_id == user_id,
+                CardReview.reviewed_at >= cutoff_date,
+                CardReview.response_quality.isnot(None)
+            )
+        )
         if deck_id is not None:
-            # Original logic for specific deck
-            deck_cards = db_session.query(Card).filter_by(deck_id=deck_id).all()
-            if not deck_cards:
-                return 0
-            card_ids = [card.id for card in deck_cards]
+            query = query.filter(Card.deck_id == deck_id)
         else:
-            # New logic for all user's cards
-            user_cards = db_session.query(Card).join(
-                Deck, Card.deck_id == Deck.id
-            ).filter(
+            # Active cards in any of the user's decks
+            query = query.join(Deck, Card.deck_id == Deck.id).filter(
                 and_(
                     Deck.user_id == user_id,
                     Card.is_active == True
                 )
-            ).all()
-            if not user_cards:
-                return 0
-            card_ids = [card.id for card in user_cards]
-        
-        # Rest of the logic stays the same
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        recent_reviews = db_session.query(CardReview).filter(
-            and_(
-                CardReview.card_id.in_(card_ids),
-                CardReview.user_id == user_id,
-                CardReview.reviewed_at >= thirty_days_ago,
-                CardReview.response_quality.isnot(None)
             )
-        ).all()
-        
-        if not recent_reviews:
-            return 0
-        
-        # For SM-2, retention = average response quality as percentage
-        # Quality 1=25%, 2=50%, 3=75%, 4=100%
-        quality_to_percent = {1: 25, 2: 50, 3: 75, 4: 100}
-        total_retention = sum(quality_to_percent.get(review.response_quality, 0) 
-                            for review in recent_reviews)
         
-        return round(total_retention / len(recent_reviews))
+        average = await db_session.scalar(query)
+        return round(average) if average is not None else 0
         
     except Exception as e:
         print(f"Error calculating SM-2 retention: {e}")
         return 0
 
 
-def calculate_simple_retention(db_session, deck_id, user_id):
+async def calculate_simple_retention(db_session, deck_id, user_id):
     """
     Calculate retention rate for simple-spaced mode.
     Only counts cards that still exist and are active.
     """
     try:
         thirty_days_ago = datetime.now() - timedelta(days=30)
-        
-        # Get unique cards reviewed that still exist
-        total_cards_reviewed = db_session.query(distinct(CardReview.card_id)).join(
-            Card, CardReview.card_id == Card.id
-        ).filter(
-            and_(
-                Card.deck_id == deck_id,
-                CardReview.user_id == user_id,
-                CardReview.reviewed_at >= thirty_days_ago,
-                CardReview.response_quality.isnot(None),
-                Card.is_active == True
-            )
-        ).count()
-        
-        if total_cards_reviewed == 0:
-            return 0
-        
-        # Get unique cards with good retention (quality >= 3) that still exist
-        well_remembered_cards = db_session.query(distinct(CardReview.card_id)).join(
-            Card, CardReview.card_id == Card.id
-        ).filter(
-            and_(
-                Card.deck_id == deck_id,
-                CardReview.user_id == user_id,
-                CardReview.reviewed_at >= thirty_days_ago,
-                CardReview.response_quality >= 3,
-                CardReview.response_quality.isnot(None),
-                Card.is_active == True
-            )
-        ).count()
-        
-        return round((well_remembered_cards / total_cards_reviewed) * 100)
+        return await _card_retention(db_session, deck_id, user_id, thirty_days_ago)
         
     except Exception as e:
         print(f"Error calculating simple retention: {e}")
-        return 0
\ No newline at end of file
+        return 0
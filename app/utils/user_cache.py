@@ -0,0 +1,47 @@
+# app/utils/user_cache.py
+"""
+Cache of active users for request authentication.
+
+Maps user_id to the user record that authenticated requests carry on
+request.ctx.user. Entries are dropped when a User row is updated or deleted
+through the ORM (once the change commits), and expire after USER_CACHE_TTL
+seconds to cover other workers and changes made outside the ORM.
+"""
+
+import os
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models.user import User
+from utils.cache import TTLCache
+
+user_cache = TTLCache(
+    max_size=int(os.getenv('USER_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('USER_CACHE_TTL', '60'))
+)
+
+
+def invalidate_user(user_id):
+    """Drop a user from the cache (call after changing users with Core statements)"""
+    user_cache.invalidate(user_id)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _remember_changed_user(mapper, connection, target):
+    # Invalidate once the change is committed, so a concurrent request cannot re-cache the old row
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_user_ids', set()).add(target.id)
+    else:
+        invalidate_user(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_rolled_back_users(session, previous_transaction):
+    session.info.pop('changed_user_ids', None)
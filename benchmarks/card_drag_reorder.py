@@ -0,0 +1,122 @@
+# benchmarks/card_drag_reorder.py
+"""
+Dragging one card in a 10,000-card deck: per-card reorder vs. sparse ordering keys.
+
+The deck editor used to send the new index of every card after a drag, and the
+reorder endpoint ran one SELECT and one UPDATE per card; that handler is kept
+below for comparison (run in-process). The same full list is then sent to the
+current endpoint, which writes the changed rows with one executemany. Finally
+the drag is sent as a single move: the first one respaces the deck's dense
+keys, every later one writes one row.
+
+Usage:
+    python benchmarks/card_drag_reorder.py [--cards 10000] [--drags 20]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from common import BenchServer, create_database, create_user, seed_library
+from models.card import Card
+from models.database import SyncSessionAdapter
+
+
+async def legacy_reorder(db_session, deck_id, card_orders):
+    """The previous reorder_deck_cards loop: one SELECT per card, then an UPDATE per changed card on commit"""
+    for item in card_orders:
+        card = await db_session.scalar(select(Card).filter_by(id=item['card_id'], deck_id=deck_id))
+        if card:
+            card.display_order = item['order']
+    await db_session.commit()
+
+
+def drag(order, rng):
+    """Move one random card to a random new position; returns (new order, card id, id it now follows)"""
+    order = list(order)
+    card_id = order.pop(rng.randrange(len(order)))
+    position = rng.randrange(len(order) + 1)
+    order.insert(position, card_id)
+    return order, card_id, order[position - 1] if position > 0 else None
+
+
+def count_statements(engine):
+    counter = {'statements': 0}
+    
+    def count(*args):
+        counter['statements'] += 1
+    event.listen(engine, 'before_cursor_execute', count)
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=10000)
+    parser.add_argument('--drags', type=int, default=20)
+    args = parser.parse_args()
+    rng = random.Random(7)
+    
+    url, engine = create_database()
+    user_id = create_user(engine)
+    deck_id = seed_library(engine, user_id, 1, args.cards)[0][0]
+    with engine.connect() as connection:
+        order = connection.scalars(
+            select(Card.id).filter_by(deck_id=deck_id).order_by(Card.display_order, Card.created_at, Card.id)
+        ).all()
+    
+    rows = []
+    
+    # Old endpoint: every card's index, one SELECT + UPDATE per card
+    order, _, _ = drag(order, rng)
+    counter = count_statements(engine)
+    with Session(engine) as session:
+        started = time.perf_counter()
+        asyncio.run(legacy_reorder(SyncSessionAdapter(session), deck_id,
+                                   [{'card_id': card_id, 'order': index} for index, card_id in enumerate(order)]))
+        rows.append(('per-card ORM (old)', (time.perf_counter() - started) * 1000, counter['statements'], '-'))
+    engine.dispose()
+    
+    with BenchServer(url) as server:
+        server.login()
+        path = f"/api/cards/deck/{deck_id}/reorder"
+        
+        # Same full list through the current endpoint: changed rows in one executemany
+        order, _, _ = drag(order, rng)
+        status, body, elapsed_ms, queries = server.timed(
+            'PUT', path, {'card_orders': [{'card_id': card_id, 'order': index} for index, card_id in enumerate(order)]}
+        )
+        if status != 200:
+            raise RuntimeError(f"card_orders failed: {status} {body}")
+        rows.append(('card_orders (executemany)', elapsed_ms, queries, body['updated']))
+        
+        # Single moves: the first respaces the dense keys
+        timings, written = [], set()
+        for index in range(args.drags + 1):
+            order, card_id, after_id = drag(order, rng)
+            status, body, elapsed_ms, queries = server.timed('PUT', path, {'moves': [{'card_id': card_id, 'after_id': after_id}]})
+            if status != 200:
+                raise RuntimeError(f"Move failed: {status} {body}")
+            if index == 0:
+                rows.append(('first move (rebalance)', elapsed_ms, queries, body['updated']))
+            else:
+                timings.append(elapsed_ms)
+                written.add(body['updated'])
+        rows.append((f"move (median of {args.drags})", statistics.median(timings), queries, '/'.join(map(str, sorted(written)))))
+        
+        status, body, _ = server.request('GET', f"/api/cards/deck/{deck_id}")
+        if [card['id'] for card in body['cards']] != order:
+            raise RuntimeError("Deck order does not match the drags")
+    
+    print(f"{args.cards} cards")
+    print(f"{'reorder':>26}  {'ms':>8}  {'queries':>7}  {'rows written':>12}")
+    for label, elapsed_ms, queries, updated in rows:
+        print(f"{label:>26}  {elapsed_ms:>8.1f}  {queries:>7}  {updated:>12}")
+
+
+if __name__ == '__main__':
+    main()
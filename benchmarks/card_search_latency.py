@@ -0,0 +1,156 @@
+# benchmarks/card_search_latency.py
+"""
+Latency of /api/cards/search at 1M cards: FTS5 index vs. the LIKE scan it replaced.
+
+Seeds two users (90% / 10% of the cards) with generated text over a
+Zipf-like vocabulary, so searches cover very common (stopword-like), common,
+rare, multi-word and prefix terms. The previous implementation (three
+LIKE '%q%' filters, the first 50 rows, unranked) is kept below and run
+in-process against the same database; the FTS5 search is measured through
+the server for both users, including keyset pages further down the results.
+Also reports the time to index the cards on insert (triggers) and to rebuild
+the whole index.
+
+Usage:
+    python benchmarks/card_search_latency.py [--cards 1000000] [--repeats 5]
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import statistics
+import time
+import urllib.parse
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.orm import Session
+
+from common import BenchServer, BENCH_USER, create_database, create_user
+from models.card import Card
+from models.card_search import match_expression, rebuild_card_search, search_terms
+from models.database import SyncSessionAdapter
+from models.deck import Deck
+
+CARDS_PER_DECK = 10000
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'te', 'su', 'no', 've', 'di', 'pa', 'zu', 'xi', 'bo', 'fe', 'gu', 'ha']
+
+
+async def legacy_search(db_session, user_id, query):
+    """The previous search_cards query: LIKE '%q%' on content and tags, first 50 matches"""
+    cards = (await db_session.scalars(
+        select(Card).filter(Card.is_active == True)
+        .join(Deck).filter(Deck.user_id == user_id)
+        .filter(Card.front_content.contains(query) | Card.back_content.contains(query) | Card.tags.contains(query))
+        .limit(50)
+    )).all()
+    return [card.to_dict() for card in cards]
+
+
+def vocabulary(rng, size=20000):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def seed_cards(engine, user_id, cards, words, cum_weights, rng):
+    """
+    Decks of CARDS_PER_DECK generated cards, inserted in batches (indexed by the triggers).
+    Returns the seconds spent inserting, text generation excluded.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    tags = words[:50]
+    elapsed = 0.0
+    with engine.begin() as connection:
+        for start in range(0, cards, CARDS_PER_DECK):
+            batch = [
+                {'display_order': position, 'is_active': True, 'created_at': now, 'updated_at': now,
+                 'front_content': ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(3, 6))),
+                 'back_content': ' '.join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(6, 12))),
+                 'tags': ' '.join(rng.sample(tags, 2))}
+                for position in range(min(CARDS_PER_DECK, cards - start))
+            ]
+            started = time.perf_counter()
+            deck_id = connection.execute(insert(Deck).values(
+                user_id=user_id, name=f"Deck {start // CARDS_PER_DECK}", created_at=now, updated_at=now
+            )).inserted_primary_key[0]
+            connection.execute(insert(Card), [{**card, 'deck_id': deck_id} for card in batch])
+            elapsed += time.perf_counter() - started
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=1000000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(11)
+    words = vocabulary(rng)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+    url, engine = create_database()
+    user_id = create_user(engine)
+    other_id = create_user(engine, 'otheruser')
+    insert_s = seed_cards(engine, user_id, args.cards * 9 // 10, words, cum_weights, rng)
+    insert_s += seed_cards(engine, other_id, args.cards - args.cards * 9 // 10, words, cum_weights, rng)
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        indexed = rebuild_card_search(connection)
+    rebuild_s = time.perf_counter() - started
+    print(f"{indexed} cards indexed: insert with triggers {insert_s:.1f}s, full rebuild {rebuild_s:.1f}s")
+
+    searches = [
+        ('very common', words[0]),
+        ('common word', words[100]),
+        ('rare word', words[5000]),
+        ('two words', f"{words[3]} {words[40]}"),
+        ('prefix', words[200][:3]),
+    ]
+
+    users = [(BENCH_USER, user_id), ('otheruser', other_id)]
+    rows = []
+    for username, searcher_id in users:
+        for label, query in searches:
+            timings = []
+            for _ in range(args.repeats):
+                with Session(engine) as session:
+                    started = time.perf_counter()
+                    asyncio.run(legacy_search(SyncSessionAdapter(session), searcher_id, query.split()[0]))
+                    timings.append((time.perf_counter() - started) * 1000)
+            with engine.connect() as connection:
+                matching = connection.scalar(text("SELECT count(*) FROM cards_fts WHERE cards_fts MATCH :match"),
+                                             {'match': match_expression(searcher_id, search_terms(query))})
+            rows.append([username, label, query, matching, statistics.median(timings)])
+    engine.dispose()
+
+    with BenchServer(url) as server:
+        for username, _ in users:
+            server.login(username)
+            for row in rows:
+                if row[0] != username:
+                    continue
+                path = f"/api/cards/search?q={urllib.parse.quote(row[2])}"
+                server.request('GET', path)  # Warm up
+                first, deep = [], []
+                for _ in range(args.repeats):
+                    status, body, elapsed_ms, queries = server.timed('GET', path)
+                    if status != 200:
+                        raise RuntimeError(f"Search failed: {status} {body}")
+                    first.append(elapsed_ms)
+                    # Fifth page, through the keyset cursors
+                    page = body
+                    for _ in range(4):
+                        if not page['has_more']:
+                            break
+                        status, page, elapsed_ms, _ = server.timed('GET', f"{path}&after={urllib.parse.quote(page['next_after'])}")
+                    deep.append(elapsed_ms)
+                row += [statistics.median(first), statistics.median(deep), queries]
+
+    print(f"{'user':>10}  {'search':>12}  {'query':>18}  {'matches':>8}  {'LIKE ms':>8}  {'FTS ms':>7}  {'page 5 ms':>9}  {'queries':>7}")
+    for username, label, query, matching, like_ms, fts_ms, deep_ms, queries in rows:
+        print(f"{username:>10}  {label:>12}  {query:>18}  {matching:>8}  {like_ms:>8.1f}  {fts_ms:>7.1f}  {deep_ms:>9.1f}  {queries:>7}")
+
+if __name__ == '__main__':
+    main()
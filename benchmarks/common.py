@@ -0,0 +1,207 @@
+# benchmarks/common.py - Shared helpers for the benchmark scripts
+"""
+Helpers for seeding a throwaway SQLite database and driving a real FlashPod
+server process against it. Benchmarks read the X-Query-Count and
+Server-Timing headers that every API response carries.
+"""
+
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(REPO_ROOT, 'app')
+sys.path.insert(0, APP_DIR)
+
+from sqlalchemy import insert, select, text  # noqa: E402
+from models.database import Base, build_engine, hash_password  # noqa: E402
+import models  # noqa: E402,F401  Registers every model on Base.metadata
+from models.user import User  # noqa: E402
+from models.deck import Deck  # noqa: E402
+from models.card import Card  # noqa: E402
+from models.pod import Pod  # noqa: E402
+from models.pod_deck import PodDeck  # noqa: E402
+from models.study_session import StudySession  # noqa: E402
+from models.card_review import CardReview  # noqa: E402
+from models.card_state import backfill_card_state  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+
+BENCH_USER = 'benchuser'
+BENCH_PASSWORD = 'benchpass123'
+
+
+def create_database(directory=None):
+    """Create an empty, fully migrated database and return (url, engine)"""
+    directory = directory or tempfile.mkdtemp(prefix='flashpod-bench-')
+    url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    engine = build_engine(url)
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+    return url, engine
+
+
+def create_user(engine, username=BENCH_USER, password=BENCH_PASSWORD):
+    with engine.begin() as connection:
+        return connection.execute(insert(User).values(
+            username=username,
+            email=f"{username}@example.com",
+            password_hash=hash_password(password),
+            is_active=True,
+            preferences={}
+        )).inserted_primary_key[0]
+
+
+def seed_library(engine, user_id, decks, cards_per_deck, reviews_per_card=0, decks_per_pod=0, seed=42):
+    """
+    Bulk-insert decks, cards, reviews (with card_state) and completed sessions for one user.
+    Every deck gets a completed full-spaced session so stats endpoints take their full path.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    
+    with engine.begin() as connection:
+        deck_ids = []
+        for index in range(decks):
+            deck_ids.append(connection.execute(insert(Deck).values(
+                user_id=user_id, name=f"Deck {index}", card_count=0,  # Counted by the triggers
+                created_at=now - timedelta(minutes=index), updated_at=now
+            )).inserted_primary_key[0])
+        
+        connection.execute(insert(Card), [
+            {'deck_id': deck_id, 'front_content': f"Q{deck_id}-{position}", 'back_content': f"A{deck_id}-{position}",
+             'display_order': position, 'is_active': True, 'created_at': now, 'updated_at': now}
+            for deck_id in deck_ids for position in range(cards_per_deck)
+        ])
+        
+        pod_ids = []
+        if decks_per_pod:
+            for start in range(0, len(deck_ids), decks_per_pod):
+                pod_id = connection.execute(insert(Pod).values(
+                    user_id=user_id, name=f"Pod {len(pod_ids)}", deck_count=0, total_card_count=0,
+                    created_at=now, updated_at=now
+                )).inserted_primary_key[0]
+                pod_ids.append(pod_id)
+                connection.execute(insert(PodDeck), [
+                    {'pod_id': pod_id, 'deck_id': deck_id, 'display_order': order, 'added_at': now}
+                    for order, deck_id in enumerate(deck_ids[start:start + decks_per_pod])
+                ])
+        
+        session_ids = {}
+        for deck_id in deck_ids:
+            session_ids[deck_id] = connection.execute(insert(StudySession).values(
+                user_id=user_id, deck_id=deck_id, session_type='review', mode='full-spaced',
+                started_at=now - timedelta(hours=2), ended_at=now - timedelta(hours=1),
+                cards_studied=cards_per_deck, cards_correct=cards_per_deck // 2, total_paused_minutes=0
+            )).inserted_primary_key[0]
+        
+        if reviews_per_card:
+            cards = connection.execute(
+                select(Card.id, Card.deck_id, Card.display_order).where(Card.deck_id.in_(deck_ids))
+            ).all()
+            batch = []
+            for card_id, deck_id, position in cards:
+                for repetition in range(reviews_per_card):
+                    # Same schedule for every deck, so each deck takes the same code paths at any library size
+                    rng = random.Random(f"{seed}-{position}-{repetition}")
+                    reviewed_at = now - timedelta(days=reviews_per_card - repetition, minutes=rng.randint(0, 600))
+                    interval = rng.choice([1, 3, 6, 15])
+                    batch.append({
+                        'card_id': card_id, 'user_id': user_id, 'session_id': session_ids[deck_id],
+                        'reviewed_at': reviewed_at, 'response_quality': rng.randint(1, 4),
+                        'response_time': rng.randint(500, 8000), 'ease_factor': 2.5,
+                        'interval_days': interval, 'repetitions': repetition,
+                        'next_review_date': reviewed_at + timedelta(days=interval)
+                    })
+                if len(batch) >= 50000:
+                    connection.execute(insert(CardReview), batch)
+                    batch = []
+            if batch:
+                connection.execute(insert(CardReview), batch)
+            backfill_card_state(connection)
+        
+        if connection.dialect.name == 'sqlite':
+            connection.execute(text("ANALYZE"))
+    
+    return deck_ids, pod_ids
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class BenchServer:
+    """Runs `python -m app.main` against a benchmark database"""
+    
+    def __init__(self, database_url, **env):
+        self.port = free_port()
+        self.base = f"http://127.0.0.1:{self.port}"
+        self.env = dict(os.environ, DATABASE_URL=database_url, PORT=str(self.port), HOST='127.0.0.1',
+                        DEBUG='false', SLOW_QUERY_MS='0', **env)
+        self.token = None
+        self.process = None
+    
+    def __enter__(self):
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'app.main'], cwd=REPO_ROOT, env=self.env,
+            stdout=self.log, stderr=subprocess.STDOUT, start_new_session=True
+        )
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                urllib.request.urlopen(self.base + '/api/health')
+                return self
+            except Exception:
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError("Server did not start")
+    
+    def __exit__(self, *exc_info):
+        if self.process and self.process.poll() is None:
+            os.killpg(self.process.pid, signal.SIGINT)
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+    
+    def login(self, username=BENCH_USER, password=BENCH_PASSWORD):
+        status, body, _ = self.request('POST', '/api/auth/login', {'username': username, 'password': password})
+        if status != 200:
+            raise RuntimeError(f"Login failed: {status} {body}")
+        self.token = body['token']
+        return body
+    
+    def request(self, method, path, body=None):
+        """Send a request and return (status, parsed body, headers)"""
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method)
+        req.add_header('Content-Type', 'application/json')
+        if self.token:
+            req.add_header('Authorization', f"Bearer {self.token}")
+        try:
+            with urllib.request.urlopen(req) as response:
+                status, payload, headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            status, payload, headers = e.code, e.read(), e.headers
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            pass
+        return status, payload, headers
+    
+    def timed(self, method, path, body=None):
+        """Send a request and return (status, body, wall ms, query count)"""
+        started = time.perf_counter()
+        status, payload, headers = self.request(method, path, body)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return status, payload, elapsed_ms, int(headers.get('X-Query-Count', -1))
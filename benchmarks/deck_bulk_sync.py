@@ -0,0 +1,119 @@
+# benchmarks/deck_bulk_sync.py
+"""
+Importing and saving a 2,000-card deck: one request per card vs. the bulk endpoints.
+
+The deck manager used to create a new deck's cards with one POST per card, and
+the deck editor saved with one POST / PUT / DELETE per created, edited or
+deleted card (all sent at once with Promise.all), each its own transaction.
+Both are replayed here with six requests in flight, as a browser would, and
+compared with POST /api/cards/deck/<id>/bulk and PATCH /api/decks/<id>/cards,
+which apply the same changes in one request and one transaction.
+
+Usage:
+    python benchmarks/deck_bulk_sync.py [--cards 2000] [--edits 200] [--deletes 50] [--creates 100]
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import BenchServer, create_database, create_user
+
+IN_FLIGHT = 6
+
+
+def new_card(index):
+    return {'front_content': f"Term {index}", 'back_content': f"Definition of term {index}"}
+
+
+def replay(server, calls):
+    """Send (method, path, body) calls IN_FLIGHT at a time; returns (responses, wall ms, total queries)"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(IN_FLIGHT) as pool:
+        results = list(pool.map(lambda call: server.timed(*call), calls))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for status, body, _, _ in results:
+        if status >= 400:
+            raise RuntimeError(f"Request failed: {status} {body}")
+    return [body for _, body, _, _ in results], elapsed_ms, sum(queries for _, _, _, queries in results)
+
+
+def plan_save(rng, card_ids, edits, deletes, creates):
+    """A deck editor save: edited, deleted and new cards (placed at random positions)"""
+    deleted = rng.sample(card_ids, deletes)
+    kept = [card_id for card_id in card_ids if card_id not in deleted]
+    edited = rng.sample(kept, edits)
+    order = list(kept)
+    for index in range(creates):
+        order.insert(rng.randrange(len(order) + 1), f"new_{index}")
+    return edited, deleted, order
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=2000)
+    parser.add_argument('--edits', type=int, default=200)
+    parser.add_argument('--deletes', type=int, default=50)
+    parser.add_argument('--creates', type=int, default=100)
+    args = parser.parse_args()
+    rng = random.Random(5)
+
+    url, engine = create_database()
+    create_user(engine)
+    engine.dispose()
+
+    rows = []
+    with BenchServer(url) as server:
+        server.login()
+        old_deck = server.request('POST', '/api/decks', {'name': 'Per card'})[1]['deck_id']
+        new_deck = server.request('POST', '/api/decks', {'name': 'Bulk'})[1]['deck_id']
+        cards = [new_card(index) for index in range(args.cards)]
+
+        # Import: one POST per card vs. one bulk POST
+        bodies, elapsed_ms, queries = replay(server, [('POST', f"/api/cards/deck/{old_deck}", card) for card in cards])
+        old_ids = sorted(body['card']['id'] for body in bodies)
+        rows.append((f"import {args.cards}: per card (old)", len(cards), elapsed_ms, queries))
+        status, body, elapsed_ms, queries = server.timed('POST', f"/api/cards/deck/{new_deck}/bulk", {'cards': cards})
+        if status != 201:
+            raise RuntimeError(f"Bulk create failed: {status} {body}")
+        new_ids = body['created']
+        rows.append((f"import {args.cards}: bulk", 1, elapsed_ms, queries))
+
+        # Save: the same edits, deletes and creates on both decks
+        state = rng.getstate()
+        edited, deleted, order = plan_save(rng, old_ids, args.edits, args.deletes, args.creates)
+        calls = [('PUT', f"/api/cards/{card_id}", {'front_content': f"Edited {card_id}", 'back_content': 'Edited'})
+                 for card_id in edited]
+        calls += [('DELETE', f"/api/cards/{card_id}", None) for card_id in deleted]
+        calls += [('POST', f"/api/cards/deck/{old_deck}", new_card(f"new {index}")) for index in range(args.creates)]
+        _, elapsed_ms, queries = replay(server, calls)
+        rows.append(("save: per card (old)", len(calls), elapsed_ms, queries))
+
+        rng.setstate(state)
+        edited, deleted, order = plan_save(rng, new_ids, args.edits, args.deletes, args.creates)
+        version = server.request('GET', f"/api/decks/{new_deck}")[1]['deck']['version']
+        changes = {
+            'version': version,
+            'create': [{'ref': f"new_{index}", **new_card(f"new {index}")} for index in range(args.creates)],
+            'update': [{'id': card_id, 'front_content': f"Edited {card_id}", 'back_content': 'Edited'} for card_id in edited],
+            'delete': deleted,
+            'order': order
+        }
+        status, body, elapsed_ms, queries = server.timed('PATCH', f"/api/decks/{new_deck}/cards", changes)
+        if status != 200:
+            raise RuntimeError(f"Sync failed: {status} {body}")
+        rows.append(("save: PATCH (placed in order)", 1, elapsed_ms, queries))
+
+        created = dict(zip((create['ref'] for create in changes['create']), body['created']))
+        status, deck, _ = server.request('GET', f"/api/cards/deck/{new_deck}")
+        if [card['id'] for card in deck['cards']] != [created.get(item, item) for item in order]:
+            raise RuntimeError("Deck order does not match the save")
+
+    print(f"{'operation':>32}  {'requests':>8}  {'ms':>8}  {'queries':>7}")
+    for label, requests, elapsed_ms, queries in rows:
+        print(f"{label:>32}  {requests:>8}  {elapsed_ms:>8.1f}  {queries:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# benchmarks/forecast_latency.py
+"""
+Latency of GET /api/dashboard/forecast for a large collection, cold and cached.
+
+The first request simulates every scheduled card over the next 365 days; later
+requests are served from the per-user cache until the user writes a review.
+Run it once with NumPy installed and once without to compare the two engines.
+
+Usage:
+    python benchmarks/forecast_latency.py [--cards 50000]
+"""
+
+import argparse
+import statistics
+
+from common import BenchServer, create_database, create_user, seed_library
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=50000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    
+    url, engine = create_database()
+    user_id = create_user(engine)
+    decks = max(1, args.cards // 1000)
+    seed_library(engine, user_id, decks, args.cards // decks, reviews_per_card=3)
+    engine.dispose()
+    
+    with BenchServer(url) as server:
+        server.login()
+        cold = []
+        for _ in range(args.repeats):
+            # A review invalidates the user's cached forecast
+            server.request('POST', '/api/cards/reviews', {'card_id': 1, 'response_quality': 4})
+            status, body, elapsed_ms, _ = server.timed('GET', '/api/dashboard/forecast?days=365')
+            if status != 200:
+                raise RuntimeError(f"Unexpected response: {status}")
+            cold.append(elapsed_ms)
+        warm = [server.timed('GET', '/api/dashboard/forecast?days=365')[2] for _ in range(args.repeats)]
+    
+    data = body['data']
+    print(f"{data['cards_scheduled']} cards scheduled, {data['total_reviews']} reviews forecast over 365 days")
+    print(f"{'cold median ms':>16}  {statistics.median(cold):>8.1f}")
+    print(f"{'cached median ms':>16}  {statistics.median(warm):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/login_throughput.py
+"""
+Login throughput and event-loop stall under concurrent logins.
+
+Runs the same burst of concurrent logins against a server that hashes on the
+event loop (PASSWORD_HASH_WORKERS=0) and one that uses the hashing executor,
+while a probe thread keeps calling /api/health. With inline hashing every
+PBKDF2 run freezes the loop, so the probe's latency climbs with the burst; with
+the executor it stays flat. Also checks that a legacy-format hash is upgraded
+on the first successful login.
+
+Usage:
+    python benchmarks/login_throughput.py [--logins 200] [--concurrency 16] [--workers 4]
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import select, update
+
+from common import BENCH_PASSWORD, BenchServer, create_database, create_user
+from models.database import LEGACY_PASSWORD_ITERATIONS, _pbkdf2
+from models.user import User
+
+
+def legacy_hash(password):
+    salt = 'a' * 32
+    return salt + _pbkdf2(password, salt, LEGACY_PASSWORD_ITERATIONS)
+
+
+def probe(server, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        server.request('GET', '/api/health')
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.01)
+
+
+def run(url, logins, concurrency, workers):
+    with BenchServer(url, PASSWORD_HASH_WORKERS=str(workers)) as server:
+        server.login()  # Warm up
+        
+        stop, latencies = threading.Event(), []
+        prober = threading.Thread(target=probe, args=(server, stop, latencies))
+        prober.start()
+        
+        def login(_):
+            status, _, _ = server.request('POST', '/api/auth/login', {'username': 'benchuser', 'password': BENCH_PASSWORD})
+            return status
+        
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            statuses = list(pool.map(login, range(logins)))
+        elapsed = time.perf_counter() - started
+        
+        stop.set()
+        prober.join()
+    
+    failed = sum(1 for status in statuses if status != 200)
+    if failed:
+        raise RuntimeError(f"{failed} of {logins} logins failed: {sorted(set(statuses))}")
+    latencies.sort()
+    return logins / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4, help="Hashing threads for the executor run")
+    args = parser.parse_args()
+    
+    url, engine = create_database()
+    user_id = create_user(engine)
+    
+    # A legacy hash must be upgraded to the versioned format on the first login
+    with engine.begin() as connection:
+        connection.execute(update(User).where(User.id == user_id).values(password_hash=legacy_hash(BENCH_PASSWORD)))
+    with BenchServer(url) as server:
+        server.login()
+    with engine.connect() as connection:
+        upgraded = connection.scalar(select(User.password_hash).where(User.id == user_id))
+    engine.dispose()
+    print(f"{'✅' if upgraded.startswith('pbkdf2_sha256$') else '❌'} Legacy hash rehashed on login")
+    
+    print(f"{'hashing':>10}  {'logins/s':>8}  {'health p50 ms':>13}  {'health p95 ms':>13}")
+    for label, workers in (('event loop', 0), (f"{args.workers} threads", args.workers)):
+        throughput, p50, p95 = run(url, args.logins, args.concurrency, workers)
+        print(f"{label:>10}  {throughput:>8.1f}  {p50:>13.1f}  {p95:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
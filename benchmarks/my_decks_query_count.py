@@ -0,0 +1,60 @@
+# benchmarks/my_decks_query_count.py
+"""
+Query count and latency of GET /api/decks/my-decks-with-stats for growing libraries.
+
+The endpoint computes every deck's stats with a fixed set of grouped queries,
+so the query count must be the same for 1, 100 and 1000 decks.
+
+Usage:
+    python benchmarks/my_decks_query_count.py [--sizes 1 100 1000] [--cards 10] [--reviews 2]
+"""
+
+import argparse
+import statistics
+import sys
+
+from common import BenchServer, create_database, create_user, seed_library
+
+
+def measure(decks, cards, reviews, repeats):
+    url, engine = create_database()
+    user_id = create_user(engine)
+    seed_library(engine, user_id, decks, cards, reviews_per_card=reviews, decks_per_pod=5)
+    engine.dispose()
+    
+    with BenchServer(url) as server:
+        server.login()
+        server.timed('GET', '/api/decks/my-decks-with-stats')  # Warm up
+        timings, counts = [], set()
+        for _ in range(repeats):
+            status, body, elapsed_ms, query_count = server.timed('GET', '/api/decks/my-decks-with-stats')
+            if status != 200 or len(body['decks']) != decks:
+                raise RuntimeError(f"Unexpected response for {decks} decks: {status}")
+            timings.append(elapsed_ms)
+            counts.add(query_count)
+    return counts, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--cards', type=int, default=10, help="Cards per deck")
+    parser.add_argument('--reviews', type=int, default=2, help="Reviews per card")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    
+    print(f"{'decks':>6}  {'queries':>7}  {'median ms':>9}")
+    all_counts = set()
+    for decks in args.sizes:
+        counts, median_ms = measure(decks, args.cards, args.reviews, args.repeats)
+        all_counts |= counts
+        print(f"{decks:>6}  {'/'.join(map(str, sorted(counts))):>7}  {median_ms:>9.1f}")
+    
+    if len(all_counts) != 1:
+        print(f"❌ Query count depends on library size: {sorted(all_counts)}")
+        sys.exit(1)
+    print(f"✅ Constant query count: {all_counts.pop()}")
+
+
+if __name__ == '__main__':
+    main()
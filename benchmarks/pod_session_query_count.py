@@ -0,0 +1,69 @@
+# benchmarks/pod_session_query_count.py
+"""
+Query count and latency of pod study session assembly for growing pods.
+
+Pod cards are loaded with one joined query (routes.pods.load_pod_cards), so
+starting, resuming and listing a pod must cost the same number of queries for
+1, 30 and 100 decks.
+
+Usage:
+    python benchmarks/pod_session_query_count.py [--sizes 1 30 100] [--cards 50]
+"""
+
+import argparse
+import statistics
+import sys
+
+from common import BenchServer, create_database, create_user, seed_library
+
+
+def measure(decks, cards, repeats):
+    url, engine = create_database()
+    user_id = create_user(engine)
+    _, pod_ids = seed_library(engine, user_id, decks, cards, decks_per_pod=decks)
+    engine.dispose()
+    pod_id = pod_ids[0]
+    
+    results = {}
+    with BenchServer(url) as server:
+        server.login()
+        endpoints = {
+            'start': ('POST', f"/api/study/pod/{pod_id}/session"),
+            'resume': ('GET', f"/api/study/pod/{pod_id}/session"),
+            'cards': ('GET', f"/api/pods/{pod_id}/cards")
+        }
+        for name, (method, path) in endpoints.items():
+            timings, counts = [], set()
+            for _ in range(repeats if name != 'start' else 1):
+                status, body, elapsed_ms, query_count = server.timed(method, path)
+                if status != 200 or len(body['cards']) != decks * cards:
+                    raise RuntimeError(f"Unexpected response from {path}: {status}")
+                timings.append(elapsed_ms)
+                counts.add(query_count)
+            results[name] = (counts, statistics.median(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 30, 100], help="Decks per pod")
+    parser.add_argument('--cards', type=int, default=50, help="Cards per deck")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    
+    print(f"{'decks':>6}  {'cards':>6}  {'endpoint':>8}  {'queries':>7}  {'median ms':>9}")
+    per_endpoint = {}
+    for decks in args.sizes:
+        for name, (counts, median_ms) in measure(decks, args.cards, args.repeats).items():
+            per_endpoint.setdefault(name, set()).update(counts)
+            print(f"{decks:>6}  {decks * args.cards:>6}  {name:>8}  {'/'.join(map(str, sorted(counts))):>7}  {median_ms:>9.1f}")
+    
+    varying = {name: sorted(counts) for name, counts in per_endpoint.items() if len(counts) != 1}
+    if varying:
+        print(f"❌ Query count depends on pod size: {varying}")
+        sys.exit(1)
+    print("✅ Constant query count: " + ", ".join(f"{name} {counts.pop()}" for name, counts in per_endpoint.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/pod_stats_query_count.py
+"""
+Query count and latency of GET /api/pods/my-pods?include_stats=true for growing libraries and pods.
+
+Pod statistics (sessions, study minutes, cards due, accuracy) are computed for
+all of a user's pods with a fixed set of grouped queries, so the query count
+must be the same for 1 or 50 pods, and for a pod of 2000 or 50000 cards.
+
+Usage:
+    python benchmarks/pod_stats_query_count.py [--sessions 30] [--reviews-per-session 20]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, select
+
+from common import BenchServer, create_database, create_user, seed_library
+from models.card import Card
+from models.card_review import CardReview
+from models.pod_deck import PodDeck
+from models.study_session import StudySession
+
+# (pods, decks per pod, cards per deck)
+LIBRARIES = [(1, 10, 200), (10, 10, 200), (50, 10, 200), (1, 50, 1000)]
+
+
+def seed_pod_sessions(engine, user_id, pod_ids, sessions, reviews_per_session, seed=42):
+    """Recent pod sessions in every mode, with reviews of the pod's cards"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    with engine.begin() as connection:
+        for pod_id in pod_ids:
+            card_ids = connection.scalars(
+                select(Card.id).join(PodDeck, PodDeck.deck_id == Card.deck_id).filter(PodDeck.pod_id == pod_id)
+            ).all()
+            reviews = []
+            for index in range(sessions):
+                started_at = now - timedelta(days=index % 30, hours=1)
+                session_id = connection.execute(insert(StudySession).values(
+                    user_id=user_id, pod_id=pod_id, session_type='review',
+                    mode=('full-spaced', 'simple-spaced', 'basic')[index % 3],
+                    started_at=started_at, ended_at=started_at + timedelta(minutes=20),
+                    cards_studied=reviews_per_session, cards_correct=reviews_per_session // 2, total_paused_minutes=2
+                )).inserted_primary_key[0]
+                reviews.extend(
+                    {'card_id': card_id, 'user_id': user_id, 'session_id': session_id, 'reviewed_at': started_at,
+                     'response_quality': rng.randint(1, 4), 'ease_factor': 2.5, 'interval_days': 1, 'repetitions': 1,
+                     'next_review_date': started_at + timedelta(days=1)}
+                    for card_id in rng.sample(card_ids, min(reviews_per_session, len(card_ids)))
+                )
+            connection.execute(insert(CardReview), reviews)
+
+
+def measure(pods, decks_per_pod, cards, sessions, reviews_per_session, repeats):
+    url, engine = create_database()
+    user_id = create_user(engine)
+    _, pod_ids = seed_library(engine, user_id, pods * decks_per_pod, cards, reviews_per_card=1, decks_per_pod=decks_per_pod)
+    seed_pod_sessions(engine, user_id, pod_ids, sessions, reviews_per_session)
+    engine.dispose()
+    
+    with BenchServer(url) as server:
+        server.login()
+        server.timed('GET', '/api/pods/my-pods?include_stats=true')  # Warm up
+        timings, counts = [], set()
+        for _ in range(repeats):
+            status, body, elapsed_ms, query_count = server.timed('GET', '/api/pods/my-pods?include_stats=true')
+            if status != 200 or len(body['pods']) != pods or body['pods'][0]['study_stats']['total_sessions'] != sessions:
+                raise RuntimeError(f"Unexpected response for {pods} pods: {status}")
+            timings.append(elapsed_ms)
+            counts.add(query_count)
+    return counts, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=30, help="Sessions per pod in the last 30 days")
+    parser.add_argument('--reviews-per-session', type=int, default=20)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    
+    print(f"{'pods':>5}  {'cards/pod':>9}  {'queries':>7}  {'median ms':>9}")
+    all_counts = set()
+    for pods, decks_per_pod, cards in LIBRARIES:
+        counts, median_ms = measure(pods, decks_per_pod, cards, args.sessions, args.reviews_per_session, args.repeats)
+        all_counts |= counts
+        print(f"{pods:>5}  {decks_per_pod * cards:>9}  {'/'.join(map(str, sorted(counts))):>7}  {median_ms:>9.1f}")
+    
+    if len(all_counts) != 1:
+        print(f"❌ Query count depends on library size: {sorted(all_counts)}")
+        sys.exit(1)
+    print(f"✅ Constant query count: {all_counts.pop()}")
+
+
+if __name__ == '__main__':
+    main()
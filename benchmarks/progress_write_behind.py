@@ -0,0 +1,110 @@
+# benchmarks/progress_write_behind.py
+"""
+Latency of POST /api/study/session/<id>/progress with and without write-behind,
+plus the crash-safety guarantees of utils.progress_buffer:
+
+- pause: totals are on disk as soon as the pause call returns
+- graceful shutdown (SIGINT): everything buffered is flushed
+- hard crash (SIGKILL): only updates from the last flush interval are lost
+
+Usage:
+    python benchmarks/progress_write_behind.py [--updates 500] [--interval-ms 2000]
+"""
+
+import argparse
+import os
+import signal
+import statistics
+import sys
+import time
+
+from sqlalchemy import select
+
+from common import BenchServer, create_database, create_user, seed_library
+from models.study_session import StudySession
+
+
+def cards_studied(engine, session_id):
+    with engine.connect() as connection:
+        return connection.scalar(select(StudySession.cards_studied).where(StudySession.id == session_id))
+
+
+def start_session(server, deck_id):
+    status, body, _ = server.request('POST', f"/api/study/deck/{deck_id}/session")
+    if status != 200:
+        raise RuntimeError(f"Could not start a session: {status} {body}")
+    return body['session']['id']
+
+
+def send_progress(server, session_id, count, start=1):
+    timings = []
+    for studied in range(start, start + count):
+        started = time.perf_counter()
+        status, _, _ = server.request('POST', f"/api/study/session/{session_id}/progress",
+                                      {'cards_studied': studied, 'cards_correct': studied // 2})
+        timings.append((time.perf_counter() - started) * 1000)
+        if status != 200:
+            raise RuntimeError(f"Progress update failed: {status}")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--updates', type=int, default=500)
+    parser.add_argument('--interval-ms', type=int, default=2000, help="PROGRESS_FLUSH_INTERVAL_MS for the checks")
+    args = parser.parse_args()
+    
+    url, engine = create_database()
+    user_id = create_user(engine)
+    deck_ids, _ = seed_library(engine, user_id, 4, 20)
+    failures = []
+    
+    print(f"{'mode':>14}  {'p50 ms':>7}  {'p95 ms':>7}")
+    for label, enabled in (('direct', 'false'), ('write-behind', 'true')):
+        with BenchServer(url, PROGRESS_WRITE_BEHIND=enabled) as server:
+            server.login()
+            session_id = start_session(server, deck_ids[0 if enabled == 'false' else 1])
+            timings = sorted(send_progress(server, session_id, args.updates))
+        print(f"{label:>14}  {statistics.median(timings):>7.2f}  {timings[int(len(timings) * 0.95) - 1]:>7.2f}")
+    
+    env = {'PROGRESS_WRITE_BEHIND': 'true', 'PROGRESS_FLUSH_INTERVAL_MS': str(args.interval_ms)}
+    
+    # Pause flushes before answering
+    with BenchServer(url, **env) as server:
+        server.login()
+        session_id = start_session(server, deck_ids[2])
+        send_progress(server, session_id, 10)
+        server.request('POST', f"/api/study/session/{session_id}/pause")
+        on_disk = cards_studied(engine, session_id)
+        if on_disk != 10:
+            failures.append(f"pause: {on_disk} on disk, expected 10")
+        
+        # Graceful shutdown flushes the rest (SIGINT on exit)
+        send_progress(server, session_id, 5, start=11)
+    on_disk = cards_studied(engine, session_id)
+    if on_disk != 15:
+        failures.append(f"shutdown: {on_disk} on disk, expected 15")
+    
+    # A hard crash loses at most one flush interval
+    with BenchServer(url, **env) as server:
+        server.login()
+        session_id = start_session(server, deck_ids[3])
+        send_progress(server, session_id, 10)
+        time.sleep(args.interval_ms / 1000 * 1.5)  # Let a flush happen
+        send_progress(server, session_id, 10, start=11)
+        os.killpg(server.process.pid, signal.SIGKILL)
+        server.process.wait()
+    on_disk = cards_studied(engine, session_id)
+    if on_disk != 10:
+        failures.append(f"crash: {on_disk} on disk, expected the last flushed total (10)")
+    engine.dispose()
+    
+    print(f"pause durable, shutdown flushed, crash lost only the unflushed window: {'no' if failures else 'yes'}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/session_resume_cache.py
+"""
+Latency and query count of resuming a full study session, with and without the session cache.
+
+Resumes a deck session and a pod session repeatedly (cache hits), then edits a
+card during study and resumes once more (a miss that rebuilds the entry). The
+uncached run sets SESSION_CACHE_MAX_BYTES=0.
+
+Usage:
+    python benchmarks/session_resume_cache.py [--cards 5000] [--pod-decks 10]
+"""
+
+import argparse
+import statistics
+
+from common import BenchServer, create_database, create_user, seed_library
+
+
+def resume(server, path, repeats):
+    """Resume a session repeatedly; returns (median ms, query count of the last resume, body)"""
+    timings = []
+    for _ in range(repeats):
+        status, body, elapsed_ms, queries = server.timed('POST', path)
+        if status != 200 or not body['resumed']:
+            raise RuntimeError(f"Unexpected response from {path}: {status}")
+        timings.append(elapsed_ms)
+    return statistics.median(timings), queries, body
+
+
+def measure(url, deck_id, pod_id, repeats, **env):
+    rows = []
+    with BenchServer(url, **env) as server:
+        server.login()
+        for label, path in (('deck', f"/api/study/deck/{deck_id}/session"), ('pod', f"/api/study/pod/{pod_id}/session")):
+            server.request('POST', path)
+            resumed_ms, resumed_queries, body = resume(server, path, repeats)
+            
+            # An edit during study invalidates the entry; the next resume rebuilds it
+            card_id = body['cards'][0]['id']
+            server.request('PUT', f"/api/study/card/{card_id}", {'front_content': f"Edited {card_id}"})
+            status, body, edited_ms, edited_queries = server.timed('POST', path)
+            if status != 200 or body['cards'][0]['front_content'] != f"Edited {card_id}":
+                raise RuntimeError(f"Resume after edit returned stale cards for {path}")
+            
+            rows.append((label, len(body['cards']), resumed_ms, resumed_queries, edited_ms, edited_queries))
+            server.request('POST', f"/api/study/session/{body['session']['id']}/complete")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=5000, help="cards in the deck, and in total across the pod")
+    parser.add_argument('--pod-decks', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+    
+    url, engine = create_database()
+    user_id = create_user(engine)
+    deck_id = seed_library(engine, user_id, 1, args.cards)[0][0]
+    pod_id = seed_library(engine, user_id, args.pod_decks, args.cards // args.pod_decks, decks_per_pod=args.pod_decks)[1][0]
+    engine.dispose()
+    
+    print(f"{'cache':>8}  {'session':>7}  {'cards':>6}  {'resume ms':>9}  {'queries':>7}  {'after edit ms':>13}  {'queries':>7}")
+    for label, env in (('off', {'SESSION_CACHE_MAX_BYTES': '0'}), ('on', {})):
+        for session, cards, resumed_ms, resumed_queries, edited_ms, edited_queries in measure(url, deck_id, pod_id, args.repeats, **env):
+            print(f"{label:>8}  {session:>7}  {cards:>6}  {resumed_ms:>9.1f}  {resumed_queries:>7}  {edited_ms:>13.1f}  {edited_queries:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# benchmarks/statistics_aggregates.py
+"""
+Latency of the utils.statistics metrics at 1M reviews: single SQL aggregates vs. the ORM versions they replace.
+
+The previous implementations are kept below for comparison: they loaded every
+completed StudySession to sum durations in Python, and built an IN (...) list
+of every card id to average review qualities in Python. Both versions are run
+against the same database and must return the same values.
+
+Usage:
+    python benchmarks/statistics_aggregates.py [--decks 20] [--cards-per-deck 1000] [--reviews-per-card 50]
+"""
+
+import argparse
+import asyncio
+import statistics as stats
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, insert, select
+from sqlalchemy.orm import Session
+
+from common import create_database, create_user, seed_library
+from models.card import Card
+from models.card_review import CardReview
+from models.database import SyncSessionAdapter
+from models.deck import Deck
+from models.study_session import StudySession
+from utils import statistics
+
+
+async def legacy_total_study_time(db_session, user_id):
+    """Loads every completed session and sums duration_minutes in Python"""
+    completed_sessions = (await db_session.scalars(select(StudySession).filter(
+        and_(
+            StudySession.user_id == user_id,
+            StudySession.ended_at.isnot(None),
+            StudySession.started_at.isnot(None)
+        )
+    ))).all()
+    return sum(session.duration_minutes or 0 for session in completed_sessions) / 60
+
+
+async def legacy_sm2_retention(db_session, user_id, days_back=30):
+    """Loads every card id for an IN (...) list, then every recent quality"""
+    card_ids = (await db_session.scalars(select(Card.id).join(
+        Deck, Card.deck_id == Deck.id
+    ).filter(
+        and_(
+            Deck.user_id == user_id,
+            Card.is_active == True
+        )
+    ))).all()
+    if not card_ids:
+        return 0
+    
+    cutoff_date = datetime.now() - timedelta(days=days_back)
+    recent_qualities = (await db_session.scalars(select(CardReview.response_quality).filter(
+        and_(
+            CardReview.card_id.in_(card_ids),
+            CardReview.user_id == user_id,
+            CardReview.reviewed_at >= cutoff_date,
+            CardReview.response_quality.isnot(None)
+        )
+    ))).all()
+    if not recent_qualities:
+        return 0
+    
+    quality_to_percent = {1: 25, 2: 50, 3: 75, 4: 100}
+    return round(sum(quality_to_percent.get(quality, 0) for quality in recent_qualities) / len(recent_qualities))
+
+
+def seed_sessions(engine, user_id, deck_id, count):
+    """Completed sessions with pauses, spread over the last year"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    with engine.begin() as connection:
+        connection.execute(insert(StudySession), [
+            {'user_id': user_id, 'deck_id': deck_id, 'session_type': 'review', 'mode': 'full-spaced',
+             'started_at': now - timedelta(hours=index), 'ended_at': now - timedelta(hours=index) + timedelta(minutes=25),
+             'total_paused_minutes': index % 7, 'cards_studied': 20, 'cards_correct': 15}
+            for index in range(count)
+        ])
+
+
+async def measure(engine, function, user_id, repeats):
+    timings = []
+    for _ in range(repeats):
+        with Session(engine) as session:
+            started = time.perf_counter()
+            value = await function(SyncSessionAdapter(session), user_id)
+            timings.append((time.perf_counter() - started) * 1000)
+    return stats.median(timings), value
+
+
+async def run(engine, user_id, repeats):
+    rows = []
+    for label, legacy, aggregate in (
+        ('study time', legacy_total_study_time, statistics.get_total_study_time),
+        ('sm2 retention', legacy_sm2_retention, statistics.get_retention_rate),
+    ):
+        legacy_ms, legacy_value = await measure(engine, legacy, user_id, repeats)
+        aggregate_ms, aggregate_value = await measure(engine, aggregate, user_id, repeats)
+        if abs(legacy_value - aggregate_value) > 1e-6:
+            raise RuntimeError(f"{label}: legacy {legacy_value} != aggregate {aggregate_value}")
+        rows.append((label, legacy_ms, aggregate_ms))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--decks', type=int, default=20)
+    parser.add_argument('--cards-per-deck', type=int, default=1000)
+    parser.add_argument('--reviews-per-card', type=int, default=50)
+    parser.add_argument('--sessions', type=int, default=20000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    
+    url, engine = create_database()
+    user_id = create_user(engine)
+    deck_ids, _ = seed_library(engine, user_id, args.decks, args.cards_per_deck, reviews_per_card=args.reviews_per_card)
+    seed_sessions(engine, user_id, deck_ids[0], args.sessions)
+    reviews = args.decks * args.cards_per_deck * args.reviews_per_card
+    
+    print(f"{reviews} reviews, {args.sessions + args.decks} completed sessions")
+    print(f"{'metric':>14}  {'ORM ms':>9}  {'aggregate ms':>12}  {'speedup':>7}")
+    for label, legacy_ms, aggregate_ms in asyncio.run(run(engine, user_id, args.repeats)):
+        print(f"{label:>14}  {legacy_ms:>9.1f}  {aggregate_ms:>12.1f}  {legacy_ms / aggregate_ms:>6.1f}x")
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
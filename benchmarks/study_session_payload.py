@@ -0,0 +1,67 @@
+# benchmarks/study_session_payload.py
+"""
+Payload size and latency of starting a study session on a large deck, full vs. windowed.
+
+The full mode sends every card; the windowed mode (?window=N) sends the card id
+order plus the first N cards, and later windows come from
+/api/study/session/<id>/cards.
+
+Usage:
+    python benchmarks/study_session_payload.py [--cards 5000] [--window 50]
+"""
+
+import argparse
+import statistics
+import time
+
+from common import BenchServer, create_database, create_user, seed_library
+
+
+def start_session(server, path, repeats):
+    """Start (then resume) a session; returns (median ms, response bytes, body)"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        status, body, headers = server.request('POST', path)
+        timings.append((time.perf_counter() - started) * 1000)
+        if status != 200:
+            raise RuntimeError(f"Unexpected response from {path}: {status} {body}")
+    return statistics.median(timings), int(headers.get('Content-Length', 0)), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=5000)
+    parser.add_argument('--window', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    
+    url, engine = create_database()
+    user_id = create_user(engine)
+    full_deck, windowed_deck = seed_library(engine, user_id, 2, args.cards)[0]
+    engine.dispose()
+    
+    with BenchServer(url) as server:
+        server.login()
+        full_ms, full_bytes, _ = start_session(server, f"/api/study/deck/{full_deck}/session", args.repeats)
+        window_ms, window_bytes, body = start_session(
+            server, f"/api/study/deck/{windowed_deck}/session?window={args.window}&shuffle=true", args.repeats
+        )
+        
+        # Prefetch the next window the way a client would
+        started = time.perf_counter()
+        status, page, headers = server.request(
+            'GET', f"/api/study/session/{body['session']['id']}/cards?after={body['next_after']}&limit={args.window}"
+        )
+        page_ms = (time.perf_counter() - started) * 1000
+        if status != 200 or len(page['cards']) != args.window:
+            raise RuntimeError(f"Unexpected prefetch response: {status}")
+    
+    print(f"{'mode':>16}  {'KiB':>8}  {'median ms':>9}")
+    print(f"{'full':>16}  {full_bytes / 1024:>8.1f}  {full_ms:>9.1f}")
+    print(f"{f'window={args.window}':>16}  {window_bytes / 1024:>8.1f}  {window_ms:>9.1f}")
+    print(f"{'next window':>16}  {int(headers.get('Content-Length', 0)) / 1024:>8.1f}  {page_ms:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -38,6 +38,7 @@ CREATE TABLE decks (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     card_count INTEGER DEFAULT 0, -- Denormalized for performance
+    version INTEGER DEFAULT 0, -- Bumped by every change to the deck's cards
     study_settings JSON DEFAULT '{}', -- Spaced repetition settings, etc.
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
@@ -81,6 +82,9 @@ CREATE TABLE study_sessions (
     cards_studied INTEGER DEFAULT 0,
     cards_correct INTEGER DEFAULT 0,
     session_type VARCHAR(20) DEFAULT 'review', -- 'review', 'learn', 'cram'
+    card_order JSON, -- Card ids in study order (windowed sessions only)
+    shuffle_seed INTEGER, -- Seed card_order was shuffled with, if shuffled
+    current_index INTEGER DEFAULT 0, -- Position in card_order to resume from
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (deck_id) REFERENCES decks(id) ON DELETE CASCADE,
     FOREIGN KEY (pod_id) REFERENCES pods(id) ON DELETE CASCADE,
@@ -100,11 +104,31 @@ CREATE TABLE card_reviews (
     interval_days INTEGER DEFAULT 1, -- Days until next review
     next_review_date DATETIME,
     repetitions INTEGER DEFAULT 0, -- Number of successful repetitions
+    client_review_id VARCHAR(64), -- Client-generated id that makes batch submissions idempotent
     FOREIGN KEY (card_id) REFERENCES cards(id) ON DELETE CASCADE,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (session_id) REFERENCES study_sessions(id) ON DELETE SET NULL
 );
 
+-- Card state - current spaced repetition state per user and card (mirrors the latest review)
+CREATE TABLE card_state (
+    user_id INTEGER NOT NULL,
+    card_id INTEGER NOT NULL,
+    last_review_id INTEGER,
+    session_id INTEGER,
+    response_quality INTEGER,
+    response_time INTEGER,
+    ease_factor REAL DEFAULT 2.5,
+    interval_days INTEGER DEFAULT 1,
+    repetitions INTEGER DEFAULT 0,
+    next_review_date DATETIME,
+    last_reviewed_at DATETIME,
+    PRIMARY KEY (user_id, card_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (card_id) REFERENCES cards(id) ON DELETE CASCADE,
+    FOREIGN KEY (last_review_id) REFERENCES card_reviews(id) ON DELETE SET NULL
+);
+
 -- Shared pods - for sharing pods between users
 CREATE TABLE shared_pods (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -168,9 +192,12 @@ CREATE TABLE deck_categories (
 CREATE TABLE user_statistics (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
-    date DATE NOT NULL,
+    date DATE NOT NULL,  -- Local date (TZ)
     cards_studied INTEGER DEFAULT 0,
-    study_time_minutes INTEGER DEFAULT 0,
+    cards_correct INTEGER DEFAULT 0,
+    retention_points INTEGER DEFAULT 0,
+    study_time_minutes REAL DEFAULT 0,
+    sessions_completed INTEGER DEFAULT 0,
     cards_learned INTEGER DEFAULT 0,
     accuracy_percentage REAL DEFAULT 0,
     streak_days INTEGER DEFAULT 0,
@@ -194,72 +221,165 @@ CREATE INDEX idx_shared_decks_shared_with ON shared_decks(shared_with_user_id);
 CREATE INDEX idx_shared_pods_shared_with ON shared_pods(shared_with_user_id);
 CREATE INDEX idx_user_statistics_user_date ON user_statistics(user_id, date);
 
--- Triggers to maintain pod data consistency
+-- Composite indexes matched to the hot query paths (created by migration 0002)
+CREATE INDEX idx_card_reviews_user_card_reviewed ON card_reviews(user_id, card_id, reviewed_at DESC);
+CREATE INDEX idx_card_reviews_user_reviewed ON card_reviews(user_id, reviewed_at);
+CREATE INDEX idx_card_reviews_session_id ON card_reviews(session_id);
+CREATE INDEX idx_cards_deck_active_order ON cards(deck_id, is_active, display_order);
+CREATE INDEX idx_study_sessions_user_ended_mode ON study_sessions(user_id, ended_at, mode);
+CREATE INDEX idx_study_sessions_pod_started ON study_sessions(pod_id, started_at);
+CREATE INDEX idx_decks_user_created ON decks(user_id, created_at);
+CREATE INDEX idx_pods_user_created ON pods(user_id, created_at);
+CREATE INDEX idx_card_state_user_next_review ON card_state(user_id, next_review_date);
+CREATE INDEX idx_card_state_card_id ON card_state(card_id);
+CREATE UNIQUE INDEX idx_card_reviews_user_client_id ON card_reviews(user_id, client_review_id);
+
+-- Applied schema revisions (maintained by app/migrations)
+CREATE TABLE schema_migrations (
+    revision VARCHAR(32) PRIMARY KEY,
+    description VARCHAR(255),
+    applied_at DATETIME NOT NULL
+);
+
+-- Counter triggers (installed by migrations 0007 and 0009, see app/models/counters.py)
+CREATE TRIGGER update_deck_card_count_insert
+    AFTER INSERT ON cards
+    WHEN NEW.is_active
+BEGIN
+    UPDATE decks
+    SET card_count = card_count + 1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = NEW.deck_id;
+END;
+
+CREATE TRIGGER update_deck_card_count_delete
+    AFTER DELETE ON cards
+    WHEN OLD.is_active
+BEGIN
+    UPDATE decks
+    SET card_count = card_count - 1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = OLD.deck_id;
+END;
+
+CREATE TRIGGER update_deck_card_count_update
+    AFTER UPDATE OF is_active, deck_id ON cards
+    WHEN OLD.is_active IS NOT NEW.is_active OR OLD.deck_id IS NOT NEW.deck_id
+BEGIN
+    UPDATE decks
+    SET card_count = card_count - 1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = OLD.deck_id AND OLD.is_active;
+    UPDATE decks
+    SET card_count = card_count + 1,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = NEW.deck_id AND NEW.is_active;
+END;
+
+CREATE TRIGGER update_deck_version_insert
+    AFTER INSERT ON cards
+BEGIN
+    UPDATE decks SET version = version + 1 WHERE id = NEW.deck_id;
+END;
+
+CREATE TRIGGER update_deck_version_delete
+    AFTER DELETE ON cards
+BEGIN
+    UPDATE decks SET version = version + 1 WHERE id = OLD.deck_id;
+END;
+
+CREATE TRIGGER update_deck_version_update
+    AFTER UPDATE ON cards
+BEGIN
+    UPDATE decks SET version = version + 1 WHERE id IN (OLD.deck_id, NEW.deck_id);
+END;
+
 CREATE TRIGGER update_pod_counts_on_deck_add
     AFTER INSERT ON pod_decks
 BEGIN
-    UPDATE pods 
+    UPDATE pods
     SET deck_count = deck_count + 1,
-        total_card_count = total_card_count + (
+        total_card_count = total_card_count + coalesce((
             SELECT card_count FROM decks WHERE id = NEW.deck_id
-        ),
-        updated_at = CURRENT_TIMESTAMP 
+        ), 0),
+        updated_at = CURRENT_TIMESTAMP
     WHERE id = NEW.pod_id;
 END;
 
 CREATE TRIGGER update_pod_counts_on_deck_remove
     AFTER DELETE ON pod_decks
 BEGIN
-    UPDATE pods 
+    UPDATE pods
     SET deck_count = deck_count - 1,
-        total_card_count = total_card_count - (
+        total_card_count = total_card_count - coalesce((
             SELECT card_count FROM decks WHERE id = OLD.deck_id
-        ),
-        updated_at = CURRENT_TIMESTAMP 
+        ), 0),
+        updated_at = CURRENT_TIMESTAMP
     WHERE id = OLD.pod_id;
 END;
 
--- Update pod card counts when deck card counts change
+CREATE TRIGGER update_pod_counts_on_deck_move
+    AFTER UPDATE OF pod_id, deck_id ON pod_decks
+    WHEN OLD.pod_id IS NOT NEW.pod_id OR OLD.deck_id IS NOT NEW.deck_id
+BEGIN
+    UPDATE pods
+    SET deck_count = deck_count - 1,
+        total_card_count = total_card_count - coalesce((
+            SELECT card_count FROM decks WHERE id = OLD.deck_id
+        ), 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = OLD.pod_id;
+    UPDATE pods
+    SET deck_count = deck_count + 1,
+        total_card_count = total_card_count + coalesce((
+            SELECT card_count FROM decks WHERE id = NEW.deck_id
+        ), 0),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = NEW.pod_id;
+END;
+
 CREATE TRIGGER update_pod_card_count_on_deck_change
     AFTER UPDATE OF card_count ON decks
-    WHEN OLD.card_count != NEW.card_count
+    WHEN OLD.card_count IS NOT NEW.card_count
 BEGIN
-    UPDATE pods 
-    SET total_card_count = total_card_count + (NEW.card_count - OLD.card_count),
-        updated_at = CURRENT_TIMESTAMP 
+    UPDATE pods
+    SET total_card_count = total_card_count + (coalesce(NEW.card_count, 0) - coalesce(OLD.card_count, 0)),
+        updated_at = CURRENT_TIMESTAMP
     WHERE id IN (
         SELECT pod_id FROM pod_decks WHERE deck_id = NEW.id
     );
 END;
 
--- Triggers to maintain data consistency
-CREATE TRIGGER update_deck_card_count_insert
+-- Card full-text search index and its sync triggers (migration 0008, see app/models/card_search.py)
+CREATE VIRTUAL TABLE cards_fts USING fts5(
+    owner, front_content, back_content, tags,
+    prefix='2 3 4',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER cards_fts_insert
     AFTER INSERT ON cards
-    WHEN NEW.is_active = TRUE
+    WHEN NEW.is_active
 BEGIN
-    UPDATE decks 
-    SET card_count = card_count + 1, 
-        updated_at = CURRENT_TIMESTAMP 
-    WHERE id = NEW.deck_id;
+    INSERT INTO cards_fts (rowid, owner, front_content, back_content, tags)
+    SELECT NEW.id, 'u' || decks.user_id, NEW.front_content, NEW.back_content, coalesce(NEW.tags, '')
+    FROM decks WHERE decks.id = NEW.deck_id AND NEW.is_active;
 END;
 
-CREATE TRIGGER update_deck_card_count_delete
+CREATE TRIGGER cards_fts_delete
     AFTER DELETE ON cards
+    WHEN OLD.is_active
 BEGIN
-    UPDATE decks 
-    SET card_count = card_count - 1, 
-        updated_at = CURRENT_TIMESTAMP 
-    WHERE id = OLD.deck_id;
+    DELETE FROM cards_fts WHERE rowid = OLD.id;
 END;
 
-CREATE TRIGGER update_deck_card_count_update
-    AFTER UPDATE ON cards
-    WHEN OLD.is_active != NEW.is_active
+CREATE TRIGGER cards_fts_update
+    AFTER UPDATE OF front_content, back_content, tags, is_active, deck_id ON cards
 BEGIN
-    UPDATE decks 
-    SET card_count = card_count + CASE WHEN NEW.is_active THEN 1 ELSE -1 END,
-        updated_at = CURRENT_TIMESTAMP 
-    WHERE id = NEW.deck_id;
+    DELETE FROM cards_fts WHERE rowid = OLD.id;
+    INSERT INTO cards_fts (rowid, owner, front_content, back_content, tags)
+    SELECT NEW.id, 'u' || decks.user_id, NEW.front_content, NEW.back_content, coalesce(NEW.tags, '')
+    FROM decks WHERE decks.id = NEW.deck_id AND NEW.is_active;
 END;
 
 -- Update timestamps trigger for users
@@ -42,6 +42,13 @@ export class API {
         });
     }
 
+    static async patch(endpoint, data) {
+        return this.request(endpoint, {
+            method: 'PATCH',
+            body: JSON.stringify(data)
+        });
+    }
+
     static async delete(endpoint) {
         return this.request(endpoint, { method: 'DELETE' });
     }
@@ -45,6 +45,7 @@ export class DeckEditor {
             ]);
             
             const deck = deckData.deck;
+            this.editingVersion = cardsData.deck.version;
             this.editingCards = cardsData.cards || [];
             this.originalCards = JSON.parse(JSON.stringify(this.editingCards));
             
@@ -189,60 +190,40 @@ export class DeckEditor {
     }
 
     async syncCards(deckId, currentCards) {
-        const newCards = currentCards.filter(c => c.is_new);
-        const existingCards = currentCards.filter(c => !c.is_new);
-        
-        const currentCardIds = currentCards.map(c => parseInt(c.id)).filter(id => !isNaN(id));
+        // One request and one transaction: creates, edits, deletes and the final order
+        const currentCardIds = currentCards.filter(c => !c.is_new).map(c => parseInt(c.id));
         const originalCardIds = this.originalCards.map(c => parseInt(c.id));
-        const deletedCardIds = originalCardIds.filter(id => !currentCardIds.includes(id));
-        
-        const promises = [];
         
-        // Create new cards
-        newCards.forEach(card => {
-            promises.push(
-                CardService.createCard(deckId, {
-                    front_content: card.front_content,
-                    back_content: card.back_content,
-                    display_order: card.display_order
-                })
-            );
-        });
+        const changes = {
+            version: this.editingVersion,
+            create: currentCards.filter(c => c.is_new).map(card => ({
+                ref: card.id,
+                front_content: card.front_content,
+                back_content: card.back_content
+            })),
+            update: [],
+            delete: originalCardIds.filter(id => !currentCardIds.includes(id)),
+            order: currentCards.map(c => c.is_new ? c.id : parseInt(c.id))
+        };
         
-        // Update existing cards
-        existingCards.forEach(card => {
+        currentCards.filter(c => !c.is_new).forEach(card => {
             const originalCard = this.originalCards.find(c => parseInt(c.id) === parseInt(card.id));
             const hasChanged = !originalCard || 
                 originalCard.front_content !== card.front_content || 
                 originalCard.back_content !== card.back_content;
             
             if (hasChanged) {
-                promises.push(
-                    CardService.updateCard(card.id, {
-                        front_content: card.front_content,
-                        back_content: card.back_content,
-                        display_order: card.display_order
-                    })
-                );
+                changes.update.push({
+                    id: parseInt(card.id),
+                    front_content: card.front_content,
+                    back_content: card.back_content
+                });
             }
         });
         
-        // Delete removed cards
-        deletedCardIds.forEach(cardId => {
-            promises.push(CardService.deleteCard(cardId));
-        });
-        
-        await Promise.all(promises);
-        
-        // Update card order
-        if (existingCards.length > 0) {
-            const cardOrders = existingCards.map(card => ({
-                card_id: parseInt(card.id),
-                order: card.display_order
-            }));
-            
-            await CardService.reorderCards(deckId, cardOrders);
-        }
+        const result = await DeckService.syncCards(deckId, changes);
+        this.editingVersion = result.version;
+        return result;
     }
 
     async handleDeleteDeck() {
@@ -44,20 +44,12 @@ export class DeckManager {
             const deckData = await DeckService.createDeck(name, description);
             const deckId = deckData.deck_id;
             
-            // Create all cards
-            const cardPromises = cards.map((card, index) => 
-                CardService.createCard(deckId, {
-                    front_content: card.term,
-                    back_content: card.definition,
-                    display_order: index
-                }).catch(err => {
-                    console.error('Failed to add card:', err);
-                    return null;
-                })
-            );
-            
-            const results = await Promise.all(cardPromises);
-            const successCount = results.filter(r => r !== null).length;
+            // Create all cards in one request
+            const result = await CardService.createCards(deckId, cards.map(card => ({
+                front_content: card.term,
+                back_content: card.definition
+            })));
+            const successCount = result.created.length;
             
             document.getElementById('deckForm').reset();
             this.initializeCardRows();
@@ -18,6 +18,15 @@ export class CardService {
         throw new Error('Failed to create card');
     }
 
+    static async createCards(deckId, cards) {
+        // Appended in order, in one transaction; returns {created: [ids], version}
+        const response = await API.post(`/cards/deck/${deckId}/bulk`, { cards });
+        if (response.ok) {
+            return await response.json();
+        }
+        throw new Error('Failed to create cards');
+    }
+
     static async updateCard(cardId, cardData) {
         const response = await API.put(`/cards/${cardId}`, cardData);
         if (response.ok) {
@@ -43,4 +52,15 @@ export class CardService {
         console.warn('Failed to update card order');
         return null;
     }
+
+    static async moveCards(deckId, moves) {
+        // moves: [{card_id, after_id}], after_id null for the top of the deck
+        const response = await API.put(`/cards/deck/${deckId}/reorder`, { moves });
+        if (response.ok) {
+            return await response.json();
+        }
+        // Don't throw error for reorder failures
+        console.warn('Failed to update card order');
+        return null;
+    }
 }
\ No newline at end of file
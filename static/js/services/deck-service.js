@@ -34,6 +34,18 @@ export class DeckService {
         throw new Error('Failed to update deck');
     }
 
+    static async syncCards(deckId, changes) {
+        // changes: {version, create: [{ref, ...}], update: [{id, ...}], delete: [ids], order: [ids and refs]}
+        const response = await API.patch(`/decks/${deckId}/cards`, changes);
+        if (response.ok) {
+            return await response.json();
+        }
+        if (response.status === 409) {
+            throw new Error('The deck was changed elsewhere, reload it and try again');
+        }
+        throw new Error('Failed to save cards');
+    }
+
     static async deleteDeck(deckId) {
         const response = await API.delete(`/decks/${deckId}`);
         if (response.ok) {
@@ -118,7 +118,7 @@ export class PodService {
         }
     }
 
-    static async addDeckToPod(podId, deckId, displayOrder = 0) {
+    static async addDeckToPod(podId, deckId, displayOrder = null) {
         try {
             const response = await fetch(`${Config.API_BASE}/pods/${podId}/decks`, {
                 method: 'POST',
@@ -236,85 +236,39 @@ export class FullSpaced {
             }
         }
         
-        // Calculate SM-2 parameters
-        const reviewResult = this._calculateSM2(currentCardId, rating);
+        // The server schedules the card and returns the stored review
+        const review = await this._saveReview(currentCardId, rating);
         
-        // Save review to backend immediately
-        await this._saveReview(currentCardId, rating, reviewResult);
-        
-        // Update local state
-        modeData.reviews.set(currentCardId, reviewResult);
-        modeData.nextReviewDates.set(currentCardId, reviewResult.next_review_date);
-        modeData.difficulty.set(currentCardId, reviewResult.ease_factor);
-        
-        // Update card categories
-        this._updateCardCategories(currentCardId, reviewResult);
-        
-        // Show brief feedback
-        await this._showRatingFeedback(rating, reviewResult);
-        
-        // Move to next card
-        await this._moveToNextCard();
-    }
-
-    _calculateSM2(cardId, rating) {
-        const modeData = this.manager.state.modeData['full-spaced'];
-        const existingReview = modeData.reviews.get(cardId);
-        
-        // Initialize defaults for new cards
-        let easeFactor = existingReview?.ease_factor || 2.5;
-        let repetitions = existingReview?.repetitions || 0;
-        let intervalDays = existingReview?.interval_days || 1;
-        
-        const now = timezoneHandler.getCurrentDateInServerTimezone();
-        
-        if (rating < 3) {
-            // Failed review - reset to learning
-            repetitions = 0;
-            intervalDays = 1;
+        if (review) {
+            const nextReviewDate = new Date(review.next_review_date);
+            
+            // Update local state
+            modeData.reviews.set(currentCardId, review);
+            modeData.nextReviewDates.set(currentCardId, nextReviewDate);
+            modeData.difficulty.set(currentCardId, review.ease_factor);
+            
+            // Update card categories
+            this._updateCardCategories(currentCardId, review);
+            
+            // Show brief feedback
+            await this._showRatingFeedback(rating, nextReviewDate);
         } else {
-            // Successful review
-            if (repetitions === 0) {
-                intervalDays = 1;
-            } else if (repetitions === 1) {
-                intervalDays = 6;
-            } else {
-                intervalDays = Math.round(intervalDays * easeFactor);
-            }
-            repetitions++;
+            this._showNotification('Rating not saved - check your connection', 'red');
+            await new Promise(resolve => setTimeout(resolve, 800));
         }
         
-        // Adjust ease factor based on rating (SM-2 formula)
-        easeFactor = Math.max(1.3, 
-            easeFactor + (0.1 - (5 - rating) * (0.08 + (5 - rating) * 0.02))
-        );
-        
-        // Calculate next review date
-        const nextReviewDate = new Date(now.getTime() + intervalDays * 24 * 60 * 60 * 1000);
-        
-        return {
-            card_id: cardId,
-            ease_factor: easeFactor,
-            interval_days: intervalDays,
-            repetitions: repetitions,
-            next_review_date: nextReviewDate,
-            response_quality: rating,
-            reviewed_at: now
-        };
+        // Move to next card
+        await this._moveToNextCard();
     }
 
-    async _saveReview(cardId, rating, reviewResult) {
+    async _saveReview(cardId, rating) {
         try {
             const token = localStorage.getItem('token');
             
             const requestBody = {
                 card_id: cardId,
                 session_id: this.manager.session.sessionId,
-                response_quality: rating,
-                ease_factor: reviewResult.ease_factor,
-                interval_days: reviewResult.interval_days,
-                repetitions: reviewResult.repetitions,
-                next_review_date: reviewResult.next_review_date.toISOString()
+                response_quality: rating
             };
             
             const response = await fetch('/api/cards/reviews', {
@@ -335,11 +289,11 @@ export class FullSpaced {
             return await response.json();
         } catch (error) {
             console.error('Error saving review:', error);
-            // Continue anyway - we have local state
+            return null;
         }
     }
 
-    _updateCardCategories(cardId, reviewResult) {
+    _updateCardCategories(cardId, review) {
         const modeData = this.manager.state.modeData['full-spaced'];
         
         // Remove from all categories first
@@ -349,9 +303,9 @@ export class FullSpaced {
         modeData.matureCards = modeData.matureCards.filter(id => id !== cardId);
         
         // Add to appropriate category based on review result
-        if (reviewResult.repetitions < 3) {
+        if (review.repetitions < 3) {
             modeData.learningCards.push(cardId);
-            if (reviewResult.repetitions === 1) {
+            if (review.repetitions === 1) {
                 modeData.sessionStats.newCardsLearned++;
             }
         } else {
@@ -359,9 +313,9 @@ export class FullSpaced {
         }
     }
 
-    async _showRatingFeedback(rating, reviewResult) {
+    async _showRatingFeedback(rating, nextReviewDate) {
         const ratingNames = ['', 'Again', 'Hard', 'Good', 'Easy'];
-        const nextReview = this._formatNextReview(reviewResult.next_review_date);
+        const nextReview = this._formatNextReview(nextReviewDate);
         
         // Show brief notification
         this._showNotification(
@@ -374,7 +328,8 @@ export class FullSpaced {
     }
 
     _formatNextReview(date) {
-        const now = timezoneHandler.getCurrentDateInServerTimezone();
+        // Both are absolute times (the server's next_review_date carries its UTC offset)
+        const now = new Date();
         const diffTime = date - now;
         const diffDays = Math.ceil(diffTime / (1000 * 60 * 60 * 24));
         
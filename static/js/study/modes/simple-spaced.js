@@ -339,10 +339,8 @@ export class SimpleSpaced {
                 session_id: this.manager.session.sessionId,
                 response_quality: responseQuality,
                 response_time: null,
-                // Required SM-2 fields with defaults for Simple mode
-                ease_factor: 2.5,
-                interval_days: 1,
-                repetitions: 0
+                // Recorded without SM-2 scheduling
+                mode: 'simple-spaced'
             };
             
             const apiResponse = await fetch('/api/cards/reviews', {